@@ -0,0 +1 @@
+# Shared data and analysis helpers used by the Streamlit app (Final.py)
@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from analyzer import data, query, instrument
+
+# One cell per combination of these that has incidents
+KEYS = ['Beat', 'Primary Type']
+
+# Half-lives of the rolling statistics: the level and its variance follow about the last month of days,
+# the day-of-week profile the last half year of each weekday, the hour-of-day profile the last quarter
+LEVEL_HALF_LIFE = 28
+WEEKDAY_HALF_LIFE = 26
+HOUR_HALF_LIFE = 90
+
+# A cell's day is flagged when it has at least MIN_COUNT incidents and is Z_THRESHOLD standard deviations
+# above the expected count for that weekday, once the cell is WARM_UP days past its first incident.
+# The variance is never taken below the expected count (Poisson) or MIN_VARIANCE, so quiet cells do not
+# flag on every incident.
+Z_THRESHOLD = 3.0
+MIN_COUNT = 3
+WARM_UP = 56
+MIN_VARIANCE = 0.25
+
+# Flags older than this many days before the last processed day are dropped from the store
+KEEP_DAYS = 90
+
+# Bump when the state layout or the statistics change, so the state is rebuilt from the full history
+STATE_FORMAT = 1
+
+ANOMALY_DIR = os.environ.get('CRIME_ANOMALY_DIR', os.path.join(data.CACHE_DIR, 'anomaly'))
+STATE_NAME = 'state.npz'
+
+# 1970-01-05, day 4 of the epoch, was a Monday; weekday 0 is Monday
+_MONDAY = 4
+
+CELL_ARRAYS = ['beats', 'types', 'first_day', 'level', 'variance', 'weekday', 'hour']
+FLAG_ARRAYS = ['flag_day', 'flag_cell', 'flag_count', 'flag_expected', 'flag_z']
+
+
+def _alpha(half_life):
+    return 1 - 0.5 ** (1 / half_life)
+
+
+def settings():
+    # Everything the stored statistics depend on; a state written with other settings is rebuilt
+    return {'format': STATE_FORMAT, 'level_half_life': LEVEL_HALF_LIFE, 'weekday_half_life': WEEKDAY_HALF_LIFE,
+            'hour_half_life': HOUR_HALF_LIFE, 'z_threshold': Z_THRESHOLD, 'min_count': MIN_COUNT, 'warm_up': WARM_UP,
+            'min_variance': MIN_VARIANCE}
+
+
+def empty_state():
+    return {
+        'beats': np.array([], dtype=str),
+        'types': np.array([], dtype=str),
+        'first_day': np.zeros(0, dtype='int64'),
+        'level': np.zeros(0),
+        'variance': np.zeros(0),
+        'weekday': np.zeros((0, 7)),
+        'hour': np.zeros((0, 24)),
+        'flag_day': np.zeros(0, dtype='int64'),
+        'flag_cell': np.zeros(0, dtype='int64'),
+        'flag_count': np.zeros(0),
+        'flag_expected': np.zeros(0),
+        'flag_z': np.zeros(0),
+        'meta': {'settings': settings(), 'last_day': None, 'data_version': None, 'days_processed': 0,
+                 'new_days': 0, 'seconds': 0.0},
+    }
+
+
+def state_path(anomaly_dir=ANOMALY_DIR):
+    return os.path.join(anomaly_dir, STATE_NAME)
+
+
+def save_state(state, path):
+    # Statistics go to disk as float32, which keeps a city's cells to a few MB; written to a temporary
+    # file and moved into place so readers never see half a state
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = {name: state[name].astype('float32') if state[name].dtype.kind == 'f' else state[name]
+              for name in CELL_ARRAYS + FLAG_ARRAYS}
+    np.savez_compressed(path + '.tmp.npz', meta=np.array(json.dumps(state['meta'])), **arrays)
+    os.replace(path + '.tmp.npz', path)
+
+
+def load_state(path):
+    # None when there is no state yet or it was written with other settings
+    try:
+        with np.load(path) as stored:
+            meta = json.loads(str(stored['meta']))
+            if meta['settings'] != settings():
+                return None
+            state = {name: stored[name].astype('float64') if stored[name].dtype.kind == 'f' else stored[name]
+                     for name in CELL_ARRAYS + FLAG_ARRAYS}
+    except (OSError, KeyError, ValueError):
+        return None
+    state['meta'] = meta
+    return state
+
+
+def _day_numbers(frame):
+    dates = pd.to_datetime(pd.DataFrame({'year': frame['Year'], 'month': frame['Month'], 'day': frame['Day']}))
+    return dates.to_numpy().astype('datetime64[D]').astype('int64')
+
+
+@instrument.traced('anomaly counts', rows_out=len)
+def new_counts(crime_query, after_day=None):
+    # Incident counts per cell, day and hour for the days after after_day. Only the Year/Month partitions
+    # from after_day's month on are queried, so a daily update reads a month or two, not the full history.
+    by = KEYS + ['Year', 'Month', 'Day', 'Hour']
+    if after_day is None:
+        totals = crime_query.rollup(by)['count']
+    else:
+        start = np.datetime64(after_day + 1, 'D').astype(object)
+        months = crime_query.rollup(['Year', 'Month'])['count']
+        months = [(year, month) for (year, month), count in months.items()
+                  if count > 0 and (year, month) >= (start.year, start.month)]
+        totals = pd.concat([crime_query.rollup(by, {'Year': [year], 'Month': [month]})['count']
+                            for year, month in months]) if months else pd.Series(dtype='int64')
+    frame = totals[totals > 0].reset_index()
+    if frame.empty:
+        return pd.DataFrame({'Beat': [], 'Primary Type': [], 'day': np.zeros(0, dtype='int64'),
+                             'Hour': np.zeros(0, dtype='int64'), 'count': np.zeros(0, dtype='int64')})
+    frame = frame.assign(day=_day_numbers(frame))
+    if after_day is not None:
+        frame = frame[frame['day'] > after_day]
+    return frame[KEYS + ['day', 'Hour', 'count']].reset_index(drop=True)
+
+
+def _cells(state, frame):
+    # Cell of every row; combinations seen for the first time are appended to the state
+    grouped = frame.groupby(KEYS, observed=True, sort=True)
+    combinations = grouped.size().index.to_frame(index=False).astype(str)
+    known = {key: cell for cell, key in enumerate(zip(state['beats'], state['types']))}
+    cells = np.array([known.get(key, -1) for key in zip(combinations['Beat'], combinations['Primary Type'])],
+                     dtype='int64')
+    new = np.flatnonzero(cells < 0)
+    if len(new):
+        cells[new] = len(state['beats']) + np.arange(len(new))
+        first_day = grouped['day'].min().to_numpy()[new]
+        state['beats'] = np.concatenate([state['beats'], combinations['Beat'].to_numpy()[new].astype(str)])
+        state['types'] = np.concatenate([state['types'], combinations['Primary Type'].to_numpy()[new].astype(str)])
+        state['first_day'] = np.concatenate([state['first_day'], first_day])
+        for name, shape in [('level', ()), ('variance', ()), ('weekday', (7,)), ('hour', (24,))]:
+            state[name] = np.concatenate([state[name], np.zeros((len(new),) + shape)])
+    return cells[grouped.ngroup().to_numpy()]
+
+
+@instrument.traced('anomaly update')
+def update(state, frame, through):
+    # Folds the days after the state's last day up to through into the rolling statistics, one day at a time
+    # for all cells at once; days without incidents count as zeros. Each day is scored against the
+    # statistics of the days before it, then added to them:
+    #   expected = level * weekday share,  z = (count - expected) / sqrt(max(variance, expected, MIN_VARIANCE))
+    # level and variance start at zero when a cell first appears and are divided by the weight they have
+    # accumulated since, so a young cell is not underestimated.
+    meta = state['meta']
+    if meta['last_day'] is not None:
+        first = meta['last_day'] + 1
+    else:
+        first = int(frame['day'].min()) if len(frame) else None
+    if first is None or through < first:
+        meta['new_days'] = 0
+        return state
+    frame = frame[(frame['day'] >= first) & (frame['day'] <= through)].sort_values('day', kind='stable')
+    cells = _cells(state, frame) if len(frame) else np.zeros(0, dtype='int64')
+    days = frame['day'].to_numpy()
+    hours = frame['Hour'].to_numpy().astype('int64')
+    counts = frame['count'].to_numpy().astype('float64')
+    bounds = np.searchsorted(days, np.arange(first, through + 2))
+
+    n_cells = len(state['beats'])
+    level, variance = state['level'], state['variance']
+    weekday, hour = state['weekday'], state['hour']
+    a, b, c = _alpha(LEVEL_HALF_LIFE), _alpha(WEEKDAY_HALF_LIFE), _alpha(HOUR_HALF_LIFE)
+    flags = []
+    for position, day in enumerate(range(first, through + 1)):
+        rows = slice(bounds[position], bounds[position + 1])
+        x = np.bincount(cells[rows], weights=counts[rows], minlength=n_cells)
+        age = day - state['first_day']
+        weight = 1 - (1 - a) ** np.maximum(age, 1)
+        dow = (day - _MONDAY) % 7
+        mean_profile = weekday.mean(axis=1)
+        share = np.divide(weekday[:, dow], mean_profile, out=np.ones(n_cells), where=mean_profile > 0)
+        expected = level / weight * share
+        z = (x - expected) / np.sqrt(np.maximum(np.maximum(variance / weight, expected), MIN_VARIANCE))
+        flagged = np.flatnonzero((age >= WARM_UP) & (x >= MIN_COUNT) & (z >= Z_THRESHOLD))
+        if len(flagged):
+            flags.append((np.full(len(flagged), day), flagged, x[flagged], expected[flagged], z[flagged]))
+
+        started = age >= 0
+        residual = np.where(started, x - expected, 0)
+        level += a * (x - level) * started
+        variance += a * (residual ** 2 - variance) * started
+        weekday[:, dow] += b * (x - weekday[:, dow]) * started
+        hour += c * (np.bincount(cells[rows] * 24 + hours[rows], weights=counts[rows],
+                                 minlength=n_cells * 24).reshape(n_cells, 24) - hour) * started[:, None]
+
+    for name, values in zip(FLAG_ARRAYS, zip(*flags) if flags else []):
+        state[name] = np.concatenate([state[name]] + list(values))
+    keep = state['flag_day'] > through - KEEP_DAYS
+    for name in FLAG_ARRAYS:
+        state[name] = state[name][keep]
+    meta['last_day'] = int(through)
+    meta['new_days'] = through - first + 1
+    meta['days_processed'] += meta['new_days']
+    return state
+
+
+def update_state(crime_query, path=None, rebuild=False, include_last=False):
+    # The stored state brought up to date with the data: only days after its last day are read and folded in.
+    # The latest day in the data is left for the next update unless include_last, since an export taken
+    # during the day holds only part of it. Rows added later for days already folded in are not picked up;
+    # rebuild starts over from the full history.
+    path = path or state_path()
+    start = time.perf_counter()
+    state = None if rebuild else load_state(path)
+    state = state or empty_state()
+    frame = new_counts(crime_query, state['meta']['last_day'])
+    if len(frame):
+        through = int(frame['day'].max()) - (0 if include_last else 1)
+        update(state, frame, through)
+    else:
+        state['meta']['new_days'] = 0
+    state['meta']['data_version'] = crime_query.version
+    state['meta']['seconds'] = round(time.perf_counter() - start, 2)
+    if len(frame) or rebuild:
+        save_state(state, path)
+    return state
+
+
+def flags(state, min_z=Z_THRESHOLD, days=KEEP_DAYS):
+    # Flagged cell days of the last `days` processed days, most recent and most unusual first
+    if state['meta']['last_day'] is None:
+        return pd.DataFrame(columns=['Date', 'Beat', 'Primary Type', 'count', 'expected', 'z'])
+    keep = (state['flag_z'] >= min_z) & (state['flag_day'] > state['meta']['last_day'] - days)
+    cells = state['flag_cell'][keep]
+    frame = pd.DataFrame({
+        'Date': state['flag_day'][keep].astype('datetime64[D]'),
+        'Beat': state['beats'][cells],
+        'Primary Type': state['types'][cells],
+        'count': state['flag_count'][keep].round().astype('int64'),
+        'expected': state['flag_expected'][keep].round(2),
+        'z': state['flag_z'][keep].round(2),
+    })
+    return frame.sort_values(['Date', 'z'], ascending=False).reset_index(drop=True)
+
+
+def cell_index(state, beat, primary_type):
+    matches = np.flatnonzero((state['beats'] == str(beat)) & (state['types'] == str(primary_type)))
+    return int(matches[0]) if len(matches) else None
+
+
+def hour_baseline(state, cell, day):
+    # Expected incidents per hour of the given day: the cell's hour-of-day profile scaled to its
+    # expected count for that weekday
+    weekday = state['weekday'][cell]
+    share = weekday[(day - _MONDAY) % 7] / weekday.mean() if weekday.mean() > 0 else 1.0
+    weight = 1 - (1 - _alpha(LEVEL_HALF_LIFE)) ** max(state['meta']['last_day'] - int(state['first_day'][cell]), 1)
+    profile = state['hour'][cell]
+    profile = profile / profile.sum() if profile.sum() > 0 else np.full(24, 1 / 24)
+    return profile * state['level'][cell] / weight * share
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Update the rolling per beat x crime type baselines and list flagged days')
+    parser.add_argument('--source', default=data.SOURCE_PATH)
+    parser.add_argument('--backend', default=query.BACKEND, choices=query.BACKENDS)
+    parser.add_argument('--anomaly-dir', default=ANOMALY_DIR)
+    parser.add_argument('--rebuild', action='store_true', help='start over from the full history')
+    parser.add_argument('--include-last', action='store_true', help='also fold in the latest day in the data')
+    parser.add_argument('--days', type=int, default=7, help='list flags of this many most recent days')
+    args = parser.parse_args()
+
+    backend = query.open_backend(args.backend, args.source)
+    state = update_state(backend, state_path(args.anomaly_dir), args.rebuild, args.include_last)
+    meta = state['meta']
+    last_day = None if meta['last_day'] is None else np.datetime64(meta['last_day'], 'D')
+    print(f"{len(state['beats'])} cells up to {last_day}: {meta['new_days']} new days folded in {meta['seconds']}s")
+    print(flags(state, days=args.days).to_string(index=False))
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from aiohttp import web
+from analyzer import cube, data, query, result_cache, instrument
+from analyzer.filters import ALL, FILTER_COLUMNS, active_filters
+
+HOST = os.environ.get('CRIME_API_HOST', '127.0.0.1')
+
+# Setting CRIME_API_PORT also serves the API from the Streamlit process (see Final.py)
+PORT = int(os.environ.get('CRIME_API_PORT') or 8502)
+
+# Threads running queries; the event loop only parses requests and writes responses
+WORKERS = int(os.environ.get('CRIME_API_WORKERS', min(8, os.cpu_count() or 1)))
+
+# How often the source is checked for a new data version
+VERSION_CHECK_SECONDS = 5
+
+# Query parameters that are not filters
+PARAMETERS = ['by']
+
+
+class Source:
+    # The backend of the current data version, shared by every request and reopened when the data changes.
+    # open(version) defaults to a CachedBackend over query.open_backend(); the Streamlit process passes
+    # its own load_backend so both serve the same in-memory data and result cache.
+    def __init__(self, mode=query.BACKEND, path=data.SOURCE_PATH, cache_dir=data.CACHE_DIR, open=None):
+        self.mode = mode
+        self.path = path
+        self.cache_dir = cache_dir
+        self.open = open or self._open
+        self.cache = result_cache.ResultCache()
+        self.backend = None
+        self.checked = 0
+        self.lock = threading.Lock()
+
+    def _open(self, version):
+        return query.CachedBackend(query.open_backend(self.mode, self.path, self.cache_dir), self.cache)
+
+    def current(self):
+        with self.lock:
+            if self.backend is None or time.monotonic() - self.checked > VERSION_CHECK_SECONDS:
+                version = query.data_version(self.mode, self.path, self.cache_dir)
+                if self.backend is None or self.backend.version != version:
+                    self.backend = self.open(version)
+                self.checked = time.monotonic()
+            return self.backend
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return str(value)
+
+
+def json_response(payload, status=200, headers=None):
+    return web.json_response(payload, status=status, headers=headers,
+                             dumps=lambda value: json.dumps(value, default=_json_default))
+
+
+def bad_request(message):
+    return web.HTTPBadRequest(text=json.dumps({'error': message}), content_type='application/json')
+
+
+def parse_filters(backend, params):
+    # ?District=11&District=12&Primary Type=THEFT, matched against the column's own values so '11' selects
+    # District 11 on either backend; a value the column does not have is an error rather than an empty selection
+    unknown = [key for key in params if key not in FILTER_COLUMNS and key not in PARAMETERS]
+    if unknown:
+        raise bad_request(f'Unknown parameters {sorted(set(unknown))}, filters are {FILTER_COLUMNS}')
+    filters = {}
+    for column in FILTER_COLUMNS:
+        values = params.getall(column, [])
+        if not values or ALL in values:
+            continue
+        if column not in backend.columns:
+            raise bad_request(f'{column} is not in this dataset')
+        options = {str(option): option for option in backend.options(column)}
+        invalid = [value for value in values if value not in options]
+        if invalid:
+            raise bad_request(f'{column} has no values {invalid}')
+        filters[column] = [options[value] for value in values]
+    return filters
+
+
+def column_arg(backend, column):
+    # Only the cube dimensions can be listed or grouped by; row-level columns (ID, Date, Latitude, ...)
+    # would return one entry per incident
+    dimensions = [dimension for dimension in cube.DIMENSIONS if dimension in backend.columns]
+    if column not in dimensions:
+        raise bad_request(f'Unknown column {column!r}, columns are {dimensions}')
+    return column
+
+
+def etag(version, request):
+    # Responses only depend on the data version and the query, so the tag is known before computing anything
+    params = sorted(request.query.items())
+    digest = hashlib.sha1(json.dumps([request.path, params]).encode()).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+def not_modified(request, tag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = [value.strip() for value in header.split(',')]
+    return '*' in tags or tag in tags or f'W/{tag}' in tags
+
+
+def records(frame):
+    return frame.reset_index().to_dict(orient='records')
+
+
+def totals(backend, by, filters):
+    # Count, arrests and arrest rate (%) per group; groups without incidents get no rate
+    frame = backend.rollup(by, filters)
+    frame = frame[frame['count'] > 0]
+    rate = (frame['arrests'] / frame['count'] * 100).round(4)
+    return frame.assign(arrest_rate=rate)
+
+
+def options_view(backend, request, filters):
+    return {'values': backend.options(column_arg(backend, request.match_info['column']))}
+
+
+def count_view(backend, request, filters):
+    return {'count': backend.count(filters)}
+
+
+def counts_view(backend, request, filters):
+    column = column_arg(backend, request.match_info['column'])
+    return {'by': [column], 'rows': records(backend.counts(column, filters).loc[lambda counts: counts > 0])}
+
+
+def arrest_rate_view(backend, request, filters):
+    column = column_arg(backend, request.match_info['column'])
+    return {'by': [column], 'rows': records(totals(backend, [column], filters))}
+
+
+def rollup_view(backend, request, filters):
+    by = [column_arg(backend, column) for column in request.query.getall('by', [])]
+    if not by:
+        raise bad_request('rollup needs at least one by= column')
+    return {'by': by, 'rows': records(totals(backend, by, filters))}
+
+
+def _run_query(view, backend, request, filters):
+    # Each request is traced like a dashboard rerun, so its spans go to the same timing log
+    instrument.start_trace(f'api {request.path}')
+    try:
+        return view(backend, request, filters)
+    finally:
+        instrument.finish_trace()
+
+
+def endpoint(view):
+    # Blocking work runs on the app's thread pool; identical concurrent queries are computed once by the result cache
+    async def handler(request):
+        app = request.app
+        loop = asyncio.get_running_loop()
+        backend = await loop.run_in_executor(app['executor'], app['source'].current)
+        filters = await loop.run_in_executor(app['executor'], parse_filters, backend, request.query)
+        tag = etag(backend.version, request)
+        headers = {'ETag': tag, 'Cache-Control': 'no-cache', 'X-Data-Version': backend.version}
+        if not_modified(request, tag):
+            return web.Response(status=304, headers=headers)
+        payload = await loop.run_in_executor(app['executor'], _run_query, view, backend, request, filters)
+        return json_response({'version': backend.version, 'filters': active_filters(filters), **payload},
+                             headers=headers)
+    return handler
+
+
+async def health(request):
+    app = request.app
+    backend = await asyncio.get_running_loop().run_in_executor(app['executor'], app['source'].current)
+    return json_response({'status': 'ok', 'backend': backend.name, 'version': backend.version, 'rows': backend.rows,
+                          'result_cache': backend.cache.stats() if hasattr(backend, 'cache') else None})
+
+
+async def _warm_up(app):
+    # Load the data before the first request rather than during it
+    await asyncio.get_running_loop().run_in_executor(app['executor'], app['source'].current)
+
+
+async def _shut_down(app):
+    app['executor'].shutdown(wait=False)
+
+
+def create_app(source, workers=WORKERS, warm_up=True):
+    app = web.Application()
+    app['source'] = source
+    app['executor'] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crime-api')
+    app.router.add_get('/api/health', health)
+    app.router.add_get('/api/options/{column}', endpoint(options_view))
+    app.router.add_get('/api/count', endpoint(count_view))
+    app.router.add_get('/api/counts/{column}', endpoint(counts_view))
+    app.router.add_get('/api/arrest-rate/{column}', endpoint(arrest_rate_view))
+    app.router.add_get('/api/rollup', endpoint(rollup_view))
+    if warm_up:
+        app.on_startup.append(_warm_up)
+    app.on_cleanup.append(_shut_down)
+    return app
+
+
+def start_background(source, host=HOST, port=PORT, workers=WORKERS):
+    # Serves the API from a daemon thread with its own event loop, e.g. next to the Streamlit server
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(create_app(source, workers, warm_up=False), handle_signals=False)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, host, port).start())
+    threading.Thread(target=loop.run_forever, name='crime-api', daemon=True).start()
+    return runner
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the dashboard aggregations as JSON over HTTP')
+    parser.add_argument('--source', default=data.SOURCE_PATH)
+    parser.add_argument('--cache-dir', default=data.CACHE_DIR)
+    parser.add_argument('--backend', default=query.BACKEND, choices=query.BACKENDS)
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=WORKERS, help='threads running queries')
+    args = parser.parse_args()
+
+    web.run_app(create_app(Source(args.backend, args.source, args.cache_dir), args.workers), host=args.host, port=args.port)
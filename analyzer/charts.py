@@ -0,0 +1,59 @@
+import io
+import threading
+from collections import OrderedDict
+from matplotlib.figure import Figure
+from analyzer import instrument
+
+DPI = 100
+
+# Total size of rendered PNGs kept per process
+MAX_CACHE_BYTES = 256 * 1024 ** 2
+
+
+@instrument.traced('render chart')
+def render_png(draw, figsize, dpi=DPI):
+    # A Figure created directly is not registered with pyplot, so nothing is left behind
+    # once the PNG is written; clear() releases the artists right away instead of waiting for GC
+    fig = Figure(figsize=figsize, dpi=dpi)
+    try:
+        ax = fig.subplots()
+        draw(ax)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+class ChartCache:
+    # Rendered charts keyed by (chart id, filter signature, data version), least recently used evicted first
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.charts = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_or_render(self, key, draw, figsize):
+        with self.lock:
+            png = self.charts.get(key)
+            if png is not None:
+                self.charts.move_to_end(key)
+                self.hits += 1
+                return png
+            self.misses += 1
+
+        png = render_png(draw, figsize)
+        with self.lock:
+            if key not in self.charts and len(png) <= self.max_bytes:
+                self.charts[key] = png
+                self.bytes += len(png)
+                while self.bytes > self.max_bytes:
+                    _, evicted = self.charts.popitem(last=False)
+                    self.bytes -= len(evicted)
+        return png
+
+    def stats(self):
+        with self.lock:
+            return {'charts': len(self.charts), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
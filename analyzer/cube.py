@@ -0,0 +1,95 @@
+import os
+import pandas as pd
+from analyzer.filters import active_filters
+
+DIMENSIONS = ['Year', 'Month', 'Day', 'Hour', 'Primary Type', 'District', 'Ward', 'Beat', 'Community Area',
+              'Season', 'Location Description', 'Arrest', 'Domestic', 'Severity']
+
+MEASURES = ['count', 'arrests']
+
+# Smaller roll-ups of the base cube, one per group of charts that filter and group on the same columns.
+# With every dimension at once the base cube has close to one group per incident,
+# so charts are answered from the smallest view that still has the columns they need.
+VIEWS = {
+    'calendar': ['Year', 'Month', 'Day'],
+    'hourly': ['Day', 'Hour'],
+    'district': ['Primary Type', 'District'],
+    'ward': ['Primary Type', 'Ward'],
+    'arrests': ['Primary Type', 'District', 'Ward', 'Year'],
+    'domestic': ['Primary Type', 'Domestic'],
+    'beat': ['Beat', 'Community Area'],
+    'season': ['Season', 'Primary Type'],
+    'location': ['Location Description', 'Primary Type'],
+    'severity': ['Severity', 'Primary Type'],
+}
+
+CUBE_DIR = 'cube'
+BASE_NAME = 'base'
+
+
+def _aggregate(df, dimensions, measures):
+    return df.groupby(dimensions, observed=True, dropna=False, sort=True)[measures].sum().reset_index()
+
+
+def build_cube(df):
+    dimensions = [dimension for dimension in DIMENSIONS if dimension in df.columns]
+    rows = df[dimensions].assign(count=1, arrests=df['Arrest'].astype('int64'))
+    base = _aggregate(rows, dimensions, MEASURES)
+
+    # Views are rolled up from the base cube, not from the incidents
+    views = {BASE_NAME: base}
+    for name, view_dimensions in VIEWS.items():
+        if all(dimension in dimensions for dimension in view_dimensions):
+            views[name] = _aggregate(base, view_dimensions, MEASURES)
+    return Cube(views)
+
+
+def save_cube(cube, cache_dir):
+    cube_dir = os.path.join(cache_dir, CUBE_DIR)
+    os.makedirs(cube_dir, exist_ok=True)
+    for name, view in cube.views.items():
+        tmp_path = os.path.join(cube_dir, name + '.parquet.tmp')
+        view.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, os.path.join(cube_dir, name + '.parquet'))
+
+
+def load_cube(cache_dir):
+    cube_dir = os.path.join(cache_dir, CUBE_DIR)
+    views = {}
+    for file_name in os.listdir(cube_dir):
+        if file_name.endswith('.parquet'):
+            views[file_name[:-len('.parquet')]] = pd.read_parquet(os.path.join(cube_dir, file_name))
+    return Cube(views)
+
+
+class Cube:
+    def __init__(self, views):
+        self.views = views
+
+    def _view_for(self, columns):
+        # Smallest materialized view that has every grouping and filter column
+        candidates = [view for view in self.views.values() if all(column in view.columns for column in columns)]
+        if not candidates:
+            raise KeyError(f'No cube view covers {columns}')
+        return min(candidates, key=len)
+
+    def rollup(self, by, filters=None):
+        # filters maps a dimension to the list of values to keep; None or 'All' means no filter on it
+        filters = active_filters(filters)
+        view = self._view_for(list(by) + list(filters))
+
+        if filters:
+            mask = pd.Series(True, index=view.index)
+            for column, values in filters.items():
+                mask &= view[column].isin(values)
+            view = view[mask]
+
+        return view.groupby(list(by), observed=True, sort=True)[MEASURES].sum()
+
+    def counts(self, by, filters=None):
+        return self.rollup([by], filters)['count']
+
+    def arrest_rate(self, by, filters=None):
+        # Percentage of incidents with an arrest, like groupby(by)['Arrest'].mean() * 100
+        totals = self.rollup([by], filters)
+        return totals['arrests'] / totals['count'] * 100
@@ -0,0 +1,164 @@
+import os
+import json
+import hashlib
+import argparse
+import pandas as pd
+from analyzer import schema, cube, etl, taxonomy, instrument
+
+# Cleaned workbook written by 'Data Cleaning.ipynb', or a partitioned directory written by analyzer/etl.py
+SOURCE_PATH = os.environ.get('CRIME_DATA_PATH', r"D:\Data Science\Projects\My Projects\Project 11\Clean Crime Dataset.xlsx")
+
+# Columnar copies of the workbook are kept here and reused until the workbook changes
+CACHE_DIR = os.environ.get('CRIME_CACHE_DIR', os.path.join(os.path.dirname(SOURCE_PATH), '.crime_cache'))
+
+MANIFEST_NAME = 'manifest.json'
+DATASET_NAME = 'crime.parquet'
+
+# Bump when the cached layout or schema changes so old caches are rebuilt
+CACHE_FORMAT = 4
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(cache_dir=CACHE_DIR):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(manifest, cache_dir=CACHE_DIR):
+    # Write to a temp file first so a half-written manifest is never picked up
+    tmp_path = os.path.join(cache_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache_dir, MANIFEST_NAME))
+
+
+def signature_path(path):
+    # A partitioned dataset changes whenever the ETL rewrites its manifest
+    if os.path.isdir(path):
+        return os.path.join(path, etl.MANIFEST_NAME)
+    return path
+
+
+@instrument.traced('read source', rows_out=len)
+def read_source(path=SOURCE_PATH):
+    if os.path.isdir(path):
+        df = pd.read_parquet(path)
+        # Partition columns come back as categoricals of the directory names
+        for column in etl.PARTITION_COLUMNS:
+            df[column] = df[column].astype('int64')
+        return df[[column for column in etl.CLEAN_COLUMNS + taxonomy.columns() if column in df.columns]]
+    if path.lower().endswith('.csv'):
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_excel(path)
+
+    # Parquet needs one type per column, but Excel gives mixed int/str cells for codes like IUCR
+    for column in df.columns:
+        if df[column].dtype == object and df[column].map(type).nunique() > 1:
+            df[column] = df[column].astype(str)
+    return schema.normalize_codes(df)
+
+
+@instrument.traced('build cache', rows_out=lambda manifest: manifest['rows'])
+def build_cache(path=SOURCE_PATH, cache_dir=CACHE_DIR, source_hash=None):
+    os.makedirs(cache_dir, exist_ok=True)
+    # Taxonomy labels are computed once here and stored, instead of on every rerun
+    raw = taxonomy.apply_taxonomy(read_source(path))
+    df, dictionary = schema.apply_schema(raw, schema.load_dictionary(cache_dir))
+    report = schema.memory_report(raw, df)
+    del raw
+
+    tmp_path = os.path.join(cache_dir, DATASET_NAME + '.tmp')
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, os.path.join(cache_dir, DATASET_NAME))
+    schema.save_dictionary(dictionary, cache_dir)
+
+    # Aggregates for the count and arrest-rate charts, so they never scan incidents
+    cube.save_cube(cube.build_cube(df), cache_dir)
+
+    stat = os.stat(signature_path(path))
+    manifest = {
+        'source': os.path.abspath(path),
+        'format': CACHE_FORMAT,
+        'taxonomy': taxonomy.signature(),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': source_hash or file_hash(signature_path(path)),
+        'rows': len(df),
+        'columns': list(df.columns),
+        'memory_report': {column: row.to_dict() for column, row in report.astype(int).iterrows()},
+    }
+    write_manifest(manifest, cache_dir)
+    return manifest
+
+
+def ensure_cache(path=SOURCE_PATH, cache_dir=CACHE_DIR):
+    manifest = read_manifest(cache_dir)
+    stat = os.stat(signature_path(path))
+
+    if manifest is None or manifest.get('source') != os.path.abspath(path) \
+            or manifest.get('format') != CACHE_FORMAT or manifest.get('taxonomy') != taxonomy.signature() \
+            or not os.path.exists(os.path.join(cache_dir, DATASET_NAME)):
+        return build_cache(path, cache_dir)
+
+    # Same mtime and size: trust the cache without reading the workbook
+    if manifest['mtime_ns'] == stat.st_mtime_ns and manifest['size'] == stat.st_size:
+        return manifest
+
+    # The file was touched; only rebuild when its content really changed
+    source_hash = file_hash(signature_path(path))
+    if source_hash != manifest['sha256']:
+        return build_cache(path, cache_dir, source_hash)
+
+    manifest['mtime_ns'] = stat.st_mtime_ns
+    manifest['size'] = stat.st_size
+    write_manifest(manifest, cache_dir)
+    return manifest
+
+
+def data_version(path=SOURCE_PATH, cache_dir=CACHE_DIR):
+    # Short hash of the source content and the taxonomy; changes whenever the cleaned data or its labels change
+    manifest = ensure_cache(path, cache_dir)
+    return hashlib.sha256((manifest['sha256'] + manifest['taxonomy']).encode()).hexdigest()[:16]
+
+
+@instrument.traced('read cache', rows_out=len)
+def load_crime_data(columns=None, path=SOURCE_PATH, cache_dir=CACHE_DIR):
+    manifest = ensure_cache(path, cache_dir)
+    if columns is not None:
+        columns = [column for column in columns if column in manifest['columns']]
+    return pd.read_parquet(os.path.join(cache_dir, DATASET_NAME), columns=columns)
+
+
+def load_crime_cube(path=SOURCE_PATH, cache_dir=CACHE_DIR):
+    ensure_cache(path, cache_dir)
+    return cube.load_cube(cache_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or refresh the columnar cache of the cleaned crime dataset')
+    parser.add_argument('--source', default=SOURCE_PATH)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--force', action='store_true', help='rebuild even if the cache is up to date')
+    parser.add_argument('--report', action='store_true', help='print bytes per column before and after typing')
+    args = parser.parse_args()
+
+    if args.force:
+        manifest = build_cache(args.source, args.cache_dir)
+    else:
+        manifest = ensure_cache(args.source, args.cache_dir)
+    print(f"{manifest['rows']} rows cached in {args.cache_dir} (source {manifest['sha256'][:16]})")
+
+    if args.report:
+        report = pd.DataFrame.from_dict(manifest['memory_report'], orient='index')
+        print(report.to_string())
@@ -0,0 +1,218 @@
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import time
+import pandas as pd
+from analyzer import schema, taxonomy
+
+# Date format of the City of Chicago portal export, e.g. '08/25/2007 09:22:18 AM'
+DATE_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+
+CHUNK_ROWS = 200000
+
+SEASONS = {12: 'Winter', 1: 'Winter', 2: 'Winter',
+           3: 'Spring', 4: 'Spring', 5: 'Spring',
+           6: 'Summer', 7: 'Summer', 8: 'Summer',
+           9: 'Autumn', 10: 'Autumn', 11: 'Autumn'}
+
+# Column order of 'Clean Crime Dataset.xlsx'
+CLEAN_COLUMNS = ['ID', 'Case Number', 'Block', 'IUCR', 'Primary Type', 'Description', 'Location Description',
+                 'Arrest', 'Domestic', 'Beat', 'District', 'Ward', 'Community Area', 'FBI Code',
+                 'X Coordinate', 'Y Coordinate', 'Year', 'Latitude', 'Longitude', 'Time', 'Month', 'Day', 'Hour',
+                 'Updated On Time', 'Updated On Year', 'Updated On Month', 'Updated On Day', 'Season']
+
+PARTITION_COLUMNS = ['Year', 'Month']
+
+MANIFEST_NAME = '_manifest.json'
+
+# Per-run entries of the manifest
+RUN_KEYS = ['source', 'rows_in', 'rows_out', 'files', 'seconds']
+
+
+def read_csv_chunks(path, chunk_rows=CHUNK_ROWS):
+    # Codes like IUCR '0486' and FBI Code '08A' must stay text
+    yield from pd.read_csv(path, chunksize=chunk_rows, dtype={'IUCR': str, 'FBI Code': str, 'Case Number': str})
+
+
+def read_xlsx_chunks(path, chunk_rows=CHUNK_ROWS):
+    from openpyxl import load_workbook
+
+    # read_only streams rows from the sheet XML instead of loading the whole workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(column) for column in next(rows)]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunk_rows:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    if path.lower().endswith('.csv'):
+        return read_csv_chunks(path, chunk_rows)
+    return read_xlsx_chunks(path, chunk_rows)
+
+
+def _parse_dates(series, date_format):
+    # Workbooks may already hold datetime cells; only text is parsed, with the explicit format
+    if pd.api.types.is_string_dtype(series) and not pd.api.types.is_object_dtype(series):
+        return pd.to_datetime(series, format=date_format)
+    if pd.api.types.is_object_dtype(series) and series.map(type).eq(str).all():
+        return pd.to_datetime(series, format=date_format)
+    return pd.to_datetime(series)
+
+
+def clean_chunk(df, date_format=DATE_FORMAT):
+    # Same steps as 'Data Cleaning.ipynb', done once per chunk with the date parsed a single time
+    df = df.dropna(axis=0)
+    df = df.reset_index(drop=True)
+
+    date = _parse_dates(df['Date'], date_format)
+    updated_on = _parse_dates(df['Updated On'], date_format)
+
+    clean = df.drop(columns=['Date', 'Location', 'Updated On'])
+    clean['Time'] = date.dt.strftime('%H:%M:%S')
+    clean['Year'] = date.dt.year
+    clean['Month'] = date.dt.month
+    clean['Day'] = date.dt.day
+    clean['Hour'] = date.dt.hour
+    clean['Updated On Time'] = updated_on.dt.strftime('%H:%M:%S')
+    clean['Updated On Year'] = updated_on.dt.year
+    clean['Updated On Month'] = updated_on.dt.month
+    clean['Updated On Day'] = updated_on.dt.day
+    clean['Season'] = clean['Month'].map(SEASONS)
+
+    clean = schema.normalize_codes(clean)
+    return clean[[column for column in CLEAN_COLUMNS if column in clean.columns]]
+
+
+def write_partitions(df, out_dir, part, prefix='part'):
+    # Hive-style Year=YYYY/Month=M directories, so readers can skip whole months
+    written = []
+    for (year, month), group in df.groupby(PARTITION_COLUMNS, sort=True):
+        partition_dir = os.path.join(out_dir, f'Year={year}', f'Month={month}')
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, f'{prefix}-{part:05d}.parquet')
+        group.drop(columns=PARTITION_COLUMNS).to_parquet(path, index=False)
+        written.append(os.path.relpath(path, out_dir))
+    return written
+
+
+def write_chunk(clean, out_dir, part, dictionary=None, prefix='part'):
+    # Typed like the app's cache; category columns go to disk as text, which Parquet dictionary-encodes
+    typed, dictionary = schema.apply_schema(taxonomy.apply_taxonomy(clean), dictionary)
+    for column in schema.CATEGORICAL_COLUMNS:
+        if column in typed.columns:
+            typed[column] = typed[column].astype(str)
+    return write_partitions(typed, out_dir, part, prefix), dictionary
+
+
+def source_id(source, chunk_size=1 << 20):
+    # Short hash of the source content; names the files of its run, so runs of different
+    # exports into the same directory never share a file name
+    digest = hashlib.sha256()
+    with open(source, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def merge_manifest(previous, run_id, entry):
+    # Runs are kept per source, and the totals cover all of them. A manifest from before runs were
+    # recorded becomes a single earlier run; a rerun of the same source replaces its own entry.
+    runs = {}
+    if previous is not None:
+        runs = previous.get('runs') or {'earlier': {key: previous[key] for key in RUN_KEYS if key in previous}}
+    runs[run_id] = entry
+    return {
+        'source': entry['source'],
+        'run': run_id,
+        'rows_in': sum(run.get('rows_in', 0) for run in runs.values()),
+        'rows_out': sum(run.get('rows_out', 0) for run in runs.values()),
+        'partitioning': PARTITION_COLUMNS,
+        'taxonomy': taxonomy.signature(),
+        'files': sorted(path for run in runs.values() for path in run.get('files', [])),
+        'seconds': entry['seconds'],
+        'runs': runs,
+    }
+
+
+def run(source, out_dir, chunk_rows=CHUNK_ROWS, date_format=DATE_FORMAT, overwrite=False, progress=None):
+    # progress(part, rows_read, rows_kept) is called after each chunk is written.
+    # Without overwrite the rows are added to the dataset already in out_dir.
+    if overwrite and os.path.isdir(out_dir):
+        # The category dictionary is kept so codes stay the same across runs
+        for name in os.listdir(out_dir):
+            if name.startswith('Year='):
+                shutil.rmtree(os.path.join(out_dir, name))
+    os.makedirs(out_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    run_id = source_id(source)
+    previous = None if overwrite else read_manifest(out_dir)
+    if previous is not None:
+        # Files of an earlier run of the same source, which this run replaces
+        for path in previous.get('runs', {}).get(run_id, {}).get('files', []):
+            if os.path.exists(os.path.join(out_dir, path)):
+                os.remove(os.path.join(out_dir, path))
+    dictionary = schema.load_dictionary(out_dir)
+    rows_in = rows_out = 0
+    files = []
+
+    for part, chunk in enumerate(read_chunks(source, chunk_rows)):
+        rows_in += len(chunk)
+        clean = clean_chunk(chunk, date_format)
+        rows_out += len(clean)
+
+        written, dictionary = write_chunk(clean, out_dir, part, dictionary, prefix=f'part-{run_id}')
+        files.extend(written)
+        if progress is not None:
+            progress(part, len(chunk), len(clean))
+
+    schema.save_dictionary(dictionary, out_dir)
+    entry = {
+        'source': os.path.abspath(source),
+        'rows_in': rows_in,
+        'rows_out': rows_out,
+        'files': sorted(files),
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+    manifest = merge_manifest(previous, run_id, entry)
+    tmp_path = os.path.join(out_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_NAME))
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Clean a raw Chicago crime export into Year/Month-partitioned Parquet')
+    parser.add_argument('source', help='raw export (.csv or .xlsx)')
+    parser.add_argument('out_dir', help='output directory for the partitioned dataset')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--date-format', default=DATE_FORMAT)
+    parser.add_argument('--overwrite', action='store_true', help='remove previously written partitions first')
+    args = parser.parse_args()
+
+    manifest = run(args.source, args.out_dir, args.chunk_rows, args.date_format, args.overwrite,
+                   progress=lambda part, read, kept: print(f'chunk {part}: {read} rows read, {kept} kept'))
+    written = manifest['runs'][manifest['run']]
+    print(f"{written['rows_out']} of {written['rows_in']} rows written to {len(written['files'])} files "
+          f"in {written['seconds']}s; the dataset holds {manifest['rows_out']} rows in {len(manifest['files'])} files")
@@ -0,0 +1,204 @@
+import os
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from analyzer import instrument
+
+FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'parquet': 'application/octet-stream',
+}
+
+# Excel sheets hold 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1048575
+
+CHUNK_ROWS = 50000
+
+# Writers take an iterable of DataFrame chunks with the same columns, at least one (possibly empty),
+# and hold one chunk at a time; a backend's chunks() streams the selected rows this way
+
+
+def frame_chunks(df, chunk_rows=CHUNK_ROWS):
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def write_csv(chunks, path):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for number, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=number == 0)
+    return 1
+
+
+def write_xlsx(chunks, path, max_rows=EXCEL_MAX_ROWS):
+    import xlsxwriter
+
+    # constant_memory flushes each row to disk as soon as the next one starts
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    header = []
+    worksheet = None
+    sheets = row = 0
+    try:
+        for chunk in chunks:
+            header = [str(column) for column in chunk.columns]
+            # Plain Python values, with blanks for missing cells
+            values = chunk.astype(object).where(chunk.notna(), None)
+            for record in values.itertuples(index=False, name=None):
+                if worksheet is None or row > max_rows:
+                    sheets += 1
+                    worksheet = workbook.add_worksheet(f'Sheet{sheets}')
+                    worksheet.write_row(0, 0, header)
+                    row = 1
+                worksheet.write_row(row, 0, [value if isinstance(value, (int, float, str, bool)) or value is None
+                                             else str(value) for value in record])
+                row += 1
+        if worksheet is None:
+            sheets = 1
+            workbook.add_worksheet('Sheet1').write_row(0, 0, header)
+    finally:
+        workbook.close()
+    return sheets
+
+
+def write_parquet(chunks, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            elif table.schema != writer.schema:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return 1
+
+
+WRITERS = {'xlsx': write_xlsx, 'csv': write_csv, 'parquet': write_parquet}
+
+
+class ExportResult:
+    def __init__(self, path, fmt, rows, sheets, seconds):
+        self.path = path
+        self.fmt = fmt
+        self.mime = FORMATS[fmt]
+        self.rows = rows
+        self.sheets = sheets
+        self.seconds = seconds
+        self.size = os.path.getsize(path)
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+
+@instrument.traced('export', rows_out=lambda result: result.rows)
+def export_chunks(chunks, fmt, directory=None):
+    if fmt not in WRITERS:
+        raise ValueError(f'Unknown export format {fmt!r}, expected one of {list(WRITERS)}')
+    start = time.perf_counter()
+    handle, path = tempfile.mkstemp(suffix='.' + fmt, dir=directory)
+    os.close(handle)
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+
+    try:
+        sheets = WRITERS[fmt](counted(), path)
+    except Exception:
+        os.remove(path)
+        raise
+    return ExportResult(path, fmt, rows, sheets, time.perf_counter() - start)
+
+
+def export_frame(df, fmt, directory=None, chunk_rows=CHUNK_ROWS):
+    return export_chunks(frame_chunks(df, chunk_rows), fmt, directory)
+
+
+class ExportCache:
+    # Finished exports keyed by (data version, page, filter signature, format), kept as temp files.
+    # The oldest are dropped once more than max_bytes are held; a dropped file that is being read
+    # (leased) is only deleted when its last reader is done.
+    def __init__(self, max_bytes=2 * 1024 ** 3, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.results = OrderedDict()
+        self.leases = {}
+        self.dropped = set()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            result = self.results.get(key)
+            if result is not None:
+                self.results.move_to_end(key)
+            return result
+
+    def get_or_create(self, key, make_chunks, fmt):
+        # make_chunks() gives the rows to write, called only when the file is not held
+        result = self.get(key)
+        if result is None:
+            created = export_chunks(make_chunks(), fmt, self.directory)
+            with self.lock:
+                # Another session may have written the same export meanwhile; the first one is kept
+                result = self.results.setdefault(key, created)
+                self.results.move_to_end(key)
+                if result is not created:
+                    _remove(created.path)
+                self._evict()
+        return result
+
+    def read(self, key, make_chunks, fmt):
+        # Bytes of the export, written again if it was dropped since it was prepared
+        while True:
+            result = self.get_or_create(key, make_chunks, fmt)
+            with self.lock:
+                if self.results.get(key) is not result:
+                    continue
+                self.leases[result.path] = self.leases.get(result.path, 0) + 1
+            try:
+                return result.read()
+            finally:
+                self._release(result.path)
+
+    def _release(self, path):
+        with self.lock:
+            self.leases[path] -= 1
+            if self.leases[path] == 0:
+                del self.leases[path]
+                if path in self.dropped:
+                    self.dropped.discard(path)
+                    _remove(path)
+
+    def _evict(self):
+        while len(self.results) > 1 and sum(result.size for result in self.results.values()) > self.max_bytes:
+            _, result = self.results.popitem(last=False)
+            if result.path in self.leases:
+                self.dropped.add(result.path)
+            else:
+                _remove(result.path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024 or unit == 'GB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
@@ -0,0 +1,237 @@
+import functools
+import pandas as pd
+
+# Charts of the dashboard pages, shared with the batch reports (analyzer/reports.py) and the benchmarks.
+# Each is split into data(crime_query, filters), the aggregate it plots, and draw(ax, values),
+# so the reports can compare the aggregates with the last run before rendering anything.
+
+
+def crime_per_district(crime_query, filters):
+    return crime_query.counts('District', filters)
+
+
+def draw_crime_per_district(ax, crime_per_district):
+    # Plotting the trend
+    crime_per_district.plot(kind='bar', ax=ax)
+    ax.set_xlabel('District')
+    ax.set_ylabel('Number of Crimes')
+
+
+def crime_per_ward(crime_query, filters):
+    return crime_query.counts('Ward', filters)
+
+
+def draw_crime_per_ward(ax, crime_per_ward):
+    # Plotting the trend
+    crime_per_ward.plot(kind='barh', ax=ax, color='skyblue')
+    ax.set_xlabel('Number of Crimes')
+    ax.set_ylabel('Ward')
+
+
+def arrest_rate(column, crime_query, filters):
+    return crime_query.arrest_rate(column, filters).sort_values(ascending=False)
+
+
+def draw_arrest_rate(label, ax, arrest_rate):
+    arrest_rate.plot(kind='bar', ax=ax)
+    ax.set_title(f'Arrest Rate by {label}')
+    ax.set_xlabel(arrest_rate.index.name)
+    ax.set_ylabel('Arrest Rate (%)')
+
+
+def crimes_by_season(crime_query, filters):
+    return crime_query.counts('Season', filters).sort_values(ascending=False)
+
+
+def draw_crimes_by_season(ax, crimes_by_season):
+    # Plot the number of crimes by season
+    crimes_by_season.plot(kind='bar', color=['blue', 'green', 'red', 'orange'], ax=ax)
+    ax.set_title('Number of Crimes by Season')
+    ax.set_xlabel('Season')
+    ax.set_ylabel('Number of Crimes')
+
+
+def crimes_by_type_and_season(crime_query, filters):
+    return crime_query.rollup(['Season', 'Primary Type'], filters)['count'].unstack().fillna(0)
+
+
+def draw_crimes_by_type_and_season(ax, crimes_by_type_and_season):
+    # Imported here so only pages and reports with this chart load seaborn
+    import seaborn as sns
+
+    # Plot a heatmap of crimes by primary type and season
+    sns.heatmap(crimes_by_type_and_season, cmap='YlGnBu', annot=True, fmt='.0f', ax=ax)
+    ax.set_title('Crimes by Primary Type and Season')
+    ax.set_xlabel('Primary Type')
+    ax.set_ylabel('Season')
+
+
+def crime_count_by(column, crime_query, filters):
+    return crime_query.counts(column, filters)
+
+
+def draw_crime_count_by(column, ax, crime_count):
+    crime_count.plot(kind='barh', ax=ax)
+    ax.set_xlabel('Number of Crimes')
+    ax.set_ylabel(column)
+
+
+def crime_per_hour(crime_query, filters):
+    return crime_query.counts('Hour', filters)
+
+
+def draw_crime_per_hour(ax, crime_per_hour):
+    # Plotting the trend
+    crime_per_hour.plot(kind='bar', ax=ax)
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Number of Crimes')
+
+
+def area_crime_types(crime_query, filters):
+    area_crime_types = crime_query.counts('Primary Type', filters).sort_values()
+    return area_crime_types[area_crime_types > 0]
+
+
+def draw_area_crime_types(ax, area_crime_types):
+    area_crime_types.plot(kind='barh', ax=ax)
+    ax.set_xlabel('Number of Crimes')
+    ax.set_ylabel('Primary Type')
+
+
+def crime_per_description(crime_query, filters):
+    return crime_query.counts('Description', filters)
+
+
+def draw_crime_per_description(ax, crime_per_description):
+    # Plotting the trend
+    crime_per_description.plot(kind='barh', ax=ax, color='skyblue')
+    ax.set_xlabel('Number of Crimes')
+    ax.set_ylabel('Description')
+
+
+def severity_distribution(crime_query, filters):
+    return crime_query.rollup(['Severity', 'Primary Type'], filters)['arrests'].unstack()
+
+
+def draw_severity_distribution(ax, crime_distribution):
+    # Detailed distribution of each crime type
+    crime_distribution.T.plot(kind='barh', stacked=True, ax=ax)
+    ax.set_xlabel('Crime Type')
+    ax.set_ylabel('Arrest')
+    ax.set_title('Detailed Distribution of Crime Types by Severity')
+    ax.legend(title='Severity')
+
+
+def domestic_by_type(crime_query, filters):
+    # Calculate the number of domestic and non-domestic incidents by primary type
+    return crime_query.rollup(['Primary Type', 'Domestic'], filters)['count'].unstack('Domestic')
+
+
+def draw_domestic_by_type(ax, crimes_by_type):
+    combined_df = pd.DataFrame({
+        'Domestic': crimes_by_type.get(True),
+        'Non-Domestic': crimes_by_type.get(False)
+    }, index=crimes_by_type.index)
+
+    # Plot the grouped bar chart
+    combined_df.plot(kind='barh', color=['orange', 'blue'], alpha=0.6, ax=ax)
+    ax.set_title('Domestic vs. Non-Domestic Incidents by Crime Type')
+    ax.set_xlabel('Number of Incidents')
+    ax.set_ylabel('Primary Type')
+    ax.legend(title='Crime Type')
+    ax.tick_params(axis='x', rotation=45)  # Rotate x-axis labels for better readability
+
+
+def location_counts(crime_query, filters):
+    return crime_query.counts('Description', filters)
+
+
+def draw_location_counts(ax, location_counts):
+    # Plot the most common locations for crimes
+    location_counts.plot(kind='barh', ax=ax)
+    ax.set_title('Most Common Locations for Crimes')
+    ax.set_xlabel('Frequency')
+    ax.set_ylabel('Location Description')
+
+
+def top_counts(column, crime_query, filters):
+    return crime_query.counts(column, filters).sort_values(ascending=False).head(50)
+
+
+def draw_top_counts(column, ax, top_counts):
+    top_counts.plot(kind='barh', ax=ax)
+    ax.set_title(f'Crimes by {column}')
+    ax.set_xlabel('Number of Crimes')
+    ax.set_ylabel(column)
+
+
+def repeat_crime_count(crime_query, filters):
+    return crime_query.counts('Primary Type', filters)
+
+
+def draw_repeat_crime_count(ax, repeat_crime_count):
+    repeat_crime_count.plot(kind='barh', ax=ax)
+    ax.set_xlabel('Number of Crimes')
+    ax.set_ylabel('Primary Type')
+
+
+# Chart id -> title, grouping columns, figure size, data and draw
+FIGURES = {
+    'crime-per-district': {'title': 'No of Crime across District', 'by': ['District'], 'figsize': (15, 6),
+                           'data': crime_per_district, 'draw': draw_crime_per_district},
+    'crime-per-ward': {'title': 'No of Crime across Ward', 'by': ['Ward'], 'figsize': (15, 10),
+                       'data': crime_per_ward, 'draw': draw_crime_per_ward},
+    'arrest-rate-by-crime-type': {'title': 'Arrest Rate by Crime Type', 'by': ['Primary Type'], 'figsize': (7, 14),
+                                  'data': functools.partial(arrest_rate, 'Primary Type'),
+                                  'draw': functools.partial(draw_arrest_rate, 'Crime Type')},
+    'arrest-rate-by-district': {'title': 'Arrest Rate by District', 'by': ['District'], 'figsize': (7, 14),
+                                'data': functools.partial(arrest_rate, 'District'),
+                                'draw': functools.partial(draw_arrest_rate, 'District')},
+    'arrest-rate-by-ward': {'title': 'Arrest Rate by Ward', 'by': ['Ward'], 'figsize': (7, 14),
+                            'data': functools.partial(arrest_rate, 'Ward'),
+                            'draw': functools.partial(draw_arrest_rate, 'Ward')},
+    'arrest-rate-by-year': {'title': 'Arrest Rate by Year', 'by': ['Year'], 'figsize': (7, 14),
+                            'data': functools.partial(arrest_rate, 'Year'),
+                            'draw': functools.partial(draw_arrest_rate, 'Year')},
+    'crimes-by-season': {'title': 'Number of Crimes by Season', 'by': ['Season'], 'figsize': (14, 10),
+                         'data': crimes_by_season, 'draw': draw_crimes_by_season},
+    'crimes-by-type-and-season': {'title': 'Crimes by Primary Type and Season', 'by': ['Season', 'Primary Type'],
+                                  'figsize': (14, 10), 'data': crimes_by_type_and_season,
+                                  'draw': draw_crimes_by_type_and_season},
+    'crime-count-by-year': {'title': 'Crime Count as Year', 'by': ['Year'], 'figsize': (4, 8),
+                            'data': functools.partial(crime_count_by, 'Year'),
+                            'draw': functools.partial(draw_crime_count_by, 'Year')},
+    'crime-count-by-month': {'title': 'Crime Count by Month', 'by': ['Month'], 'figsize': (4, 8),
+                             'data': functools.partial(crime_count_by, 'Month'),
+                             'draw': functools.partial(draw_crime_count_by, 'Month')},
+    'crime-count-by-day': {'title': 'Crime Count by Day', 'by': ['Day'], 'figsize': (4, 8),
+                           'data': functools.partial(crime_count_by, 'Day'),
+                           'draw': functools.partial(draw_crime_count_by, 'Day')},
+    'crime-per-hour': {'title': 'Peak Crime Hours', 'by': ['Hour'], 'figsize': (15, 4),
+                       'data': crime_per_hour, 'draw': draw_crime_per_hour},
+    'area-crime-types': {'title': 'Crime Types in the Area', 'by': ['Primary Type'], 'figsize': (10, 6),
+                         'data': area_crime_types, 'draw': draw_area_crime_types},
+    'crime-per-description': {'title': 'No of Crime across Description', 'by': ['Description'], 'figsize': (15, 25),
+                              'data': crime_per_description, 'draw': draw_crime_per_description},
+    'severity-distribution': {'title': 'Detailed Distribution of Crime Types by Severity',
+                              'by': ['Severity', 'Primary Type'], 'figsize': (14, 8),
+                              'data': severity_distribution, 'draw': draw_severity_distribution},
+    'domestic-by-type': {'title': 'Domestic vs. Non-Domestic Incidents by Crime Type', 'by': ['Primary Type', 'Domestic'],
+                         'figsize': (14, 7), 'data': domestic_by_type, 'draw': draw_domestic_by_type},
+    'location-description-counts': {'title': 'Most Common Locations for Crimes', 'by': ['Description'],
+                                    'figsize': (14, 15), 'data': location_counts, 'draw': draw_location_counts},
+    'crimes-by-beat': {'title': 'Crimes by Beat', 'by': ['Beat'], 'figsize': (7, 25),
+                       'data': functools.partial(top_counts, 'Beat'),
+                       'draw': functools.partial(draw_top_counts, 'Beat')},
+    'crimes-by-community-area': {'title': 'Crimes by Community Area', 'by': ['Community Area'], 'figsize': (7, 25),
+                                 'data': functools.partial(top_counts, 'Community Area'),
+                                 'draw': functools.partial(draw_top_counts, 'Community Area')},
+    'repeat-crime-count': {'title': 'Repeat No of Crime', 'by': ['Primary Type'], 'figsize': (15, 6),
+                           'data': repeat_crime_count, 'draw': draw_repeat_crime_count},
+}
+
+
+def drawer(chart_id, crime_query, filters):
+    # draw(ax) for charts.render_png; the backend is only queried when the chart is actually rendered
+    figure = FIGURES[chart_id]
+    return lambda ax: figure['draw'](ax, figure['data'](crime_query, filters))
@@ -0,0 +1,149 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from analyzer.spatial import AREA
+
+# Multiselect value meaning "no filter on this column"
+ALL = 'All'
+
+FILTER_COLUMNS = ['Year', 'Month', 'Day', 'Primary Type', 'District', 'Ward', 'Beat', 'Location Description', 'Season',
+                  'Severity']
+
+# Columns with more distinct values than this keep a code array instead of one bitmap per value,
+# since each bitmap costs rows / 8 bytes
+MAX_BITMAP_CARDINALITY = 64
+
+# Selections whose row positions are kept for reuse
+RECENT_SELECTIONS = 8
+
+# Number of set bits in every possible byte
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype='uint8')
+
+
+def active_filters(filters):
+    # Drop columns where nothing is selected or 'All' is selected
+    return {column: list(values) for column, values in (filters or {}).items()
+            if values is not None and ALL not in values}
+
+
+def filter_signature(filters):
+    # Stable short key for a filter selection, usable in cache keys. An area keeps its order: it is a shape, not a set.
+    normalized = {column: [str(value) for value in values] if column == AREA else sorted(str(value) for value in values)
+                  for column, values in active_filters(filters).items()}
+    return hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _codes(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), list(series.cat.categories)
+    codes, uniques = pd.factorize(series, sort=True)
+    return codes, list(uniques)
+
+
+def _in_bits(bits, rows):
+    # Whether each of the row positions is set in a packed row mask
+    return (bits[rows >> 3] >> (7 - (rows & 7)).astype('uint8')) & 1 == 1
+
+
+class BitmapIndex:
+    # area_rows(area) returns the ascending row positions inside an area filter (analyzer/spatial.py);
+    # without it, area filters are rejected
+    def __init__(self, df, columns=FILTER_COLUMNS, max_cardinality=MAX_BITMAP_CARDINALITY, area_rows=None):
+        self.rows = len(df)
+        self.area_rows = area_rows
+        self.recent = OrderedDict()
+        self.lock = threading.Lock()
+        self.bitmaps = {}
+        self.codes = {}
+        self.values = {}
+
+        for column in columns:
+            if column not in df.columns:
+                continue
+            codes, uniques = _codes(df[column])
+            self.values[column] = {value: code for code, value in enumerate(uniques)}
+            if len(uniques) <= max_cardinality:
+                # One packed bitmap per value: bit i is set when row i has that value
+                self.bitmaps[column] = np.stack([np.packbits(codes == code) for code in range(len(uniques))]) \
+                    if len(uniques) else np.zeros((0, (self.rows + 7) // 8), dtype='uint8')
+            else:
+                dtype = np.min_scalar_type(max(len(uniques), 1))
+                self.codes[column] = np.where(codes < 0, len(uniques), codes).astype(dtype)
+
+    def nbytes(self):
+        return sum(bitmap.nbytes for bitmap in self.bitmaps.values()) + sum(codes.nbytes for codes in self.codes.values())
+
+    def _column_bits(self, column, values):
+        lookup = self.values[column]
+        selected = [lookup[value] for value in values if value in lookup]
+
+        if column in self.bitmaps:
+            if not selected:
+                return np.zeros(self.bitmaps[column].shape[1], dtype='uint8')
+            # OR of the selected values' bitmaps
+            return np.bitwise_or.reduce(self.bitmaps[column][selected], axis=0)
+
+        codes = self.codes[column]
+        keep = np.zeros(len(lookup) + 1, dtype=bool)
+        keep[selected] = True
+        return np.packbits(keep[codes])
+
+    def bits(self, filters):
+        # Packed row mask for the selection (AND across columns), or None when every row is selected
+        result = None
+        for column, values in active_filters(filters).items():
+            if column not in self.values:
+                raise KeyError(f'{column} is not indexed')
+            column_bits = self._column_bits(column, values)
+            result = column_bits if result is None else result & column_bits
+        return result
+
+    def _area(self, filters):
+        # Rows of the area filter (None without one) and the remaining filters
+        area = active_filters(filters).get(AREA)
+        if area is None:
+            return None, filters
+        if self.area_rows is None:
+            raise KeyError(f'{AREA} is not indexed')
+        return self.area_rows(area), {column: values for column, values in filters.items() if column != AREA}
+
+    def count(self, filters):
+        area_rows, filters = self._area(filters)
+        bits = self.bits(filters)
+        if area_rows is not None:
+            # Only the rows inside the area are looked up in the mask
+            return len(area_rows) if bits is None else int(_in_bits(bits, area_rows).sum())
+        if bits is None:
+            return self.rows
+        return int(POPCOUNT[bits].sum(dtype='int64'))
+
+    def indices(self, filters):
+        # Row positions of the selection, or None when every row is selected.
+        # The last few selections used are remembered since a rerun asks for the same one several times.
+        signature = filter_signature(filters)
+        with self.lock:
+            if signature in self.recent:
+                self.recent.move_to_end(signature)
+                return self.recent[signature]
+
+        area_rows, rest = self._area(filters)
+        bits = self.bits(rest)
+        if area_rows is not None:
+            indices = area_rows if bits is None else area_rows[_in_bits(bits, area_rows)]
+        else:
+            indices = None if bits is None else np.flatnonzero(np.unpackbits(bits, count=self.rows))
+        with self.lock:
+            self.recent[signature] = indices
+            while len(self.recent) > RECENT_SELECTIONS:
+                self.recent.popitem(last=False)
+        return indices
+
+    def select(self, df, filters):
+        # The frame itself when nothing is filtered, otherwise only the selected rows
+        indices = self.indices(filters)
+        if indices is None:
+            return df
+        return df.take(indices)
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from analyzer import data, query
+
+# Series level -> key columns; one count series per combination of values that has incidents
+LEVELS = {'district-type': ['District', 'Primary Type'], 'beat': ['Beat']}
+
+# Period length in days, seasonal cycle in periods (a year of weeks, a week of days),
+# periods forecast ahead and periods of history kept for the charts
+FREQUENCIES = {
+    'W': {'days': 7, 'season': 52, 'horizon': 4, 'history': 156},
+    'D': {'days': 1, 'season': 7, 'horizon': 14, 'history': 365},
+}
+
+# Smoothing parameters tried for every series at once; each series keeps the combination with the
+# lowest one-step-ahead squared error over its history
+ALPHAS = [0.05, 0.1, 0.2, 0.4, 0.7]
+BETAS = [0.0, 0.01, 0.05]
+GAMMAS = [0.05, 0.15, 0.3]
+
+# Series fitted together in one array; bounds the (parameters x series x season) state a worker holds
+SERIES_PER_TASK = 1000
+
+# Two-sided 95% interval
+Z = 1.96
+
+FORECAST_DIR = os.environ.get('CRIME_FORECAST_DIR', os.path.join(data.CACHE_DIR, 'forecasts'))
+
+# 1970-01-05, day 4 of the epoch, was a Monday; weeks run Monday to Sunday
+_MONDAY = 4
+
+
+def build_series(crime_query, level, frequency='W'):
+    # Count matrix (series x periods), the key values of each series and the first day of each period.
+    # A trailing week that is not complete yet is left out, since it would look like a drop.
+    keys = LEVELS[level]
+    step = FREQUENCIES[frequency]['days']
+    totals = crime_query.rollup(keys + ['Year', 'Month', 'Day'])['count']
+    frame = totals[totals > 0].reset_index()
+    if frame.empty:
+        return np.zeros((0, 0)), frame[keys], np.array([], dtype='datetime64[D]')
+    days = pd.to_datetime(pd.DataFrame({'year': frame['Year'], 'month': frame['Month'], 'day': frame['Day']}))
+    days = days.to_numpy().astype('datetime64[D]').astype('int64')
+    offset = _MONDAY if step == 7 else 0
+    periods = (days - offset) // step
+    first, last = int(periods.min()), int(periods.max())
+    if (int(days.max()) - offset) % step != step - 1:
+        last -= 1
+    keep = periods <= last
+
+    grouped = frame[keep].groupby(keys, observed=True, sort=True)
+    series = grouped.size().index.to_frame(index=False)
+    values = np.zeros((len(series), max(last - first + 1, 0)), dtype='float64')
+    np.add.at(values, (grouped.ngroup().to_numpy(), periods[keep] - first), frame['count'].to_numpy()[keep])
+    starts = (np.arange(first, last + 1) * step + offset).astype('datetime64[D]')
+    return values, series, starts
+
+
+def parameter_grid(alphas=ALPHAS, betas=BETAS, gammas=GAMMAS):
+    return np.array(list(itertools.product(alphas, betas, gammas)), dtype='float64')
+
+
+def fit_holt_winters(values, season, horizon, grid):
+    # Additive Holt-Winters in error-correction form, run for every parameter combination and every series
+    # at once: the state arrays are (combinations x series), so the only Python loop is over time.
+    #   level  l = l + b + alpha * e
+    #   trend  b = b + beta * e
+    #   season s = s + gamma * e,    e = y - (l + b + s)
+    # Series shorter than two seasonal cycles are fitted without the seasonal term.
+    n_series, n_periods = values.shape
+    season = season if n_periods >= 2 * season else 0
+    alpha, beta, gamma = (grid[:, column, None] for column in range(3))
+    combinations = len(grid)
+
+    if season:
+        first = values[:, :season].mean(axis=1)
+        level = np.broadcast_to(first, (combinations, n_series)).copy()
+        trend = np.broadcast_to((values[:, season:2 * season].mean(axis=1) - first) / season,
+                                (combinations, n_series)).copy()
+        seasonal = np.broadcast_to(values[:, :season] - first[:, None], (combinations, n_series, season)).copy()
+        start = season
+    else:
+        level = np.broadcast_to(values[:, 0], (combinations, n_series)).copy()
+        trend = np.zeros((combinations, n_series))
+        seasonal = None
+        start = 1
+
+    # Errors while the states settle from their initial guesses are left out of the fit and the interval
+    scored = start + max(season, 1) if n_periods - start > 2 * max(season, 1) else start
+    sse = np.zeros((combinations, n_series))
+    for t in range(start, n_periods):
+        seasonal_t = seasonal[:, :, t % season] if season else 0
+        error = values[:, t] - (level + trend + seasonal_t)
+        if t >= scored:
+            sse += error ** 2
+        level = level + trend + alpha * error
+        trend = trend + beta * error
+        if season:
+            seasonal[:, :, t % season] = seasonal_t + gamma * error
+
+    best = sse.argmin(axis=0)
+    series_index = np.arange(n_series)
+    steps = np.arange(1, horizon + 1)
+    forecast = level[best, series_index][:, None] + trend[best, series_index][:, None] * steps
+    if season:
+        forecast += seasonal[best, series_index][:, (n_periods + steps - 1) % season]
+    sigma = np.sqrt(sse[best, series_index] / max(n_periods - scored, 1))
+    # Forecast variance of additive Holt-Winters: sigma^2 * (1 + sum over j < h of c_j^2),
+    # c_j = alpha + beta * j (+ gamma once a full season ahead); counts cannot go below zero
+    alpha, beta, gamma = (grid[best, column][:, None] for column in range(3))
+    ahead = steps[None, :-1]
+    c = alpha + beta * ahead + (gamma * (ahead % season == 0) if season else 0)
+    variance = 1 + np.concatenate([np.zeros((n_series, 1)), np.cumsum(c ** 2, axis=1)], axis=1)
+    spread = Z * sigma[:, None] * np.sqrt(variance)
+    return {
+        'forecast': np.clip(forecast, 0, None),
+        'lower': np.clip(forecast - spread, 0, None),
+        'upper': np.clip(forecast + spread, 0, None),
+        'params': grid[best],
+        'sigma': sigma,
+        'seasonal': bool(season),
+    }
+
+
+def _fit_chunk(values, season, horizon, grid):
+    return fit_holt_winters(values, season, horizon, grid)
+
+
+def fit_all(values, season, horizon, grid=None, workers=None, series_per_task=SERIES_PER_TASK):
+    # Chunks of series are fitted in parallel, each chunk vectorized; at least one chunk per worker
+    grid = parameter_grid() if grid is None else grid
+    workers = workers or os.cpu_count() or 1
+    size = max(1, min(series_per_task, -(-len(values) // workers)))
+    chunks = [values[start:start + size] for start in range(0, len(values), size)]
+    workers = max(1, min(workers, len(chunks) or 1))
+    if not chunks:
+        empty = np.zeros((0, horizon))
+        return {'forecast': empty, 'lower': empty, 'upper': empty, 'params': np.zeros((0, 3)), 'sigma': np.zeros(0),
+                'seasonal': False}
+    if workers == 1:
+        results = [_fit_chunk(chunk, season, horizon, grid) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_fit_chunk, chunks, itertools.repeat(season), itertools.repeat(horizon),
+                                        itertools.repeat(grid)))
+    fitted = {name: np.concatenate([result[name] for result in results])
+              for name in ['forecast', 'lower', 'upper', 'params', 'sigma']}
+    fitted['seasonal'] = results[0]['seasonal']
+    return fitted
+
+
+def forecast_paths(level, frequency, data_version, forecast_dir=FORECAST_DIR):
+    base = os.path.join(forecast_dir, f'{level}-{frequency}-{data_version}')
+    return {'values': base + '.npz', 'series': base + '.parquet', 'meta': base + '.json'}
+
+
+def build_forecast(crime_query, level, frequency='W', forecast_dir=FORECAST_DIR, workers=None):
+    settings = FREQUENCIES[frequency]
+    start = time.perf_counter()
+    values, series, starts = build_series(crime_query, level, frequency)
+    fitted = fit_all(values, settings['season'], settings['horizon'], workers=workers)
+    seconds = time.perf_counter() - start
+
+    series = series.assign(alpha=fitted['params'][:, 0], beta=fitted['params'][:, 1], gamma=fitted['params'][:, 2],
+                           sigma=fitted['sigma'])
+    future = starts[-1] + np.arange(1, settings['horizon'] + 1) * settings['days'] if len(starts) else starts
+    paths = forecast_paths(level, frequency, crime_query.version, forecast_dir)
+    os.makedirs(forecast_dir, exist_ok=True)
+    # Written under temporary names and moved into place, meta last, so readers never see half a forecast
+    np.savez(paths['values'] + '.tmp.npz', history=values[:, -settings['history']:].astype('float32'),
+             history_starts=starts[-settings['history']:], forecast=fitted['forecast'], lower=fitted['lower'],
+             upper=fitted['upper'], forecast_starts=future)
+    os.replace(paths['values'] + '.tmp.npz', paths['values'])
+    series.to_parquet(paths['series'] + '.tmp', index=False)
+    os.replace(paths['series'] + '.tmp', paths['series'])
+    meta = {
+        'level': level,
+        'frequency': frequency,
+        'data_version': crime_query.version,
+        'series': len(series),
+        'periods': values.shape[1],
+        'first_period': str(starts[0]) if len(starts) else None,
+        'last_period': str(starts[-1]) if len(starts) else None,
+        'season': settings['season'] if fitted['seasonal'] else 0,
+        'horizon': settings['horizon'],
+        'parameter_combinations': len(parameter_grid()),
+        'seconds': round(seconds, 2),
+    }
+    with open(paths['meta'] + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(paths['meta'] + '.tmp', paths['meta'])
+    return paths
+
+
+def load_forecast(paths):
+    with open(paths['meta']) as f:
+        meta = json.load(f)
+    with np.load(paths['values']) as values:
+        arrays = {name: values[name] for name in values.files}
+    return pd.read_parquet(paths['series']), arrays, meta
+
+
+def ensure_forecast(crime_query, level, frequency='W', forecast_dir=FORECAST_DIR, workers=None):
+    # The forecast of this data version, fitted only when it has not been written yet
+    paths = forecast_paths(level, frequency, crime_query.version, forecast_dir)
+    if not os.path.exists(paths['meta']):
+        build_forecast(crime_query, level, frequency, forecast_dir, workers)
+    return load_forecast(paths)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fit Holt-Winters forecasts for every district x crime type or beat series')
+    parser.add_argument('--source', default=data.SOURCE_PATH)
+    parser.add_argument('--backend', default=query.BACKEND, choices=query.BACKENDS)
+    parser.add_argument('--level', nargs='+', default=list(LEVELS), choices=list(LEVELS))
+    parser.add_argument('--frequency', nargs='+', default=['W'], choices=list(FREQUENCIES))
+    parser.add_argument('--forecast-dir', default=FORECAST_DIR)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    backend = query.open_backend(args.backend, args.source)
+    for level in args.level:
+        for frequency in args.frequency:
+            paths = build_forecast(backend, level, frequency, args.forecast_dir, args.workers)
+            _, _, meta = load_forecast(paths)
+            print(f"{level} {frequency}: {meta['series']} series x {meta['periods']} periods to {meta['last_period']}, "
+                  f"{meta['horizon']} ahead in {meta['seconds']}s")
@@ -0,0 +1,54 @@
+import numpy as np
+from analyzer import instrument
+
+# Grid cell size in degrees; 0.001 deg is roughly 110 m north-south in Chicago
+DEFAULT_RESOLUTION = 0.001
+
+# Upper bound on points embedded in the map HTML (about 30 bytes each)
+DEFAULT_MAX_POINTS = 20000
+
+
+@instrument.traced('heatmap payload', rows_in=lambda latitude, *args, **kwargs: len(latitude),
+                  rows_out=lambda result: len(result[0]))
+def build_heat_payload(latitude, longitude, resolution=DEFAULT_RESOLUTION, max_points=DEFAULT_MAX_POINTS):
+    # Bin incidents into a lat/lon grid and return [lat, lon, weight] per occupied cell.
+    # The grid is coarsened until it fits in max_points; the resolution actually used is returned too.
+    latitude = np.asarray(latitude, dtype='float64')
+    longitude = np.asarray(longitude, dtype='float64')
+    valid = np.isfinite(latitude) & np.isfinite(longitude)
+    latitude, longitude = latitude[valid], longitude[valid]
+
+    if len(latitude) == 0:
+        return [], resolution
+
+    while True:
+        lat_cell = np.floor(latitude / resolution).astype('int64')
+        lon_cell = np.floor(longitude / resolution).astype('int64')
+        lat_min, lon_min = lat_cell.min(), lon_cell.min()
+        width = lon_cell.max() - lon_min + 1
+
+        # One integer key per cell so a single np.unique does the counting
+        keys = (lat_cell - lat_min) * width + (lon_cell - lon_min)
+        cells, counts = np.unique(keys, return_counts=True)
+        if len(cells) <= max_points:
+            break
+        resolution *= 2
+
+    cell_lat = (cells // width + lat_min + 0.5) * resolution
+    cell_lon = (cells % width + lon_min + 0.5) * resolution
+    weights = counts / counts.max()
+
+    payload = np.column_stack([cell_lat, cell_lon, weights]).round(5)
+    return payload.tolist(), resolution
+
+
+def heat_map(latitude, longitude, resolution=DEFAULT_RESOLUTION, max_points=DEFAULT_MAX_POINTS):
+    # The Crime Hotspots map: centred on the incidents, with their grid cells as a HeatMap layer.
+    # Returns the map, the number of cells and the resolution used.
+    import folium
+    from folium.plugins import HeatMap
+
+    heat_data, used_resolution = build_heat_payload(latitude, longitude, resolution, max_points)
+    crime_map = folium.Map(location=[float(np.nanmean(latitude)), float(np.nanmean(longitude))], zoom_start=12)
+    HeatMap(heat_data).add_to(crime_map)
+    return crime_map, len(heat_data), used_resolution
@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import time
+import uuid
+import functools
+import threading
+from contextlib import contextmanager
+
+# Span records are appended here as JSON lines ('-' for stderr); unset keeps them in memory only
+LOG_PATH = os.environ.get('CRIME_TIMING_LOG')
+
+# Reruns kept per session for the diagnostics panel
+HISTORY = 20
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# Each Streamlit session reruns the script in its own thread, so the active trace is per thread
+_LOCAL = threading.local()
+_LOG_LOCK = threading.Lock()
+
+
+def new_id():
+    return uuid.uuid4().hex[:12]
+
+
+def rss_bytes():
+    # Resident memory of the process; /proc on Linux, psutil elsewhere when installed, else None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+def peak_rss_bytes():
+    # High-water mark of the process's resident memory; getrusage on Unix (kB on Linux, bytes on macOS),
+    # psutil's peak working set on Windows when installed, else None
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+
+
+class Span:
+    def __init__(self, name, index=0, depth=0, parent=None, rows_in=None):
+        self.name = name
+        self.index = index
+        self.depth = depth
+        self.parent = parent
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.started = time.time()
+        self.seconds = None
+        self.cpu_seconds = None
+        self.memory_delta = None
+        self.rss = None
+
+    def to_dict(self):
+        mb = 1024 ** 2
+        return {
+            'span': self.name,
+            'id': self.index,
+            'parent': self.parent,
+            'depth': self.depth,
+            'seconds': None if self.seconds is None else round(self.seconds, 6),
+            'cpu_seconds': None if self.cpu_seconds is None else round(self.cpu_seconds, 6),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'memory_delta_mb': None if self.memory_delta is None else round(self.memory_delta / mb, 3),
+            'rss_mb': None if self.rss is None else round(self.rss / mb, 1),
+        }
+
+
+class Trace:
+    # The spans of one script rerun, in the order they started; nested spans carry their parent's id
+    def __init__(self, page, session=None):
+        self.run = new_id()
+        self.page = page
+        self.session = session
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.spans = []
+        self.stack = []
+
+    @contextmanager
+    def span(self, name, rows_in=None):
+        current = Span(name, len(self.spans), len(self.stack), self.stack[-1].index if self.stack else None, rows_in)
+        self.spans.append(current)
+        self.stack.append(current)
+        rss = rss_bytes()
+        cpu = time.thread_time()
+        start = time.perf_counter()
+        try:
+            yield current
+        finally:
+            current.seconds = time.perf_counter() - start
+            current.cpu_seconds = time.thread_time() - cpu
+            current.rss = rss_bytes()
+            if rss is not None and current.rss is not None:
+                current.memory_delta = current.rss - rss
+            self.stack.pop()
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.start
+        return self
+
+    def records(self):
+        # One record per span plus a 'rerun' record with the total, each tagged with the run, session and page
+        base = {'run': self.run, 'session': self.session, 'page': self.page}
+        records = [{'ts': _timestamp(span.started), **base, **span.to_dict()} for span in self.spans]
+        rss = rss_bytes()
+        records.append({'ts': _timestamp(self.started), **base, 'span': 'rerun', 'id': None, 'parent': None, 'depth': -1,
+                        'seconds': None if self.seconds is None else round(self.seconds, 6), 'spans': len(self.spans),
+                        'rss_mb': None if rss is None else round(rss / 1024 ** 2, 1)})
+        return records
+
+
+def _timestamp(seconds):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds)) + f'.{int(seconds % 1 * 1000):03d}Z'
+
+
+def write_records(records, path=LOG_PATH):
+    if not path:
+        return
+    lines = ''.join(json.dumps(record, default=str) + '\n' for record in records)
+    with _LOG_LOCK:
+        if path == '-':
+            sys.stderr.write(lines)
+        else:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+
+
+def start_trace(page, session=None):
+    _LOCAL.trace = Trace(page, session)
+    return _LOCAL.trace
+
+
+def current_trace():
+    return getattr(_LOCAL, 'trace', None)
+
+
+def finish_trace(path=LOG_PATH):
+    # Ends the thread's trace and writes its records; None when no trace was started
+    trace = current_trace()
+    if trace is None:
+        return None
+    _LOCAL.trace = None
+    trace.finish()
+    write_records(trace.records(), path)
+    return trace
+
+
+@contextmanager
+def span(name, rows_in=None):
+    # Timed block of the current trace; outside a trace the span is still yielded but not recorded
+    trace = current_trace()
+    if trace is None:
+        yield Span(name, rows_in=rows_in)
+        return
+    with trace.span(name, rows_in) as current:
+        yield current
+
+
+def traced(name, rows_in=None, rows_out=None):
+    # Decorator form of span(); rows_in is called with the function's arguments, rows_out with its result
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if current_trace() is None:
+                return function(*args, **kwargs)
+            with span(name, rows_in(*args, **kwargs) if rows_in else None) as current:
+                result = function(*args, **kwargs)
+                if rows_out:
+                    current.rows_out = rows_out(result)
+                return result
+        return wrapper
+    return decorate
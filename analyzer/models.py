@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import glob
+import argparse
+import numpy as np
+import pandas as pd
+from analyzer import data, heatmap, query
+
+# Feature columns of the models in 'Visualize.ipynb'; the target is whether the incident led to an arrest
+FEATURES = ['Primary Type', 'Location Description', 'Domestic', 'District', 'Ward', 'Community Area', 'Year',
+            'Latitude', 'Longitude', 'Month', 'Day', 'Hour', 'Season']
+TARGET = 'Arrest'
+
+# Text and boolean columns are numbered 1..n like the notebook's primary_mapping / location_mapping;
+# values unseen at training time encode as 0
+MAPPED_COLUMNS = ['Primary Type', 'Location Description', 'Season', 'Domestic']
+
+# The notebook shifts Longitude by +180 so every feature is positive
+LONGITUDE_OFFSET = 180
+
+MODEL_DIR = os.environ.get('CRIME_MODEL_DIR', os.path.join(data.CACHE_DIR, 'models'))
+LATEST_NAME = 'LATEST'
+MODEL_NAME = 'model.joblib'
+ENCODER_NAME = 'encoder.json'
+META_NAME = 'meta.json'
+
+ALGORITHMS = ['random_forest', 'decision_tree']
+
+# Rows per predict_proba call when scoring
+SCORE_CHUNK_ROWS = 200000
+
+# Columns of a risk table: one row per map cell and time slot
+RISK_KEYS = ['Latitude', 'Longitude', 'Hour', 'Day', 'Month']
+
+
+def make_model(algorithm, **params):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    if algorithm == 'random_forest':
+        return RandomForestClassifier(**{'n_estimators': 200, 'random_state': 42, **params})
+    if algorithm == 'decision_tree':
+        return DecisionTreeClassifier(**{'random_state': 42, **params})
+    raise ValueError(f'Unknown algorithm {algorithm!r}, expected one of {ALGORITHMS}')
+
+
+class FeatureEncoder:
+    def __init__(self, mappings=None, longitude_offset=LONGITUDE_OFFSET, features=FEATURES):
+        self.mappings = mappings or {}
+        self.longitude_offset = longitude_offset
+        self.features = list(features)
+
+    def fit(self, df):
+        for column in MAPPED_COLUMNS:
+            if column in self.features:
+                values = sorted(str(value) for value in pd.unique(df[column].dropna()))
+                self.mappings[column] = {value: code + 1 for code, value in enumerate(values)}
+        return self
+
+    def transform(self, df):
+        columns = []
+        for column in self.features:
+            if column in self.mappings:
+                codes = df[column].astype(str).map(self.mappings[column]).fillna(0)
+                columns.append(codes.to_numpy(dtype='float32'))
+            elif column == 'Longitude':
+                columns.append(df[column].to_numpy(dtype='float32') + self.longitude_offset)
+            else:
+                columns.append(df[column].to_numpy(dtype='float32'))
+        return np.column_stack(columns)
+
+    def to_dict(self):
+        return {'features': self.features, 'mappings': self.mappings, 'longitude_offset': self.longitude_offset}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(values['mappings'], values['longitude_offset'], values['features'])
+
+
+def training_frame(df):
+    df = df.dropna(subset=FEATURES + [TARGET])
+    return df, df[TARGET].to_numpy(dtype=bool)
+
+
+def evaluate(y_true, y_pred):
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+
+    return {
+        'accuracy': float(accuracy_score(y_true, y_pred)),
+        'precision': float(precision_score(y_true, y_pred, average='macro', zero_division=0)),
+        'recall': float(recall_score(y_true, y_pred, average='macro', zero_division=0)),
+        'f1': float(f1_score(y_true, y_pred, average='macro', zero_division=0)),
+    }
+
+
+def train(df, algorithm='random_forest', params=None, test_size=0.2, random_state=72):
+    # Same hold-out split as the notebook; metrics are on the held-out rows only
+    from sklearn.model_selection import train_test_split
+
+    df, y = training_frame(df)
+    encoder = FeatureEncoder().fit(df)
+    X = encoder.transform(df)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+
+    start = time.perf_counter()
+    model = make_model(algorithm, **(params or {}))
+    model.fit(X_train, y_train)
+    meta = {
+        'algorithm': algorithm,
+        'params': params or {},
+        'rows': len(df),
+        'train_seconds': round(time.perf_counter() - start, 2),
+        'metrics': evaluate(y_test, model.predict(X_test)),
+    }
+    return model, encoder, meta
+
+
+def _write_json(values, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(values, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def save_artifact(model, encoder, meta, data_version, model_dir=MODEL_DIR):
+    # Each artifact is a directory that is never modified afterwards; LATEST names the newest one
+    import joblib
+
+    # Microseconds keep names unique and in save order; a directory that exists already is never reused
+    while True:
+        now = time.time()
+        version = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now % 1 * 1e6):06d}-{data_version[:8]}"
+        artifact_dir = os.path.join(model_dir, version)
+        try:
+            os.makedirs(artifact_dir, exist_ok=False)
+            break
+        except FileExistsError:
+            continue
+    joblib.dump(model, os.path.join(artifact_dir, MODEL_NAME))
+    _write_json(encoder.to_dict(), os.path.join(artifact_dir, ENCODER_NAME))
+    _write_json({**meta, 'version': version, 'data_version': data_version}, os.path.join(artifact_dir, META_NAME))
+    with open(os.path.join(model_dir, LATEST_NAME + '.tmp'), 'w') as f:
+        f.write(version)
+    os.replace(os.path.join(model_dir, LATEST_NAME + '.tmp'), os.path.join(model_dir, LATEST_NAME))
+    return version
+
+
+def latest_version(model_dir=MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, LATEST_NAME)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def list_artifacts(model_dir=MODEL_DIR):
+    artifacts = []
+    for meta_path in sorted(glob.glob(os.path.join(model_dir, '*', META_NAME))):
+        with open(meta_path) as f:
+            artifacts.append(json.load(f))
+    return artifacts
+
+
+def load_artifact(version=None, model_dir=MODEL_DIR):
+    import joblib
+
+    version = version or latest_version(model_dir)
+    if version is None:
+        raise FileNotFoundError(f'No trained model in {model_dir}')
+    artifact_dir = os.path.join(model_dir, version)
+    with open(os.path.join(artifact_dir, ENCODER_NAME)) as f:
+        encoder = FeatureEncoder.from_dict(json.load(f))
+    with open(os.path.join(artifact_dir, META_NAME)) as f:
+        meta = json.load(f)
+    return joblib.load(os.path.join(artifact_dir, MODEL_NAME)), encoder, meta
+
+
+def predict_risk(model, encoder, df, chunk_rows=SCORE_CHUNK_ROWS):
+    # Probability of the positive class, a chunk of rows at a time so the feature matrix stays small
+    risk = np.empty(len(df), dtype='float32')
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        risk[start:start + len(chunk)] = model.predict_proba(encoder.transform(chunk))[:, 1]
+    return risk
+
+
+def score(df, model, encoder, resolution=heatmap.DEFAULT_RESOLUTION, chunk_rows=SCORE_CHUNK_ROWS):
+    # Risk table: incidents grouped by map cell (cell centre, resolution in degrees) and time slot,
+    # with the mean predicted probability and the share of incidents predicted positive
+    df = df.dropna(subset=FEATURES)
+    risk = predict_risk(model, encoder, df, chunk_rows)
+    scored = pd.DataFrame({
+        'Latitude': ((np.floor(df['Latitude'].to_numpy(dtype='float64') / resolution) + 0.5) * resolution).astype('float32'),
+        'Longitude': ((np.floor(df['Longitude'].to_numpy(dtype='float64') / resolution) + 0.5) * resolution).astype('float32'),
+        'Hour': df['Hour'].to_numpy(),
+        'Day': df['Day'].to_numpy(),
+        'Month': df['Month'].to_numpy(),
+        'risk': risk,
+        'predicted': risk >= 0.5,
+    })
+    table = scored.groupby(RISK_KEYS, sort=False).agg(
+        incidents=('risk', 'size'), predicted=('predicted', 'mean'), risk=('risk', 'mean')).reset_index()
+    table['predicted'] = table['predicted'].astype('float32')
+    table['risk'] = table['risk'].astype('float32')
+    return table
+
+
+def risk_table_path(version, data_version, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, version, f'risk-{data_version}.parquet')
+
+
+def write_risk_table(table, version, data_version, model_dir=MODEL_DIR):
+    path = risk_table_path(version, data_version, model_dir)
+    table.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def find_risk_table(data_version, model_dir=MODEL_DIR):
+    # Risk table of the latest model for this data version, else its most recent one, else None
+    version = latest_version(model_dir)
+    if version is None:
+        return None
+    path = risk_table_path(version, data_version, model_dir)
+    if os.path.exists(path):
+        return path
+    tables = glob.glob(os.path.join(model_dir, version, 'risk-*.parquet'))
+    return max(tables, key=os.path.getmtime) if tables else None
+
+
+def load_risk_table(path):
+    version = os.path.basename(os.path.dirname(path))
+    data_version = os.path.basename(path)[len('risk-'):-len('.parquet')]
+    return pd.read_parquet(path), {'version': version, 'data_version': data_version}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train, list and batch-score crime risk models')
+    parser.add_argument('command', choices=['train', 'score', 'list'])
+    parser.add_argument('--source', default=data.SOURCE_PATH)
+    parser.add_argument('--backend', default=query.BACKEND, choices=query.BACKENDS)
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--algorithm', default='random_forest', choices=ALGORITHMS)
+    parser.add_argument('--version', help='artifact to score with (default: latest)')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        latest = latest_version(args.model_dir)
+        for meta in list_artifacts(args.model_dir):
+            marker = '*' if meta['version'] == latest else ' '
+            print(f"{marker} {meta['version']}  {meta['algorithm']:<14} rows={meta['rows']}  "
+                  f"f1={meta['metrics']['f1']:.3f}  data={meta['data_version']}")
+    else:
+        backend = query.open_backend(args.backend, args.source)
+        frame = backend.frame(columns=[column for column in FEATURES + [TARGET] if column in backend.columns])
+        if args.command == 'train':
+            model, encoder, meta = train(frame, args.algorithm)
+            version = save_artifact(model, encoder, meta, backend.version, args.model_dir)
+            print(f"trained {version} on {meta['rows']} rows in {meta['train_seconds']}s: {meta['metrics']}")
+        else:
+            model, encoder, meta = load_artifact(args.version, args.model_dir)
+            start = time.perf_counter()
+            table = score(frame, model, encoder)
+            path = write_risk_table(table, meta['version'], backend.version, args.model_dir)
+            print(f'{len(frame)} incidents scored into {len(table)} cells in {time.perf_counter() - start:.1f}s: {path}')
@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from analyzer import instrument
+from analyzer.recidivism import incident_minutes, MINUTES_PER_DAY
+
+# X/Y Coordinate are Illinois State Plane (East) in feet
+DISTANCE_EDGES = [0, 400, 800, 1200, 1600, 2000]
+TIME_EDGES = [0, 7, 14, 21, 28, 35]
+
+SIMULATIONS = 99
+
+# Permutations per worker task
+SIMULATION_BATCH = 10
+
+COLUMNS = ['X Coordinate', 'Y Coordinate', 'Year', 'Month', 'Day', 'Hour', 'Time']
+
+# Arrays shared with the permutation workers, set once per worker process
+_WORKER = {}
+
+
+def close_pairs(x, y, max_distance):
+    # Every pair of incidents no further apart than max_distance, found with a KD-tree instead of n² comparisons
+    from scipy.spatial import cKDTree
+
+    points = np.column_stack([x, y]).astype('float64')
+    pairs = cKDTree(points).query_pairs(max_distance, output_type='ndarray')
+    first, second = pairs[:, 0].astype('int32'), pairs[:, 1].astype('int32')
+    distance = np.hypot(points[first, 0] - points[second, 0], points[first, 1] - points[second, 1])
+    return first, second, distance
+
+
+def time_band_lookup(time_edges):
+    # Time band of every whole-day gap up to the last edge; larger gaps map to an overflow band
+    limit = int(time_edges[-1])
+    lookup = np.full(limit + 1, len(time_edges) - 1, dtype='int16')
+    for band in range(len(time_edges) - 1):
+        lookup[int(time_edges[band]):int(time_edges[band + 1])] = band
+    return lookup
+
+
+def band_counts(first, second, cell_offset, days, lookup, cells):
+    # Pairs per (distance band, time band), as a flat array with one overflow time band per distance band.
+    # cell_offset is distance band * (time bands + 1) for each pair, so one bincount covers both dimensions.
+    gap = np.abs(days[first] - days[second])
+    np.minimum(gap, len(lookup) - 1, out=gap)
+    return np.bincount(cell_offset + lookup[gap], minlength=cells)
+
+
+def _init_worker(first, second, cell_offset, days, lookup, observed):
+    _WORKER.update(first=first, second=second, cell_offset=cell_offset, days=days, lookup=lookup, observed=observed)
+
+
+def _simulate(seed, simulations):
+    # Shuffling the dates over the fixed locations breaks any space-time link but keeps both distributions;
+    # the spatial pairs never change, so they are only found once
+    rng = np.random.default_rng(seed)
+    observed = _WORKER['observed']
+    total = np.zeros(len(observed), dtype='float64')
+    at_least = np.zeros(len(observed), dtype='int64')
+    for _ in range(simulations):
+        counts = band_counts(_WORKER['first'], _WORKER['second'], _WORKER['cell_offset'],
+                             rng.permutation(_WORKER['days']), _WORKER['lookup'], len(observed))
+        total += counts
+        at_least += counts >= observed
+    return total, at_least
+
+
+@instrument.traced('knox test', rows_in=lambda df, *args, **kwargs: len(df), rows_out=lambda result: result['pairs'])
+def knox_test(df, distance_edges=DISTANCE_EDGES, time_edges=TIME_EDGES, simulations=SIMULATIONS, workers=None, seed=0):
+    # Knox ratio (observed / mean simulated pairs) and Monte Carlo p-value per (distance, time) band.
+    # Time gaps are in whole calendar days; distance edges are in feet.
+    df = df.dropna(subset=['X Coordinate', 'Y Coordinate'])
+    distance_edges = np.asarray(distance_edges, dtype='float64')
+    time_edges = np.asarray(time_edges, dtype='int64')
+    distance_bands, time_bands = len(distance_edges) - 1, len(time_edges) - 1
+    rows = pd.Index([f'{distance_edges[i]:g}-{distance_edges[i + 1]:g} ft' for i in range(distance_bands)], name='Distance')
+    columns = pd.Index([f'{time_edges[i]}-{time_edges[i + 1]} days' for i in range(time_bands)], name='Time')
+    if len(df) == 0:
+        # Nothing to pair: zero counts, and no ratio or p-value
+        zeros, missing = np.zeros((distance_bands, time_bands)), np.full((distance_bands, time_bands), np.nan)
+        return {
+            'incidents': 0,
+            'pairs': 0,
+            'simulations': simulations,
+            'observed': pd.DataFrame(zeros, index=rows, columns=columns),
+            'expected': pd.DataFrame(zeros, index=rows, columns=columns),
+            'ratio': pd.DataFrame(missing, index=rows, columns=columns),
+            'p_value': pd.DataFrame(missing, index=rows, columns=columns),
+        }
+    days = (incident_minutes(df) // MINUTES_PER_DAY).astype('int32')
+
+    first, second, distance = close_pairs(df['X Coordinate'].to_numpy(), df['Y Coordinate'].to_numpy(), distance_edges[-1])
+    distance_band = (np.searchsorted(distance_edges, distance, side='right') - 1).clip(0, distance_bands - 1)
+    cell_offset = (distance_band * (time_bands + 1)).astype('int16')
+    del distance, distance_band
+    lookup = time_band_lookup(time_edges)
+    observed = band_counts(first, second, cell_offset, days, lookup, distance_bands * (time_bands + 1))
+
+    # Fixed-size batches with their own seeds, so the result does not depend on the number of workers
+    batches = [len(batch) for batch in np.array_split(np.arange(simulations), -(-simulations // SIMULATION_BATCH))]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    initargs = (first, second, cell_offset, days, lookup, observed)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(batches)))
+    if workers == 1:
+        _init_worker(*initargs)
+        results = [_simulate(child, batch) for child, batch in zip(seeds, batches)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+            results = list(executor.map(_simulate, seeds, batches))
+
+    # Drop the overflow time band of each distance band
+    def grid(values):
+        return np.asarray(values).reshape(distance_bands, time_bands + 1)[:, :time_bands]
+
+    observed = grid(observed)
+    expected = grid(sum(total for total, _ in results) / simulations)
+    at_least = grid(sum(count for _, count in results))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(expected > 0, observed / expected, np.nan)
+    return {
+        'incidents': len(df),
+        'pairs': len(first),
+        'simulations': simulations,
+        'observed': pd.DataFrame(observed, index=rows, columns=columns),
+        'expected': pd.DataFrame(expected, index=rows, columns=columns),
+        'ratio': pd.DataFrame(ratio, index=rows, columns=columns),
+        'p_value': pd.DataFrame((at_least + 1) / (simulations + 1), index=rows, columns=columns),
+    }
@@ -0,0 +1,325 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from analyzer import data, schema, table, etl, taxonomy, instrument, spatial
+from analyzer.filters import BitmapIndex, active_filters, filter_signature
+
+# 'memory' keeps the whole dataset in one DataFrame per process;
+# 'dataset' queries the Year=/Month= Parquet partitions written by analyzer/etl.py and only
+# reads the columns and months a query needs
+BACKEND = os.environ.get('CRIME_BACKEND', 'memory')
+
+BACKENDS = ['memory', 'dataset']
+
+MEASURES = ['count', 'arrests']
+
+# Rows per chunk when the selected rows are streamed rather than returned as one frame
+CHUNK_ROWS = 50000
+
+
+def _rows(backend, *args, **kwargs):
+    return backend.rows
+
+
+def _empty_rollup(by):
+    index = pd.MultiIndex.from_arrays([[] for _ in by], names=list(by)) if len(by) > 1 else pd.Index([], name=by[0])
+    return pd.DataFrame({measure: pd.Series([], dtype='int64') for measure in MEASURES}, index=index)
+
+
+class MemoryBackend:
+    # The cached DataFrame with its cube, bitmap index and sort permutations
+    name = 'memory'
+
+    def __init__(self, df, crime_cube, version):
+        self.df = df
+        self.cube = crime_cube
+        self.version = version
+        self.columns = list(df.columns)
+        self.rows = len(df)
+        self.spatial = None
+        self.lock = threading.Lock()
+        self.index = BitmapIndex(df, area_rows=self.area_rows)
+        self.sort_index = table.SortIndex(df)
+
+    @instrument.traced('area query', rows_out=len)
+    def area_rows(self, area):
+        # The grid is built by the first area query, so once per data version, and not at all for sessions without one
+        with self.lock:
+            if self.spatial is None:
+                with instrument.span('build spatial index', rows_in=self.rows):
+                    self.spatial = spatial.GridIndex(self.df['Latitude'].to_numpy(), self.df['Longitude'].to_numpy())
+        return self.spatial.query(area)
+
+    def options(self, column):
+        values = self.df[column].dropna().unique()
+        return sorted(values.tolist() if hasattr(values, 'tolist') else list(values))
+
+    @instrument.traced('filter', rows_in=_rows, rows_out=lambda count: count)
+    def count(self, filters=None):
+        return self.index.count(filters)
+
+    @instrument.traced('select rows', rows_in=_rows, rows_out=len)
+    def frame(self, filters=None, columns=None):
+        df = self.df if columns is None else self.df[list(columns)]
+        return self.index.select(df, filters)
+
+    def chunks(self, filters=None, columns=None, chunk_rows=CHUNK_ROWS):
+        # The selected rows in slices of chunk_rows, at least one (possibly empty) so the columns are always known
+        df = self.df if columns is None else self.df[list(columns)]
+        rows = self.index.indices(filters)
+        total = len(df) if rows is None else len(rows)
+        for start in range(0, max(total, 1), chunk_rows):
+            yield df.iloc[start:start + chunk_rows] if rows is None else df.iloc[rows[start:start + chunk_rows]]
+
+    @instrument.traced('select arrays', rows_in=_rows, rows_out=lambda arrays: len(next(iter(arrays.values()), [])))
+    def arrays(self, columns, filters=None):
+        rows = self.index.indices(filters)
+        arrays = {column: self.df[column].to_numpy() for column in columns}
+        if rows is None:
+            return arrays
+        return {column: values[rows] for column, values in arrays.items()}
+
+    @instrument.traced('aggregate', rows_in=_rows, rows_out=len)
+    def rollup(self, by, filters=None):
+        try:
+            return self.cube.rollup(by, filters)
+        except KeyError:
+            # Grouping column outside the cube (e.g. Description): group the selected rows
+            frame = self.frame(filters, list(by) + ['Arrest'])
+            grouped = frame.groupby(list(by), observed=True, sort=True)['Arrest']
+            return pd.DataFrame({'count': grouped.size(), 'arrests': grouped.sum().astype('int64')})
+
+    def counts(self, by, filters=None):
+        return self.rollup([by], filters)['count']
+
+    def arrest_rate(self, by, filters=None):
+        totals = self.rollup([by], filters)
+        return totals['arrests'] / totals['count'] * 100
+
+    @instrument.traced('table page', rows_in=_rows, rows_out=lambda result: len(result[0]))
+    def page(self, filters=None, columns=None, sort_column=None, ascending=True, page=1, page_size=table.PAGE_SIZES[0]):
+        order = self.sort_index.order(sort_column) if sort_column else None
+        positions, total = table.page_rows(len(self.df), self.index.indices(filters), order, ascending, page, page_size)
+        return table.page_frame(self.df, positions, columns), total
+
+
+class DatasetBackend:
+    # Arrow dataset over hive partitions. Filters become Arrow expressions, so Year/Month filters
+    # skip whole directories and the rest are checked while scanning; only the requested columns
+    # are read, and aggregations are combined batch by batch.
+    name = 'dataset'
+
+    def __init__(self, path, version):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        partition_types = {column: pa.from_numpy_dtype(np.dtype(schema.INTEGER_COLUMNS[column]))
+                           for column in etl.PARTITION_COLUMNS}
+        partitioning = ds.partitioning(pa.schema(list(partition_types.items())), flavor='hive')
+        self.dataset = ds.dataset(path, format='parquet', partitioning=partitioning)
+        self.version = version
+        self.columns = [column for column in etl.CLEAN_COLUMNS + taxonomy.columns() if column in self.dataset.schema.names]
+        # From the Parquet footers; no rows are read
+        self.rows = self.dataset.count_rows()
+        self.dictionary = schema.load_dictionary(path)
+        self._options = {}
+        self.lock = threading.Lock()
+
+    def _expression(self, filters):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        expression = None
+        for column, values in active_filters(filters).items():
+            if column == spatial.AREA:
+                condition = spatial.area_expression(values)
+            else:
+                value_type = self.dataset.schema.field(column).type
+                condition = pc.field(column).isin(pa.array(values).cast(value_type))
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def _to_pandas(self, arrow_table):
+        # Same dtypes as the memory backend: dictionary-coded categoricals, small ints, float32, bool
+        df, _ = schema.apply_schema(arrow_table.to_pandas(), self.dictionary)
+        return df
+
+    def options(self, column):
+        import pyarrow.compute as pc
+
+        with self.lock:
+            if column in self._options:
+                return self._options[column]
+        if column in etl.PARTITION_COLUMNS:
+            # Partition values are read from the file paths, no data is scanned
+            values = set()
+            for fragment in self.dataset.get_fragments():
+                values.update(value for key, value in self._partition_values(fragment) if key == column)
+        else:
+            values = set()
+            for batch in self.dataset.to_batches(columns=[column]):
+                values.update(pc.unique(batch.column(0)).drop_null().to_pylist())
+        options = sorted(values)
+        with self.lock:
+            self._options[column] = options
+        return options
+
+    def _partition_values(self, fragment):
+        import pyarrow.dataset as ds
+
+        return ds.get_partition_keys(fragment.partition_expression).items()
+
+    @instrument.traced('filter', rows_in=_rows, rows_out=lambda count: count)
+    def count(self, filters=None):
+        return self.dataset.count_rows(filter=self._expression(filters))
+
+    @instrument.traced('select rows', rows_in=_rows, rows_out=len)
+    def frame(self, filters=None, columns=None):
+        arrow_table = self.dataset.to_table(columns=list(columns or self.columns), filter=self._expression(filters))
+        return self._to_pandas(arrow_table)
+
+    def chunks(self, filters=None, columns=None, chunk_rows=CHUNK_ROWS):
+        # Record batches of the selected rows converted one at a time, so only a batch is held in memory;
+        # at least one (possibly empty) chunk so the columns are always known. The scan runs in this thread
+        # without read-ahead: threaded scans decode batches faster than a writer consumes them and queue them up.
+        import pyarrow as pa
+
+        columns = list(columns or self.columns)
+        scanner = self.dataset.scanner(columns=columns, filter=self._expression(filters), batch_size=chunk_rows,
+                                       use_threads=False, batch_readahead=1, fragment_readahead=1)
+        empty = True
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                empty = False
+                yield self._to_pandas(pa.Table.from_batches([batch]))
+        if empty:
+            yield self._to_pandas(pa.schema([self.dataset.schema.field(column) for column in columns]).empty_table())
+
+    @instrument.traced('select arrays', rows_in=_rows, rows_out=lambda arrays: len(next(iter(arrays.values()), [])))
+    def arrays(self, columns, filters=None):
+        arrow_table = self.dataset.to_table(columns=list(columns), filter=self._expression(filters))
+        return {column: arrow_table.column(column).to_numpy() for column in columns}
+
+    @instrument.traced('aggregate', rows_in=_rows, rows_out=len)
+    def rollup(self, by, filters=None):
+        import pyarrow as pa
+
+        by = list(by)
+        parts = []
+        for batch in self.dataset.to_batches(columns=by + ['Arrest'], filter=self._expression(filters)):
+            if batch.num_rows:
+                grouped = pa.Table.from_batches([batch]).group_by(by).aggregate([('Arrest', 'count'), ('Arrest', 'sum')])
+                parts.append(grouped.to_pandas())
+        if not parts:
+            return _empty_rollup(by)
+
+        # Partial counts per batch are summed into the final groups
+        totals = pd.concat(parts).rename(columns={'Arrest_count': 'count', 'Arrest_sum': 'arrests'})
+        totals = totals.groupby(by, sort=True)[MEASURES].sum().astype('int64')
+        categorical = [column for column in by if column in schema.CATEGORICAL_COLUMNS]
+        if categorical:
+            totals = self._categorical_index(totals, by)
+        return totals
+
+    def _categorical_index(self, totals, by):
+        # Category labels ordered by the shared dictionary, like the cube's
+        index = totals.index.to_frame(index=False)
+        index, _ = schema.apply_schema(index, self.dictionary)
+        totals.index = pd.MultiIndex.from_frame(index) if len(by) > 1 else pd.Index(index[by[0]])
+        return totals.sort_index()
+
+    def counts(self, by, filters=None):
+        return self.rollup([by], filters)['count']
+
+    def arrest_rate(self, by, filters=None):
+        totals = self.rollup([by], filters)
+        return totals['arrests'] / totals['count'] * 100
+
+    @instrument.traced('table page', rows_in=_rows, rows_out=lambda result: len(result[0]))
+    def page(self, filters=None, columns=None, sort_column=None, ascending=True, page=1, page_size=table.PAGE_SIZES[0]):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        expression = self._expression(filters)
+        total = self.count(filters)
+        start = (page - 1) * page_size
+        stop = min(start + page_size, total)
+        if sort_column is None:
+            positions = np.arange(start, max(start, stop))
+        else:
+            # Only the sort column of the selected rows is read to find the page
+            keys = self.dataset.to_table(columns=[sort_column], filter=expression).column(0)
+            order = 'ascending' if ascending else 'descending'
+            positions = pc.array_sort_indices(keys, order=order, null_placement='at_end').to_numpy()[start:stop]
+
+        scanner = self.dataset.scanner(columns=list(columns or self.columns), filter=expression)
+        return self._to_pandas(scanner.take(pa.array(positions, type=pa.int64()))), total
+
+
+class CachedBackend:
+    # A backend whose query results go through a shared ResultCache (analyzer/result_cache.py), so the same
+    # query from any session is computed once per data version. Results are shared and must not be modified.
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+
+    def __getattr__(self, name):
+        # name, version, columns, rows and anything backend-specific
+        return getattr(self.backend, name)
+
+    def _cached(self, query, filters, compute, *args):
+        return self.cache.get_or_compute((query, args, filter_signature(filters), self.backend.version), compute)
+
+    def options(self, column):
+        return self._cached('options', None, lambda: self.backend.options(column), column)
+
+    def count(self, filters=None):
+        return self._cached('count', filters, lambda: self.backend.count(filters))
+
+    def frame(self, filters=None, columns=None):
+        # Selected rows go straight to the backend: they are orders of magnitude larger than aggregates and
+        # would push the hot aggregates out of the budget. Callers that reuse a frame keep it themselves.
+        return self.backend.frame(filters, columns)
+
+    def chunks(self, filters=None, columns=None, chunk_rows=CHUNK_ROWS):
+        # Streamed straight from the backend: chunks are read once, so caching them would only use up the budget
+        return self.backend.chunks(filters, columns, chunk_rows)
+
+    def arrays(self, columns, filters=None):
+        # Column arrays of the selected rows grow with the selection like frame(), so they bypass the cache too
+        return self.backend.arrays(list(columns), filters)
+
+    def rollup(self, by, filters=None):
+        by = tuple(by)
+        return self._cached('rollup', filters, lambda: self.backend.rollup(list(by), filters), by)
+
+    def counts(self, by, filters=None):
+        return self.rollup([by], filters)['count']
+
+    def arrest_rate(self, by, filters=None):
+        totals = self.rollup([by], filters)
+        return totals['arrests'] / totals['count'] * 100
+
+    def page(self, filters=None, columns=None, sort_column=None, ascending=True, page=1, page_size=table.PAGE_SIZES[0]):
+        columns = None if columns is None else tuple(columns)
+        args = (columns, sort_column, ascending, page, page_size)
+        return self._cached('page', filters, lambda: self.backend.page(filters, *args), *args)
+
+
+def data_version(mode=BACKEND, path=data.SOURCE_PATH, cache_dir=data.CACHE_DIR):
+    if mode == 'dataset':
+        # The partitioned dataset is read in place, so its version is the ETL manifest's hash
+        return data.file_hash(data.signature_path(path))[:16]
+    return data.data_version(path, cache_dir)
+
+
+def open_backend(mode=BACKEND, path=data.SOURCE_PATH, cache_dir=data.CACHE_DIR):
+    if mode not in BACKENDS:
+        raise ValueError(f'Unknown backend {mode!r}, expected one of {BACKENDS}')
+    if mode == 'dataset':
+        if not os.path.isdir(path):
+            raise ValueError(f'The dataset backend needs a partitioned directory from analyzer/etl.py, got {path!r}')
+        return DatasetBackend(path, data_version(mode, path))
+    return MemoryBackend(data.load_crime_data(path=path, cache_dir=cache_dir),
+                         data.load_crime_cube(path=path, cache_dir=cache_dir), data_version(mode, path, cache_dir))
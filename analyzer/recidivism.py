@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from analyzer import instrument
+
+# What counts as "the same place or case" for a repeat
+KEYS = {
+    'Block': ['Block'],
+    'Beat': ['Beat'],
+    'Coordinates': ['X Coordinate', 'Y Coordinate'],
+    'Case Number': ['Case Number'],
+}
+
+WINDOWS = [30, 90, 365]
+
+FOLLOW_UPS = ['Arrest', 'Any incident']
+
+BREAKDOWNS = ['District', 'Primary Type']
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def columns_for(key):
+    return KEYS[key] + ['Year', 'Month', 'Day', 'Hour', 'Time', 'Arrest'] + BREAKDOWNS
+
+
+def incident_minutes(df):
+    # Minutes since the earliest day in the frame, from the cleaned Year/Month/Day/Hour columns
+    # plus the minute of the 'Time' column when it is there
+    if len(df) == 0:
+        return np.zeros(0, dtype='int64')
+    days = pd.to_datetime(pd.DataFrame({'year': df['Year'], 'month': df['Month'], 'day': df['Day']}))
+    days = days.to_numpy().astype('datetime64[D]').astype('int64')
+    minutes = (days - days.min()) * MINUTES_PER_DAY + df['Hour'].to_numpy().astype('int64') * 60
+    if 'Time' in df.columns:
+        minutes += pd.to_numeric(df['Time'].astype(str).str[3:5], errors='coerce').fillna(0).to_numpy().astype('int64')
+    return minutes
+
+
+def key_codes(df, key):
+    # One integer per distinct key value (or coordinate pair); -1 where any part is missing
+    return df.groupby(KEYS[key], observed=True, dropna=True, sort=False).ngroup().fillna(-1).to_numpy().astype('int64')
+
+
+def find_repeats(codes, minutes, is_index, is_follow_up, window_days):
+    # For every index incident, the minutes until the next follow-up with the same key within the window,
+    # or -1 when there is none.
+    # Key and time are packed into one sortable int64 (key * span + minute), so a single sorted array
+    # of follow-ups answers every index incident with two binary searches: O(n log n), no pairs.
+    window = int(window_days) * MINUTES_PER_DAY
+    span = int(minutes.max(initial=0)) + window + 1
+    composite = codes * span + minutes
+
+    valid = codes >= 0
+    follow_ups = np.sort(composite[is_follow_up & valid])
+    index_positions = np.flatnonzero(is_index & valid)
+    start = composite[index_positions]
+
+    # 'right' at the incident's own minute: a follow-up has to come strictly later
+    first = np.searchsorted(follow_ups, start, side='right')
+    last = np.searchsorted(follow_ups, start + window, side='right')
+
+    gaps = np.full(len(codes), -1, dtype='int64')
+    found = first < last
+    gaps[index_positions[found]] = follow_ups[first[found]] - start[found]
+    return gaps
+
+
+def empty_summary(by):
+    return pd.DataFrame({'incidents': pd.Series(dtype='int64'), 'repeats': pd.Series(dtype='int64'),
+                         'median_days': pd.Series(dtype='float64'), 'rate': pd.Series(dtype='float64')},
+                        index=pd.Index([], name=by))
+
+
+def summarize(df, is_index, gaps, by):
+    rows = pd.DataFrame({
+        by: df[by].to_numpy(),
+        'incidents': is_index,
+        'repeats': is_index & (gaps >= 0),
+        'days': np.where(gaps >= 0, gaps / MINUTES_PER_DAY, np.nan),
+    })
+    summary = rows[rows['incidents']].groupby(by, observed=True, sort=True).agg(
+        incidents=('incidents', 'sum'), repeats=('repeats', 'sum'), median_days=('days', 'median'))
+    summary['rate'] = summary['repeats'] / summary['incidents'] * 100
+    return summary.sort_values('rate', ascending=False)
+
+
+@instrument.traced('recidivism', rows_in=lambda df, *args, **kwargs: len(df))
+def analyze(df, key='Block', window_days=365, follow_up='Arrest'):
+    # Index incidents are arrests; follow-ups are later arrests, or later incidents of any kind,
+    # with the same key within window_days
+    if key not in KEYS:
+        raise ValueError(f'Unknown key {key!r}, expected one of {list(KEYS)}')
+    if follow_up not in FOLLOW_UPS:
+        raise ValueError(f'Unknown follow-up {follow_up!r}, expected one of {FOLLOW_UPS}')
+    if len(df) == 0:
+        return {'index_incidents': 0, 'repeats': 0, 'rate': np.nan, 'median_days': np.nan,
+                'by': {by: empty_summary(by) for by in BREAKDOWNS if by in df.columns}}
+
+    is_index = df['Arrest'].to_numpy(dtype=bool)
+    is_follow_up = is_index if follow_up == 'Arrest' else np.ones(len(df), dtype=bool)
+    gaps = find_repeats(key_codes(df, key), incident_minutes(df), is_index, is_follow_up, window_days)
+
+    index_count = int(is_index.sum())
+    repeat_count = int((gaps >= 0).sum())
+    return {
+        'index_incidents': index_count,
+        'repeats': repeat_count,
+        'rate': repeat_count / index_count * 100 if index_count else np.nan,
+        'median_days': float(np.median(gaps[gaps >= 0]) / MINUTES_PER_DAY) if repeat_count else np.nan,
+        'by': {by: summarize(df, is_index, gaps, by) for by in BREAKDOWNS if by in df.columns},
+    }
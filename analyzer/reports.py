@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from matplotlib.figure import Figure
+from analyzer import data, query, charts, figures
+
+# Scope -> column with one report bundle per value ('city' is a single unfiltered bundle)
+SCOPES = {'city': None, 'district': 'District', 'ward': 'Ward'}
+
+# 'all' is one bundle over every year, 'year' one per year, 'month' one per year and month
+WINDOWS = ['all', 'year', 'month']
+
+FORMATS = ['png', 'pdf']
+
+# Figures a worker process draws before it is replaced, so matplotlib's caches and fragmentation stay bounded
+FIGURES_PER_WORKER = 200
+
+MANIFEST_NAME = '_manifest.json'
+
+# Bump when the charts are drawn differently, so every bundle is rendered again
+REPORT_FORMAT = 1
+
+# Shared figures (analyzer/figures.py) that go into a bundle
+REPORT_CHARTS = ['crime-per-district', 'crime-per-ward', 'arrest-rate-by-crime-type', 'arrest-rate-by-district',
+                 'arrest-rate-by-ward', 'arrest-rate-by-year', 'crimes-by-season', 'crimes-by-type-and-season']
+
+
+def scope_values(crime_query, scope):
+    column = SCOPES[scope]
+    return [None] if column is None else crime_query.options(column)
+
+
+def windows(crime_query, window, years=None):
+    # (name, filters) of each time window that has incidents
+    if window == 'all':
+        return [('all', {'Year': years} if years else {})]
+    if window == 'year':
+        return [(str(year), {'Year': [year]}) for year in crime_query.options('Year') if not years or year in years]
+    totals = crime_query.rollup(['Year', 'Month'], {'Year': years} if years else None)['count']
+    return [(f'{year}-{month:02d}', {'Year': [year], 'Month': [month]})
+            for (year, month), count in totals.items() if count > 0]
+
+
+def chart_ids(filters):
+    # Every report chart except those grouped by a column the bundle fixes to a single value
+    fixed = {column for column, values in filters.items() if values is not None and len(values) == 1}
+    return [chart_id for chart_id in REPORT_CHARTS if not fixed & set(figures.FIGURES[chart_id]['by'])]
+
+
+def bundles(crime_query, scopes, window, years=None):
+    # (name, label, filters) of every report bundle that has incidents
+    time_windows = windows(crime_query, window, years)
+    for scope in scopes:
+        column = SCOPES[scope]
+        for value in scope_values(crime_query, scope):
+            for window_name, window_filters in time_windows:
+                filters = dict(window_filters) if column is None else {column: [value], **window_filters}
+                if crime_query.count(filters):
+                    name = scope if column is None else f'{scope}-{value}'
+                    label = ('City' if column is None else f'{column} {value}') + ('' if window_name == 'all' else f', {window_name}')
+                    yield f'{name}/{window_name}', label, filters
+
+
+def fingerprint(charts_data, formats, dpi):
+    # Hash of everything a bundle's files depend on: the aggregates behind each chart and how they are drawn
+    digest = hashlib.sha1(json.dumps([REPORT_FORMAT, sorted(formats), dpi]).encode())
+    for chart_id, values in charts_data:
+        digest.update(chart_id.encode())
+        digest.update(values.to_json(orient='split').encode())
+    return digest.hexdigest()[:16]
+
+
+def read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(manifest, out_dir):
+    # Rewritten after every finished bundle, so an interrupted run resumes where it stopped
+    tmp_path = os.path.join(out_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_NAME))
+
+
+def _titled(chart_id, values, label):
+    figure = figures.FIGURES[chart_id]
+
+    def draw(ax):
+        figure['draw'](ax, values)
+        ax.figure.suptitle(f"{label}: {figure['title']}")
+    return draw
+
+
+def render_bundle(out_dir, name, label, charts_data, formats, dpi=charts.DPI):
+    # One PNG per chart and/or one PDF with a page per chart, written under out_dir/name/
+    start = time.perf_counter()
+    bundle_dir = os.path.join(out_dir, name)
+    os.makedirs(bundle_dir, exist_ok=True)
+    files = []
+    if 'png' in formats:
+        for chart_id, values in charts_data:
+            png = charts.render_png(_titled(chart_id, values, label), figures.FIGURES[chart_id]['figsize'], dpi)
+            path = os.path.join(bundle_dir, f'{chart_id}.png')
+            with open(path + '.tmp', 'wb') as f:
+                f.write(png)
+            os.replace(path + '.tmp', path)
+            files.append(os.path.relpath(path, out_dir))
+    if 'pdf' in formats:
+        from matplotlib.backends.backend_pdf import PdfPages
+
+        path = os.path.join(bundle_dir, 'report.pdf')
+        with PdfPages(path + '.tmp') as pdf:
+            for chart_id, values in charts_data:
+                fig = Figure(figsize=figures.FIGURES[chart_id]['figsize'], dpi=dpi)
+                try:
+                    _titled(chart_id, values, label)(fig.subplots())
+                    pdf.savefig(fig, bbox_inches='tight')
+                finally:
+                    fig.clear()
+        os.replace(path + '.tmp', path)
+        files.append(os.path.relpath(path, out_dir))
+    return name, files, time.perf_counter() - start
+
+
+def _render_task(task):
+    return render_bundle(*task)
+
+
+def run(crime_query, out_dir, scopes=('district', 'ward'), window='all', formats=FORMATS, years=None, workers=None,
+        figures_per_worker=FIGURES_PER_WORKER, dpi=charts.DPI, force=False):
+    # The aggregates of every bundle are computed here from the backend; workers only draw them.
+    # Bundles whose aggregates, formats and files are unchanged since the last run are skipped.
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {} if force else read_manifest(out_dir)
+    pending = []
+    skipped = 0
+    for name, label, filters in bundles(crime_query, scopes, window, years):
+        charts_data = [(chart_id, figures.FIGURES[chart_id]['data'](crime_query, filters)) for chart_id in chart_ids(filters)]
+        key = fingerprint(charts_data, formats, dpi)
+        entry = manifest.get(name)
+        if entry and entry['fingerprint'] == key and all(os.path.exists(os.path.join(out_dir, path)) for path in entry['files']):
+            skipped += 1
+            continue
+        pending.append((name, label, charts_data, key))
+
+    start = time.perf_counter()
+    keys = {name: key for name, _, _, key in pending}
+    tasks = [(out_dir, name, label, charts_data, list(formats), dpi) for name, label, charts_data, _ in pending]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+
+    def finished(name, files, seconds):
+        manifest[name] = {'fingerprint': keys[name], 'files': files, 'seconds': round(seconds, 2),
+                          'data_version': crime_query.version}
+        write_manifest(manifest, out_dir)
+
+    if workers == 1:
+        for task in tasks:
+            finished(*render_bundle(*task))
+    else:
+        # A worker is replaced after about figures_per_worker figures (each task is one bundle of several).
+        # multiprocessing.Pool rather than ProcessPoolExecutor(max_tasks_per_child), which can hang on shutdown
+        # in Python 3.11 once a worker has been replaced.
+        figures_per_task = max((len(task[3]) for task in tasks), default=1) * len(formats)
+        max_tasks = max(1, figures_per_worker // max(figures_per_task, 1))
+        with multiprocessing.Pool(workers, maxtasksperchild=max_tasks) as pool:
+            for result in pool.imap_unordered(_render_task, tasks):
+                finished(*result)
+    return {'rendered': len(tasks), 'skipped': skipped, 'workers': workers,
+            'seconds': round(time.perf_counter() - start, 2)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render the district, ward and city chart bundles as PNG and PDF')
+    parser.add_argument('--out', default='reports', help='output directory, reused across runs')
+    parser.add_argument('--source', default=data.SOURCE_PATH)
+    parser.add_argument('--backend', default=query.BACKEND, choices=query.BACKENDS)
+    parser.add_argument('--scope', nargs='+', default=['district', 'ward'], choices=list(SCOPES))
+    parser.add_argument('--window', default='all', choices=WINDOWS)
+    parser.add_argument('--years', nargs='+', type=int, help='only these years (default: all)')
+    parser.add_argument('--format', nargs='+', default=FORMATS, choices=FORMATS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--figures-per-worker', type=int, default=FIGURES_PER_WORKER)
+    parser.add_argument('--dpi', type=int, default=charts.DPI)
+    parser.add_argument('--force', action='store_true', help='render every bundle even if unchanged')
+    args = parser.parse_args()
+
+    backend = query.open_backend(args.backend, args.source)
+    summary = run(backend, args.out, args.scope, args.window, args.format, args.years, args.workers,
+                  args.figures_per_worker, args.dpi, args.force)
+    print(f"{summary['rendered']} bundles rendered, {summary['skipped']} unchanged, "
+          f"on {summary['workers']} workers in {summary['seconds']}s")
@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Total size of query results kept per process
+MAX_BYTES = int(os.environ.get('CRIME_RESULT_CACHE_MB', 512)) * 1024 ** 2
+
+
+def result_bytes(value):
+    # Approximate memory held by a result: pandas objects with their strings, arrays, and containers of those
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class _Flight:
+    # A result being computed; callers asking for the same key wait for it instead of computing it again
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+class ResultCache:
+    # Query results keyed by (query, arguments, filter signature, data version), shared by every session
+    # of the process, least recently used evicted first once more than max_bytes are held.
+    # Results are returned as stored, so callers must not modify them.
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.results = OrderedDict()
+        self.sizes = {}
+        self.pending = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.waits = 0
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        while True:
+            with self.lock:
+                if key in self.results:
+                    self.results.move_to_end(key)
+                    self.hits += 1
+                    return self.results[key]
+                flight = self.pending.get(key)
+                owner = flight is None
+                if owner:
+                    flight = self.pending[key] = _Flight()
+                    self.misses += 1
+                else:
+                    self.waits += 1
+
+            if owner:
+                return self._compute(key, compute, flight)
+            flight.done.wait()
+            if not flight.failed:
+                return flight.value
+            # The computing caller failed (or its rerun was interrupted); try again, possibly as the owner
+
+    def _compute(self, key, compute, flight):
+        try:
+            value = compute()
+        except BaseException:
+            flight.failed = True
+            with self.lock:
+                del self.pending[key]
+            flight.done.set()
+            raise
+
+        size = result_bytes(value)
+        with self.lock:
+            if size <= self.max_bytes:
+                self.results[key] = value
+                self.sizes[key] = size
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    evicted, _ = self.results.popitem(last=False)
+                    self.bytes -= self.sizes.pop(evicted)
+                    self.evictions += 1
+            flight.value = value
+            del self.pending[key]
+        flight.done.set()
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+            self.sizes.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses + self.waits
+            return {'results': len(self.results), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'waits': self.waits, 'evictions': self.evictions,
+                    'hit_rate': (self.hits + self.waits) / lookups if lookups else None}
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from analyzer import data, etl, heatmap, models, query
+
+# Time axes of the grid, in storage order after the cell axis.
+# The models take the day of the month (the notebook's 'Day' feature), not the weekday, so that is the day axis.
+AXES = {'Month': np.arange(1, 13), 'Day': np.arange(1, 32), 'Hour': np.arange(24)}
+
+# Days in each month of a leap year: the day axis runs to 31 for every month, and the
+# (month, day) slots past these (30 February, 31 April, ...) are not dates and are left out of windows
+MONTH_DAYS = np.array([31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# Rows per predict_proba call; bounds the feature matrix each worker holds
+CHUNK_ROWS = 200000
+
+# Cell attributes taken from the incidents in each cell (most common value)
+CELL_COLUMNS = ['District', 'Ward', 'Community Area']
+
+# Scores are stored as float16 (3 significant digits is plenty for a probability on a map)
+SCORE_DTYPE = 'float16'
+
+_WORKER = {}
+
+
+def grid_paths(version, data_version, model_dir=models.MODEL_DIR):
+    base = os.path.join(model_dir, version, f'grid-{data_version}')
+    return {'scores': base + '.npy', 'cells': base + '.parquet', 'meta': base + '.json'}
+
+
+def build_cells(df, resolution=heatmap.DEFAULT_RESOLUTION):
+    # One row per occupied map cell: its centre and the most common district, ward and community area
+    df = df.dropna(subset=['Latitude', 'Longitude'] + CELL_COLUMNS)
+    cells = pd.DataFrame({
+        'lat_cell': np.floor(df['Latitude'].to_numpy(dtype='float64') / resolution).astype('int64'),
+        'lon_cell': np.floor(df['Longitude'].to_numpy(dtype='float64') / resolution).astype('int64'),
+        **{column: df[column].to_numpy() for column in CELL_COLUMNS},
+    })
+    counts = cells.groupby(['lat_cell', 'lon_cell'] + CELL_COLUMNS, sort=False).size().rename('incidents').reset_index()
+    # Rows are sorted by count, so the first row per cell carries its most common attributes
+    counts = counts.sort_values('incidents', ascending=False, kind='stable')
+    cells = counts.groupby(['lat_cell', 'lon_cell'], sort=True).agg(
+        **{column: (column, 'first') for column in CELL_COLUMNS}, incidents=('incidents', 'sum')).reset_index()
+    cells['Latitude'] = ((cells['lat_cell'] + 0.5) * resolution).astype('float32')
+    cells['Longitude'] = ((cells['lon_cell'] + 0.5) * resolution).astype('float32')
+    return cells.drop(columns=['lat_cell', 'lon_cell'])
+
+
+def default_scenario(df):
+    # Fixed values for the features that are not grid axes: the latest year and the most common
+    # crime type and location, as a non-domestic incident
+    return {
+        'Year': int(df['Year'].max()),
+        'Primary Type': str(df['Primary Type'].value_counts().idxmax()),
+        'Location Description': str(df['Location Description'].value_counts().idxmax()),
+        'Domestic': False,
+    }
+
+
+def grid_rows(cells, start, stop, scenario):
+    # Feature rows for flat grid positions [start, stop): position = cell * slots + (month, day, hour) offset
+    sizes = [len(values) for values in AXES.values()]
+    slots = int(np.prod(sizes))
+    flat = np.arange(start, stop, dtype='int64')
+    cell, slot = np.divmod(flat, slots)
+    month_index, rest = np.divmod(slot, sizes[1] * sizes[2])
+    day_index, hour_index = np.divmod(rest, sizes[2])
+
+    month = AXES['Month'][month_index]
+    rows = pd.DataFrame({
+        'Latitude': cells['Latitude'].to_numpy()[cell],
+        'Longitude': cells['Longitude'].to_numpy()[cell],
+        **{column: cells[column].to_numpy()[cell] for column in CELL_COLUMNS},
+        'Month': month,
+        'Day': AXES['Day'][day_index],
+        'Hour': AXES['Hour'][hour_index],
+        'Season': pd.Series(month).map(etl.SEASONS).to_numpy(),
+    })
+    for column, value in scenario.items():
+        rows[column] = value
+    return rows
+
+
+def _init_worker(version, model_dir, cells, scenario, scores_path):
+    model, encoder, _ = models.load_artifact(version, model_dir)
+    _WORKER.update(model=model, encoder=encoder, cells=cells, scenario=scenario,
+                   scores=np.load(scores_path, mmap_mode='r+'))
+
+
+def _score_chunk(start, stop):
+    # Each chunk writes its own slice of the shared memory-mapped score array
+    rows = grid_rows(_WORKER['cells'], start, stop, _WORKER['scenario'])
+    risk = _WORKER['model'].predict_proba(_WORKER['encoder'].transform(rows))[:, 1]
+    _WORKER['scores'].reshape(-1)[start:stop] = risk.astype(SCORE_DTYPE)
+    _WORKER['scores'].flush()
+    return stop - start
+
+
+def build_grid(df, version=None, model_dir=models.MODEL_DIR, data_version='', resolution=heatmap.DEFAULT_RESOLUTION,
+               scenario=None, chunk_rows=CHUNK_ROWS, workers=None):
+    _, _, meta = models.load_artifact(version, model_dir)
+    version = meta['version']
+    cells = build_cells(df, resolution)
+    scenario = {**default_scenario(df), **(scenario or {})}
+    shape = (len(cells),) + tuple(len(values) for values in AXES.values())
+    paths = grid_paths(version, data_version, model_dir)
+
+    start = time.perf_counter()
+    # .npy with a header, written in place by the workers and opened later with np.load(mmap_mode='r')
+    scores = np.lib.format.open_memmap(paths['scores'] + '.tmp', mode='w+', dtype=SCORE_DTYPE, shape=shape)
+    del scores
+    total = int(np.prod(shape))
+    chunks = [(chunk_start, min(chunk_start + chunk_rows, total)) for chunk_start in range(0, total, chunk_rows)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(chunks) or 1))
+    initargs = (version, model_dir, cells, scenario, paths['scores'] + '.tmp')
+    try:
+        if workers == 1:
+            _init_worker(*initargs)
+            try:
+                scored = sum(_score_chunk(*chunk) for chunk in chunks)
+            finally:
+                _WORKER.clear()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+                scored = sum(executor.map(_score_chunk, *zip(*chunks)))
+        os.replace(paths['scores'] + '.tmp', paths['scores'])
+    finally:
+        # A failed run leaves no partial score file behind
+        if os.path.exists(paths['scores'] + '.tmp'):
+            os.remove(paths['scores'] + '.tmp')
+
+    cells.to_parquet(paths['cells'], index=False)
+    grid_meta = {
+        'version': version,
+        'data_version': data_version,
+        'resolution': resolution,
+        'axes': {name: values.tolist() for name, values in AXES.items()},
+        'scenario': scenario,
+        'cells': len(cells),
+        'rows': scored,
+        'chunks': len(chunks),
+        'workers': workers,
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+    with open(paths['meta'], 'w') as f:
+        json.dump(grid_meta, f, indent=2)
+    return grid_meta
+
+
+def find_grid(data_version, model_dir=models.MODEL_DIR):
+    # Grid of the latest model for this data version, else None
+    version = models.latest_version(model_dir)
+    if version is None:
+        return None
+    paths = grid_paths(version, data_version, model_dir)
+    return paths if all(os.path.exists(path) for path in paths.values()) else None
+
+
+def load_grid(paths):
+    # Scores stay on disk; slicing a window only reads the pages it touches
+    with open(paths['meta']) as f:
+        meta = json.load(f)
+    return np.load(paths['scores'], mmap_mode='r'), pd.read_parquet(paths['cells']), meta
+
+
+def valid_dates():
+    # Month x day mask of the slots that are calendar dates
+    return AXES['Day'][None, :] <= MONTH_DAYS[AXES['Month'] - 1][:, None]
+
+
+def _axis_index(name, values, chosen):
+    # A slice for the whole axis or a contiguous run of values, else the positions of the chosen values
+    if chosen is None:
+        return slice(None)
+    chosen = np.unique(chosen)
+    missing = chosen[~np.isin(chosen, values)]
+    if len(missing):
+        raise ValueError(f'{name} {missing.tolist()} not on the grid, which runs {values[0]}..{values[-1]}')
+    positions = np.searchsorted(values, chosen)
+    if len(positions) and positions[-1] - positions[0] == len(positions) - 1:
+        return slice(int(positions[0]), int(positions[-1]) + 1)
+    return positions
+
+
+def window(scores, months=None, days=None, hours=None):
+    # Mean score per cell over the selected months, days and hours (None keeps the whole axis), counting real dates only.
+    # Slices keep the memmap a view, so only scattered selections are copied, and only their own slots.
+    index = [_axis_index(name, values, chosen) for (name, values), chosen in zip(AXES.items(), [months, days, hours])]
+    selection = scores
+    for axis, positions in enumerate(index, start=1):
+        if isinstance(positions, slice):
+            selection = selection[(slice(None),) * axis + (positions,)]
+        else:
+            selection = np.take(selection, positions, axis=axis)
+    valid = valid_dates()[index[0]][:, index[1]]
+    slots = int(valid.sum()) * selection.shape[3]
+    hourly = selection.sum(axis=3, dtype='float32')
+    return ((hourly * valid).sum(axis=(1, 2), dtype='float32') / max(slots, 1)).astype('float32')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score the full cell x month x day x hour risk grid with a saved model')
+    parser.add_argument('--source', default=data.SOURCE_PATH)
+    parser.add_argument('--backend', default=query.BACKEND, choices=query.BACKENDS)
+    parser.add_argument('--model-dir', default=models.MODEL_DIR)
+    parser.add_argument('--version', help='model artifact (default: latest)')
+    parser.add_argument('--resolution', type=float, default=heatmap.DEFAULT_RESOLUTION, help='cell size in degrees')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--primary-type', help='crime type to score (default: the most common)')
+    parser.add_argument('--location', help='location description to score (default: the most common)')
+    args = parser.parse_args()
+
+    backend = query.open_backend(args.backend, args.source)
+    frame = backend.frame(columns=['Latitude', 'Longitude', 'Year', 'Primary Type', 'Location Description'] + CELL_COLUMNS)
+    scenario = {key: value for key, value in [('Primary Type', args.primary_type), ('Location Description', args.location)] if value}
+    meta = build_grid(frame, args.version, args.model_dir, backend.version, args.resolution, scenario,
+                      args.chunk_rows, args.workers)
+    print(f"{meta['cells']} cells x {meta['rows'] // max(meta['cells'], 1)} time slots = {meta['rows']} scores "
+          f"in {meta['chunks']} chunks on {meta['workers']} workers, {meta['seconds']}s")
@@ -0,0 +1,125 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from analyzer import taxonomy
+
+# Repeated strings: stored once in a dictionary, each row only keeps a small integer code
+# Derived taxonomy columns (Severity, FBI Category, ...) are stored the same way
+CATEGORICAL_COLUMNS = ['Primary Type', 'Description', 'Location Description', 'Block', 'Season', 'IUCR', 'FBI Code'] \
+    + taxonomy.columns()
+
+# Calendar and administrative columns with small ranges
+INTEGER_COLUMNS = {
+    'ID': 'int32',
+    'Year': 'int16',
+    'Month': 'int8',
+    'Day': 'int8',
+    'Hour': 'int8',
+    'District': 'int8',
+    'Ward': 'int8',
+    'Beat': 'int16',
+    'Community Area': 'int8',
+    'Updated On Year': 'int16',
+    'Updated On Month': 'int8',
+    'Updated On Day': 'int8',
+}
+
+# float32 keeps coordinates to well under a metre around Chicago
+FLOAT_COLUMNS = ['Latitude', 'Longitude', 'X Coordinate', 'Y Coordinate']
+
+BOOLEAN_COLUMNS = ['Arrest', 'Domestic']
+
+# Fixed-width codes; Excel turns codes like '0486' or '05' into numbers and drops the leading zeros
+CODE_WIDTHS = {'IUCR': 4, 'FBI Code': 2}
+
+# Leading underscore: Parquet dataset readers skip it when the file sits next to partitions
+DICTIONARY_NAME = '_dictionary.json'
+
+
+def load_dictionary(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, DICTIONARY_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_dictionary(dictionary, cache_dir):
+    tmp_path = os.path.join(cache_dir, DICTIONARY_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(dictionary, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache_dir, DICTIONARY_NAME))
+
+
+def update_dictionary(df, dictionary=None):
+    # Known values keep their position and new values are appended in sorted order,
+    # so a category code means the same thing across rebuilds and partitions
+    dictionary = {column: list(values) for column, values in (dictionary or {}).items()}
+    for column in CATEGORICAL_COLUMNS:
+        if column not in df.columns:
+            continue
+        known = dictionary.setdefault(column, [])
+        seen = set(known)
+        new_values = sorted(str(value) for value in df[column].dropna().unique() if str(value) not in seen)
+        known.extend(new_values)
+    return dictionary
+
+
+def normalize_codes(df):
+    for column, width in CODE_WIDTHS.items():
+        if column in df.columns:
+            values = df[column].astype(str)
+            df[column] = values.where(~values.str.isdigit(), values.str.zfill(width)).where(df[column].notna())
+    return df
+
+
+def _integer_dtype(series, preferred):
+    info = np.iinfo(preferred)
+    if series.notna().all() and series.min() >= info.min and series.max() <= info.max:
+        return preferred
+    # Missing values or out-of-range values: fall back to a nullable type wide enough to hold them
+    for candidate in ['Int8', 'Int16', 'Int32', 'Int64']:
+        info = np.iinfo(candidate.lower())
+        if series.min() >= info.min and series.max() <= info.max:
+            return candidate
+    return 'Int64'
+
+
+def apply_schema(df, dictionary=None):
+    dictionary = update_dictionary(df, dictionary)
+    df = df.copy()
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            values = df[column].astype(str).where(df[column].notna())
+            df[column] = pd.Categorical(values, categories=dictionary[column])
+
+    for column, dtype in INTEGER_COLUMNS.items():
+        if column in df.columns:
+            df[column] = df[column].astype(_integer_dtype(df[column], dtype))
+
+    for column in FLOAT_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('float32')
+
+    for column in BOOLEAN_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].fillna(False).astype(bool)
+
+    return df, dictionary
+
+
+def pack_flags(series):
+    # One bit per row instead of one byte; unpack with np.unpackbits(bits, count=len(series))
+    return np.packbits(series.to_numpy(dtype=bool))
+
+
+def memory_report(before, after):
+    report = pd.DataFrame({
+        'before': before.memory_usage(index=False, deep=True),
+        'after': after.memory_usage(index=False, deep=True),
+    })
+    report['saved'] = report['before'] - report['after']
+    report.loc['Total'] = report.sum()
+    return report
@@ -0,0 +1,175 @@
+import math
+import numpy as np
+
+# An area filter is filters['Area'] = one of
+#   ['bbox', south, west, north, east]
+#   ['radius', latitude, longitude, metres]
+#   ['polygon', latitude1, longitude1, latitude2, longitude2, ...]
+# so it hashes into filter_signature() and cache keys like any other filter
+AREA = 'Area'
+
+SHAPES = ['bbox', 'radius', 'polygon']
+
+# Grid cells are this many metres on a side; a 500 m radius touches about 25 of them
+CELL_METERS = 250
+
+# Metres per degree of latitude (and of longitude at the equator) on a local flat projection,
+# accurate to well under 1% across a city
+METERS_PER_DEGREE = 111320.0
+
+
+def bbox_area(south, west, north, east):
+    return ['bbox', float(south), float(west), float(north), float(east)]
+
+
+def radius_area(latitude, longitude, meters):
+    return ['radius', float(latitude), float(longitude), float(meters)]
+
+
+def polygon_area(points):
+    # points are (latitude, longitude) pairs; the ring is closed implicitly
+    return ['polygon'] + [float(value) for point in points for value in point]
+
+
+def parse_area(area):
+    # (shape, parameters) of an area filter, checked
+    shape, values = area[0], [float(value) for value in area[1:]]
+    if shape not in SHAPES:
+        raise ValueError(f'Unknown area shape {shape!r}, expected one of {SHAPES}')
+    if shape == 'bbox' and len(values) != 4:
+        raise ValueError('A bbox area needs south, west, north, east')
+    if shape == 'radius' and (len(values) != 3 or values[2] < 0):
+        raise ValueError('A radius area needs latitude, longitude and a non-negative radius in metres')
+    if shape == 'polygon' and (len(values) % 2 or len(values) < 6):
+        raise ValueError('A polygon area needs at least three latitude, longitude points')
+    return shape, values
+
+
+def area_bounds(area):
+    # (south, west, north, east) enclosing the area
+    shape, values = parse_area(area)
+    if shape == 'bbox':
+        return tuple(values)
+    if shape == 'radius':
+        latitude, longitude, meters = values
+        dlat = meters / METERS_PER_DEGREE
+        dlon = meters / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+        return latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon
+    return min(values[0::2]), min(values[1::2]), max(values[0::2]), max(values[1::2])
+
+
+def inside_polygon(x, y, polygon_x, polygon_y):
+    # Even-odd rule, vectorized over the points and looped over the edges.
+    # Unchanged by scaling either axis, so it can run on degrees or on projected metres.
+    inside = np.zeros(len(x), dtype=bool)
+    j = len(polygon_x) - 1
+    for i in range(len(polygon_x)):
+        if polygon_y[i] != polygon_y[j]:
+            crosses = (polygon_y[i] > y) != (polygon_y[j] > y)
+            at = (polygon_x[j] - polygon_x[i]) * (y - polygon_y[i]) / (polygon_y[j] - polygon_y[i]) + polygon_x[i]
+            inside ^= crosses & (x < at)
+        j = i
+    return inside
+
+
+class GridIndex:
+    # Incidents bucketed into square cells on a flat projection of Latitude/Longitude, stored CSR-style:
+    # rows sorted by cell with the start of every cell in offsets. A query reads only the cells its
+    # bounding box overlaps (one contiguous slice per grid row) and tests those points exactly.
+    def __init__(self, latitude, longitude, cell_meters=CELL_METERS):
+        latitude = np.asarray(latitude, dtype='float64')
+        longitude = np.asarray(longitude, dtype='float64')
+        valid = np.isfinite(latitude) & np.isfinite(longitude)
+        rows = np.flatnonzero(valid)
+        latitude, longitude = latitude[rows], longitude[rows]
+
+        self.cell_meters = cell_meters
+        self.rows_total = len(valid)
+        self.latitude0 = float(latitude.mean()) if len(rows) else 0.0
+        self.kx = METERS_PER_DEGREE * math.cos(math.radians(self.latitude0))
+        self.ky = METERS_PER_DEGREE
+        self.west = float(longitude.min()) if len(rows) else 0.0
+        self.south = float(latitude.min()) if len(rows) else 0.0
+        x, y = self._project(latitude, longitude)
+        self.nx = int(x.max() // cell_meters) + 1 if len(rows) else 1
+        self.ny = int(y.max() // cell_meters) + 1 if len(rows) else 1
+
+        cells = (y // cell_meters).astype('int64') * self.nx + (x // cell_meters).astype('int64')
+        order = np.argsort(cells, kind='stable')
+        self.rows = rows[order].astype('int32' if self.rows_total < 2 ** 31 else 'int64')
+        self.x = x[order].astype('float32')
+        self.y = y[order].astype('float32')
+        self.offsets = np.zeros(self.nx * self.ny + 1, dtype='int64')
+        np.cumsum(np.bincount(cells, minlength=self.nx * self.ny), out=self.offsets[1:])
+
+    def _project(self, latitude, longitude):
+        # Metres east and north of the south-west corner of the data
+        return (np.asarray(longitude, dtype='float64') - self.west) * self.kx, \
+            (np.asarray(latitude, dtype='float64') - self.south) * self.ky
+
+    def nbytes(self):
+        return self.rows.nbytes + self.x.nbytes + self.y.nbytes + self.offsets.nbytes
+
+    def _candidates(self, south, west, north, east):
+        # Positions in the sorted arrays of the cells overlapping the box
+        (x0, x1), (y0, y1) = self._project([south, north], [west, east])
+        ix0, ix1 = max(int(x0 // self.cell_meters), 0), min(int(x1 // self.cell_meters), self.nx - 1)
+        iy0, iy1 = max(int(y0 // self.cell_meters), 0), min(int(y1 // self.cell_meters), self.ny - 1)
+        if ix0 > ix1 or iy0 > iy1:
+            return np.zeros(0, dtype='int64')
+        starts = self.offsets[np.arange(iy0, iy1 + 1) * self.nx + ix0]
+        stops = self.offsets[np.arange(iy0, iy1 + 1) * self.nx + ix1 + 1]
+        lengths = stops - starts
+        # Concatenated ranges [start, stop) without a Python loop over grid rows
+        positions = np.arange(lengths.sum(), dtype='int64')
+        return positions + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+
+    def query(self, area):
+        # Row positions inside the area, ascending
+        shape, values = parse_area(area)
+        south, west, north, east = area_bounds(area)
+        positions = self._candidates(south, west, north, east)
+        x, y = self.x[positions], self.y[positions]
+        (x0, x1), (y0, y1) = self._project([south, north], [west, east])
+        keep = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+        if shape == 'radius':
+            (cx,), (cy,) = self._project([values[0]], [values[1]])
+            # Distances use the scale of the centre's latitude, like the dataset backend's expression
+            scale = math.cos(math.radians(values[0])) / math.cos(math.radians(self.latitude0))
+            keep &= ((x - cx) * scale) ** 2 + (y - cy) ** 2 <= values[2] ** 2
+        elif shape == 'polygon':
+            polygon_x, polygon_y = self._project(values[0::2], values[1::2])
+            keep &= inside_polygon(x, y, polygon_x, polygon_y)
+        return np.sort(self.rows[positions[keep]])
+
+
+def area_expression(area, latitude='Latitude', longitude='Longitude'):
+    # The same test as GridIndex.query() as an Arrow filter expression for the dataset backend.
+    # The bounding box comes first so Parquet row group statistics can skip most of the file.
+    import pyarrow.compute as pc
+
+    shape, values = parse_area(area)
+    south, west, north, east = area_bounds(area)
+    lat, lon = pc.field(latitude), pc.field(longitude)
+    # Distances and crossings in float64, like the grid's projection; the columns are stored as float32
+    lat64, lon64 = lat.cast('float64'), lon.cast('float64')
+    expression = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+    if shape == 'radius':
+        kx = METERS_PER_DEGREE * math.cos(math.radians(values[0]))
+        dx = pc.multiply(pc.subtract(lon64, values[1]), kx)
+        dy = pc.multiply(pc.subtract(lat64, values[0]), METERS_PER_DEGREE)
+        expression &= pc.less_equal(pc.add(pc.multiply(dx, dx), pc.multiply(dy, dy)), values[2] ** 2)
+    elif shape == 'polygon':
+        polygon_lat, polygon_lon = values[0::2], values[1::2]
+        inside = None
+        j = len(polygon_lat) - 1
+        for i in range(len(polygon_lat)):
+            if polygon_lat[i] != polygon_lat[j]:
+                slope = (polygon_lon[j] - polygon_lon[i]) / (polygon_lat[j] - polygon_lat[i])
+                at = pc.add(pc.multiply(pc.subtract(lat64, polygon_lat[i]), slope), polygon_lon[i])
+                crossing = ((lat > polygon_lat[i]) != (lat > polygon_lat[j])) & pc.less(lon64, at)
+                inside = crossing if inside is None else pc.xor(inside, crossing)
+            j = i
+        if inside is not None:
+            expression &= inside
+    return expression
@@ -0,0 +1,86 @@
+import threading
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = [50, 100, 500, 1000]
+
+
+def _ranks(series):
+    # Integer rank of each row's value, -1 for missing values
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Rank categories by value, not by their position in the dictionary
+        category_rank = np.argsort(np.argsort(np.asarray(series.cat.categories).astype(str), kind='stable'))
+        # Missing values have code -1, which picks the -1 appended at the end
+        return np.append(category_rank, -1)[series.cat.codes.to_numpy()]
+    codes, _ = pd.factorize(series, sort=True)
+    return codes
+
+
+def sort_order(series):
+    # Stable ascending permutation with missing values last, the number of missing values,
+    # each row's place in the permutation, and where each run of equal present values starts in it
+    ranks = _ranks(series)
+    missing = ranks < 0
+    ranks = np.where(missing, ranks.max(initial=-1) + 1, ranks)
+    dtype = 'int32' if len(series) < 2 ** 31 else 'int64'
+    permutation = np.argsort(ranks, kind='stable').astype(dtype)
+    places = np.empty_like(permutation)
+    places[permutation] = np.arange(len(permutation), dtype=dtype)
+    present = len(permutation) - int(missing.sum())
+    sorted_ranks = ranks[permutation[:present]]
+    runs = np.concatenate([[0], np.flatnonzero(sorted_ranks[1:] != sorted_ranks[:-1]) + 1, [present]]).astype(dtype)
+    return permutation, int(missing.sum()), places, runs
+
+
+class SortIndex:
+    # Row permutations per column, computed on first use and then shared by every session
+    def __init__(self, df):
+        self.df = df
+        self.orders = {}
+        self.lock = threading.Lock()
+
+    def order(self, column):
+        with self.lock:
+            if column not in self.orders:
+                self.orders[column] = sort_order(self.df[column])
+            return self.orders[column]
+
+
+def page_rows(total_rows, rows=None, order=None, ascending=True, page=1, page_size=PAGE_SIZES[0]):
+    # Row positions shown on one page.
+    # rows: selected row positions (None for all rows); order: (permutation, missing count, places, runs) from SortIndex.
+    # Work is proportional to the page, or to the selection when filtered, never to the whole table.
+    # Descending order reverses the runs of equal values but keeps rows within a run, and the missing values
+    # at the end, in table order, as a stable sort does (and as the dataset backend returns them).
+    start = (page - 1) * page_size
+    if order is None:
+        selected = np.arange(total_rows) if rows is None else rows
+        return selected[start:start + page_size], len(selected)
+
+    permutation, missing, places, runs = order
+    present = len(permutation) - missing
+    if rows is None:
+        total = len(permutation)
+        shown = np.arange(start, min(start + page_size, total))
+        if not ascending:
+            # The run holding the mirrored position occupies [present - runs[run + 1], present - runs[run]) descending
+            head = shown < present
+            run = np.searchsorted(runs, present - 1 - shown[head], side='right') - 1
+            shown[head] = runs[run] + shown[head] - (present - runs[run + 1])
+        return permutation[shown], total
+
+    # The selected rows' places in the permutation, in sorted order
+    shown = np.sort(places[rows])
+    if not ascending:
+        selected_present = int(np.searchsorted(shown, present))
+        head = shown[:selected_present]
+        run = np.searchsorted(runs, head, side='right') - 1
+        shown = np.concatenate([head[np.argsort(-run, kind='stable')], shown[selected_present:]])
+    return permutation[shown[start:start + page_size]], len(shown)
+
+
+def page_frame(df, positions, columns=None):
+    # Only the visible window is gathered, and only the chosen columns
+    if columns is not None:
+        df = df[list(columns)]
+    return df.take(positions)
@@ -0,0 +1,92 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Optional JSON file with the same shape as DEFAULT_TAXONOMY; its columns replace the defaults of the same name
+TAXONOMY_PATH = os.environ.get('CRIME_TAXONOMY_PATH')
+
+# Derived columns added at ingest. Each rule maps values of a source column to a label; later rules
+# override earlier ones for the rows they match, and rows matching no rule get the default label.
+DEFAULT_TAXONOMY = {
+    'Severity': {
+        'default': 'Less Severe',
+        'rules': [
+            {'source': 'Primary Type', 'groups': {
+                'Severe': ['HOMICIDE', 'CRIMINAL SEXUAL ASSAULT', 'BATTERY', 'KIDNAPPING', 'ROBBERY', 'SEX OFFENSE',
+                           'ARSON', 'NARCOTICS', 'WEAPONS VIOLATION'],
+            }},
+        ],
+    },
+    # FBI Uniform Crime Reporting index classes, from the 'FBI Code' column
+    'FBI Category': {
+        'default': 'Non-Index',
+        'rules': [
+            {'source': 'FBI Code', 'groups': {
+                'Violent': ['01A', '01B', '02', '03', '04A', '04B'],
+                'Property': ['05', '06', '07', '09'],
+            }},
+        ],
+    },
+}
+
+
+def load_taxonomy(path=TAXONOMY_PATH):
+    taxonomy = dict(DEFAULT_TAXONOMY)
+    if path:
+        with open(path) as f:
+            taxonomy.update(json.load(f))
+    return taxonomy
+
+
+def signature(taxonomy=None):
+    # Changes whenever a label or rule changes, so cached data with old labels is rebuilt
+    taxonomy = taxonomy or load_taxonomy()
+    return hashlib.sha1(json.dumps(taxonomy, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def labels(definition):
+    # Default label first, then every group label in rule order
+    result = [definition['default']]
+    for rule in definition['rules']:
+        result.extend(label for label in rule['groups'] if label not in result)
+    return result
+
+
+def _codes(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), pd.Index(series.cat.categories.astype(str))
+    codes, uniques = pd.factorize(series.astype(str).where(series.notna()))
+    return codes, pd.Index(uniques)
+
+
+def classify(df, definition):
+    # One lookup table per rule from the source column's distinct values to label codes,
+    # then a single take over the row codes; no per-row Python work
+    names = labels(definition)
+    result = np.zeros(len(df), dtype='int8' if len(names) < 128 else 'int16')
+    for rule in definition['rules']:
+        if rule['source'] not in df.columns:
+            continue
+        codes, values = _codes(df[rule['source']])
+        # -1 in the table means "no label from this rule"; the extra last slot is for missing values
+        lookup = np.full(len(values) + 1, -1, dtype=result.dtype)
+        for label, members in rule['groups'].items():
+            positions = values.get_indexer([str(member) for member in members])
+            lookup[positions[positions >= 0]] = names.index(label)
+        matched = lookup[np.where(codes < 0, len(values), codes)]
+        result = np.where(matched >= 0, matched, result)
+    return pd.Categorical.from_codes(result, categories=names)
+
+
+def apply_taxonomy(df, taxonomy=None):
+    taxonomy = taxonomy or load_taxonomy()
+    df = df.copy()
+    for column, definition in taxonomy.items():
+        df[column] = classify(df, definition)
+    return df
+
+
+def columns(taxonomy=None):
+    return list(taxonomy or load_taxonomy())
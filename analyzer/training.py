@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import tempfile
+import itertools
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from analyzer import data, models, query, instrument
+
+# Hyperparameters tried per algorithm; every combination is one candidate
+GRIDS = {
+    'random_forest': {'n_estimators': [100, 200], 'max_depth': [None, 20], 'min_samples_leaf': [1, 5]},
+    'decision_tree': {'max_depth': [None, 10, 20], 'min_samples_leaf': [1, 5, 20]},
+}
+
+FOLDS = 5
+
+# Training arrays opened read-only in each worker; the OS shares the pages instead of every worker copying them
+_ARRAYS = {}
+
+
+def candidates(algorithm, grid=None):
+    grid = grid or GRIDS[algorithm]
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def fold_indices(y, folds, seed):
+    # Test rows of every fold of one stratified split
+    from sklearn.model_selection import StratifiedKFold
+
+    return [test for _, test in StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(np.zeros(len(y)), y)]
+
+
+def write_arrays(X, y, directory, folds, seed):
+    # Rows are stored grouped by fold, and the whole array twice in a row, so every fold's test rows and its
+    # training rows (the folds after it, wrapping around to the ones before) are both contiguous slices.
+    # Workers fit on views of the memory map and never copy rows; the second copy only costs disk and page cache.
+    tests = fold_indices(y, folds, seed)
+    order = np.concatenate(tests)
+    bounds = np.concatenate([[0], np.cumsum([len(test) for test in tests])])
+    X_out = np.lib.format.open_memmap(os.path.join(directory, 'X.npy'), mode='w+', dtype='float32',
+                                      shape=(2 * len(order), X.shape[1]))
+    X_out[:len(order)] = np.asarray(X, dtype='float32')[order]
+    X_out[len(order):] = X_out[:len(order)]
+    X_out.flush()
+    del X_out
+    y_ordered = np.asarray(y, dtype=bool)[order]
+    np.save(os.path.join(directory, 'y.npy'), np.concatenate([y_ordered, y_ordered]))
+    np.save(os.path.join(directory, 'bounds.npy'), bounds)
+
+
+def _open_arrays(directory):
+    if _ARRAYS.get('directory') != directory:
+        _ARRAYS.update(directory=directory,
+                       X=np.load(os.path.join(directory, 'X.npy'), mmap_mode='r'),
+                       y=np.load(os.path.join(directory, 'y.npy'), mmap_mode='r'),
+                       bounds=np.load(os.path.join(directory, 'bounds.npy')))
+    return _ARRAYS['X'], _ARRAYS['y'], _ARRAYS['bounds']
+
+
+def fit_fold(directory, algorithm, params, fold):
+    X, y, bounds = _open_arrays(directory)
+    rows = bounds[-1]
+    test_rows = slice(bounds[fold], bounds[fold + 1])
+    train_rows = slice(bounds[fold + 1], rows + bounds[fold])
+
+    start = time.perf_counter()
+    # One core per fit: the pool already runs one fit per core
+    model = models.make_model(algorithm, **({**params, 'n_jobs': 1} if algorithm == 'random_forest' else params))
+    model.fit(X[train_rows], y[train_rows])
+    fit_seconds = time.perf_counter() - start
+    metrics = models.evaluate(y[test_rows], model.predict(X[test_rows]))
+
+    # High-water mark of the worker's resident memory, native allocations and the pages of the shared arrays
+    # it has touched included (None where it cannot be read); a worker runs many fits, so this bounds rather
+    # than isolates one fit
+    peak = instrument.peak_rss_bytes()
+    return {'fold': fold, 'fit_seconds': fit_seconds, 'seconds': time.perf_counter() - start,
+            'peak_mb': None if peak is None else peak / 1024 ** 2, 'pid': os.getpid(), **metrics}
+
+
+def search(X, y, algorithm='random_forest', grid=None, folds=FOLDS, workers=None, seed=42, work_dir=None):
+    # Cross-validated grid search with one (candidate, fold) fit per task.
+    # Returns one row per candidate with mean/std metrics, summed fit time and the largest worker peak memory.
+    params_list = candidates(algorithm, grid)
+    workers = max(1, workers or os.cpu_count() or 1)
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as directory:
+        write_arrays(X, y, directory, folds, seed)
+        tasks = [(index, fold) for index in range(len(params_list)) for fold in range(folds)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(fit_fold, directory, algorithm, params_list[index], fold)
+                       for index, fold in tasks]
+            results = [(index, future.result()) for (index, _), future in zip(tasks, futures)]
+
+    rows = []
+    for index, params in enumerate(params_list):
+        fold_results = pd.DataFrame([result for candidate, result in results if candidate == index])
+        row = {'candidate': index, 'params': json.dumps(params)}
+        for metric in ['accuracy', 'precision', 'recall', 'f1']:
+            row[f'{metric}_mean'] = fold_results[metric].mean()
+            row[f'{metric}_std'] = fold_results[metric].std(ddof=0)
+        row['fit_seconds'] = fold_results['fit_seconds'].sum()
+        row['peak_mb'] = fold_results['peak_mb'].max()
+        rows.append(row)
+
+    report = pd.DataFrame(rows).sort_values('f1_mean', ascending=False).reset_index(drop=True)
+    report.attrs['wall_seconds'] = time.perf_counter() - start
+    report.attrs['workers'] = workers
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cross-validated hyperparameter search for the risk models')
+    parser.add_argument('--source', default=data.SOURCE_PATH)
+    parser.add_argument('--backend', default=query.BACKEND, choices=query.BACKENDS)
+    parser.add_argument('--algorithm', default='random_forest', choices=models.ALGORITHMS)
+    parser.add_argument('--folds', type=int, default=FOLDS)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--years', type=int, nargs='*', help='only train on these years')
+    parser.add_argument('--report', help='write the per-candidate report to this JSON file')
+    parser.add_argument('--save', action='store_true', help='refit the best candidate and save it as a model artifact')
+    parser.add_argument('--model-dir', default=models.MODEL_DIR)
+    args = parser.parse_args()
+
+    backend = query.open_backend(args.backend, args.source)
+    filters = {'Year': args.years} if args.years else None
+    frame = backend.frame(filters, [column for column in models.FEATURES + [models.TARGET] if column in backend.columns])
+    frame, y = models.training_frame(frame)
+    encoder = models.FeatureEncoder().fit(frame)
+    X = encoder.transform(frame)
+    del frame
+
+    report = search(X, y, args.algorithm, folds=args.folds, workers=args.workers)
+    print(f"{len(report)} candidates x {args.folds} folds on {len(y)} rows with {report.attrs['workers']} workers "
+          f"in {report.attrs['wall_seconds']:.1f}s")
+    print(report[['params', 'f1_mean', 'f1_std', 'accuracy_mean', 'fit_seconds', 'peak_mb']].to_string(index=False))
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'algorithm': args.algorithm, 'rows': len(y), 'folds': args.folds, **report.attrs,
+                       'candidates': report.to_dict(orient='records')}, f, indent=2)
+
+    if args.save:
+        best = json.loads(report.loc[0, 'params'])
+        start = time.perf_counter()
+        model = models.make_model(args.algorithm, **best)
+        model.fit(X, y)
+        meta = {'algorithm': args.algorithm, 'params': best, 'rows': len(y),
+                'train_seconds': round(time.perf_counter() - start, 2),
+                'metrics': {metric: float(report.loc[0, f'{metric}_mean']) for metric in ['accuracy', 'precision', 'recall', 'f1']},
+                'cv_folds': args.folds}
+        version = models.save_artifact(model, encoder, meta, backend.version, args.model_dir)
+        print(f'saved {version} ({best})')
@@ -0,0 +1 @@
+# Synthetic-data benchmarks of the dashboard pages; run with 'python -m benchmarks.run'
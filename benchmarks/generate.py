@@ -0,0 +1,269 @@
+import os
+import json
+import shutil
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from analyzer import etl, schema, taxonomy
+
+# Named sizes for the benchmark runs
+SIZES = {'10k': 10000, '1m': 1000000, '10m': 10000000}
+
+# Rows generated and written per chunk, so 10M rows never sit in memory at once
+CHUNK_ROWS = 1000000
+
+# Crime types with their approximate share of Chicago incidents since 2001, number of distinct descriptions,
+# arrest rate, domestic share and FBI code
+PRIMARY_TYPES = [
+    ('THEFT', 21.0, 15, 0.11, 0.04, '06'),
+    ('BATTERY', 18.2, 25, 0.22, 0.42, '08B'),
+    ('CRIMINAL DAMAGE', 11.3, 12, 0.07, 0.12, '14'),
+    ('NARCOTICS', 9.2, 25, 0.99, 0.00, '18'),
+    ('ASSAULT', 6.5, 12, 0.23, 0.24, '08A'),
+    ('OTHER OFFENSE', 6.2, 25, 0.17, 0.30, '26'),
+    ('BURGLARY', 5.4, 6, 0.06, 0.02, '05'),
+    ('MOTOR VEHICLE THEFT', 4.8, 6, 0.08, 0.01, '07'),
+    ('DECEPTIVE PRACTICE', 4.3, 25, 0.12, 0.01, '11'),
+    ('ROBBERY', 3.7, 12, 0.09, 0.02, '03'),
+    ('CRIMINAL TRESPASS', 2.7, 6, 0.70, 0.05, '26'),
+    ('WEAPONS VIOLATION', 1.3, 15, 0.79, 0.01, '15'),
+    ('PROSTITUTION', 0.9, 10, 0.99, 0.00, '16'),
+    ('OFFENSE INVOLVING CHILDREN', 0.7, 12, 0.18, 0.45, '20'),
+    ('PUBLIC PEACE VIOLATION', 0.7, 15, 0.60, 0.03, '24'),
+    ('SEX OFFENSE', 0.4, 15, 0.25, 0.15, '17'),
+    ('CRIMINAL SEXUAL ASSAULT', 0.3, 10, 0.14, 0.20, '02'),
+    ('INTERFERENCE WITH PUBLIC OFFICER', 0.2, 8, 0.93, 0.01, '24'),
+    ('LIQUOR LAW VIOLATION', 0.2, 8, 0.98, 0.00, '22'),
+    ('GAMBLING', 0.2, 10, 0.99, 0.00, '19'),
+    ('ARSON', 0.15, 6, 0.12, 0.05, '09'),
+    ('HOMICIDE', 0.15, 4, 0.45, 0.08, '01A'),
+    ('KIDNAPPING', 0.08, 6, 0.12, 0.30, '20'),
+    ('STALKING', 0.07, 6, 0.12, 0.40, '26'),
+    ('INTIMIDATION', 0.06, 8, 0.15, 0.10, '26'),
+    ('CONCEALED CARRY LICENSE VIOLATION', 0.02, 4, 0.90, 0.00, '15'),
+    ('OBSCENITY', 0.01, 3, 0.40, 0.10, '26'),
+    ('PUBLIC INDECENCY', 0.01, 2, 0.90, 0.00, '26'),
+    ('HUMAN TRAFFICKING', 0.005, 2, 0.20, 0.05, '26'),
+    ('NON-CRIMINAL', 0.005, 3, 0.02, 0.05, '26'),
+]
+
+# The most common location descriptions; a long tail of rare ones is added up to LOCATION_COUNT
+LOCATIONS = ['STREET', 'RESIDENCE', 'APARTMENT', 'SIDEWALK', 'OTHER', 'PARKING LOT/GARAGE(NON.RESID.)', 'ALLEY',
+             'SMALL RETAIL STORE', 'RESTAURANT', 'SCHOOL, PUBLIC, BUILDING', 'VEHICLE NON-COMMERCIAL',
+             'RESIDENCE-GARAGE', 'RESIDENTIAL YARD (FRONT/BACK)', 'DEPARTMENT STORE', 'GROCERY FOOD STORE',
+             'GAS STATION', 'COMMERCIAL / BUSINESS OFFICE', 'PARK PROPERTY', 'CTA PLATFORM', 'CHA APARTMENT',
+             'BAR OR TAVERN', 'RESIDENCE PORCH/HALLWAY', 'DRUG STORE', 'HOSPITAL BUILDING/GROUNDS', 'CTA BUS',
+             'CONVENIENCE STORE', 'HOTEL/MOTEL', 'BANK', 'CTA TRAIN', 'CHA PARKING LOT/GROUNDS']
+LOCATION_COUNT = 150
+
+# Incidents per year in thousands, 2001-2024
+YEAR_COUNTS = [485, 486, 475, 469, 453, 448, 437, 427, 392, 370, 352, 336, 307, 275, 264, 269, 269, 268, 261,
+               212, 209, 239, 262, 258]
+FIRST_YEAR = 2001
+
+MONTH_WEIGHTS = [7.5, 6.8, 8.0, 8.0, 8.8, 8.9, 9.3, 9.2, 8.7, 8.7, 8.0, 7.6]
+DAYS_IN_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+HOUR_WEIGHTS = [4.6, 3.6, 3.1, 2.5, 2.0, 1.7, 2.0, 2.6, 3.6, 4.1, 4.2, 4.2, 5.3, 4.6, 4.8, 5.1, 5.1, 5.3, 5.5,
+                5.6, 5.3, 5.0, 4.9, 4.3]
+
+# The 22 police districts, each split into beats numbered like the real ones (district * 100 + sector * 10 + beat)
+DISTRICTS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 14, 15, 16, 17, 18, 19, 20, 22, 24, 25]
+BEATS_PER_DISTRICT = (8, 16)
+BLOCKS_PER_BEAT = 130
+WARDS = 50
+COMMUNITY_AREAS = 77
+
+STREETS = ['STATE ST', 'MICHIGAN AVE', 'HALSTED ST', 'ASHLAND AVE', 'WESTERN AVE', 'PULASKI RD', 'CICERO AVE',
+           'MADISON ST', 'CHICAGO AVE', 'NORTH AVE', 'FULLERTON AVE', 'BELMONT AVE', 'IRVING PARK RD',
+           'LAWRENCE AVE', 'DEVON AVE', 'ROOSEVELT RD', 'CERMAK RD', '35TH ST', '47TH ST', '55TH ST', '63RD ST',
+           '71ST ST', '79TH ST', '87TH ST', '95TH ST', '103RD ST', 'KEDZIE AVE', 'CALIFORNIA AVE', 'DAMEN AVE',
+           'RACINE AVE', 'COTTAGE GROVE AVE', 'STONY ISLAND AVE', 'KING DR', 'LARAMIE AVE', 'AUSTIN AVE',
+           'HARLEM AVE', 'DIVISION ST', 'GRAND AVE', 'LAKE ST', 'JACKSON BLVD', 'VAN BUREN ST', 'OGDEN AVE',
+           'ARCHER AVE', 'KOSTNER AVE', 'CENTRAL AVE', 'MILWAUKEE AVE', 'CLARK ST', 'BROADWAY', 'SHERIDAN RD',
+           'WENTWORTH AVE']
+DIRECTIONS = ['N', 'S', 'E', 'W']
+
+# City bounding box and the spread of incidents around their beat centre, in degrees
+LATITUDE_RANGE = (41.65, 42.02)
+LONGITUDE_RANGE = (-87.84, -87.53)
+INCIDENT_SPREAD = 0.004
+
+# Linear approximation of Illinois State Plane East (feet) around the city centre
+PLANE_ORIGIN = (41.85, -87.65, 1176000, 1890000)
+FEET_PER_DEGREE = (364000, 272000)
+
+
+def shares(weights):
+    weights = np.asarray(weights, dtype='float64')
+    return weights / weights.sum()
+
+
+def zipf_weights(count, exponent=1.0):
+    return shares(1 / np.arange(1, count + 1) ** exponent)
+
+
+def build_world(seed):
+    # Everything that does not change per incident: beats with their centres, wards and community areas,
+    # block names, and the description/IUCR lists per crime type
+    rng = np.random.default_rng([seed, 0])
+    beats, centres, weights, wards, areas = [], [], [], [], []
+    for district in DISTRICTS:
+        centre = [rng.uniform(*LATITUDE_RANGE), rng.uniform(*LONGITUDE_RANGE)]
+        for index in range(rng.integers(*BEATS_PER_DISTRICT, endpoint=True)):
+            beats.append(district * 100 + (index // 4 + 1) * 10 + index % 4 + 1)
+            centres.append(np.clip(centre + rng.normal(0, 0.015, 2), [LATITUDE_RANGE[0], LONGITUDE_RANGE[0]],
+                                   [LATITUDE_RANGE[1], LONGITUDE_RANGE[1]]))
+            # A few beats carry a large share of incidents
+            weights.append(rng.lognormal(0, 0.8))
+            wards.append(rng.integers(1, WARDS, endpoint=True))
+            areas.append(rng.integers(1, COMMUNITY_AREAS, endpoint=True))
+
+    block_ids = np.arange(len(beats) * BLOCKS_PER_BEAT)
+    blocks = np.array([f'{(block * 37) % 140:03d}XX {DIRECTIONS[(block // len(STREETS)) % 4]} '
+                       f'{STREETS[block % len(STREETS)]}' for block in block_ids], dtype=object)
+
+    descriptions, iucr, offsets = [], [], []
+    for type_index, (name, _, variants, _, _, _) in enumerate(PRIMARY_TYPES):
+        offsets.append(len(descriptions))
+        descriptions.extend(f'{name} - TYPE {variant + 1}' for variant in range(variants))
+        iucr.extend(f'{(type_index + 1) * 100 + variant:04d}' for variant in range(variants))
+
+    locations = LOCATIONS + [f'OTHER LOCATION {index:03d}' for index in range(LOCATION_COUNT - len(LOCATIONS))]
+    return {
+        'beats': np.array(beats, dtype='int64'),
+        'centres': np.array(centres),
+        'beat_weights': np.array(weights) / np.sum(weights),
+        'districts': np.array(beats) // 100,
+        'wards': np.array(wards, dtype='int64'),
+        'areas': np.array(areas, dtype='int64'),
+        'blocks': blocks,
+        'descriptions': np.array(descriptions, dtype=object),
+        'iucr': np.array(iucr, dtype=object),
+        'description_offsets': np.array(offsets),
+        'locations': np.array(locations, dtype=object),
+        'location_weights': zipf_weights(LOCATION_COUNT, 1.3),
+        'times': np.array([f'{minute // 60:02d}:{minute % 60:02d}:00' for minute in range(24 * 60)], dtype=object),
+    }
+
+
+def generate_chunk(world, rng, first_id, rows):
+    # One chunk of cleaned incidents in the column order of 'Clean Crime Dataset.xlsx'
+    types = PRIMARY_TYPES
+    type_index = rng.choice(len(types), rows, p=shares([share for _, share, *_ in types]))
+    variants = np.array([variants for _, _, variants, *_ in types])[type_index]
+    # Within a type the first descriptions are the common ones
+    variant = np.minimum((rng.pareto(1.2, rows) * 1.5).astype('int64'), variants - 1)
+    description_index = world['description_offsets'][type_index] + variant
+
+    beat_index = rng.choice(len(world['beats']), rows, p=world['beat_weights'])
+    block_rank = np.minimum((rng.pareto(0.9, rows) * 3).astype('int64'), BLOCKS_PER_BEAT - 1)
+    latitude = world['centres'][beat_index, 0] + rng.normal(0, INCIDENT_SPREAD, rows)
+    longitude = world['centres'][beat_index, 1] + rng.normal(0, INCIDENT_SPREAD, rows)
+
+    year = FIRST_YEAR + rng.choice(len(YEAR_COUNTS), rows, p=shares(YEAR_COUNTS))
+    month = 1 + rng.choice(12, rows, p=shares(MONTH_WEIGHTS))
+    day = 1 + (rng.random(rows) * np.array(DAYS_IN_MONTH)[month - 1]).astype('int64')
+    hour = rng.choice(24, rows, p=shares(HOUR_WEIGHTS))
+    # Reported times cluster on the hour and half hour
+    minute = np.where(rng.random(rows) < 0.5, rng.choice([0, 30], rows), rng.integers(0, 60, rows))
+
+    arrest_rate = np.array([rate for _, _, _, rate, _, _ in types])[type_index]
+    domestic_rate = np.array([rate for _, _, _, _, rate, _ in types])[type_index]
+    updated_year = np.minimum(year + rng.geometric(0.6, rows) - 1, FIRST_YEAR + len(YEAR_COUNTS) - 1)
+    origin_lat, origin_lon, origin_x, origin_y = PLANE_ORIGIN
+    ids = np.arange(first_id, first_id + rows, dtype='int64')
+
+    return pd.DataFrame({
+        'ID': ids,
+        'Case Number': pd.Series(ids).astype(str).str.zfill(8).radd('J').to_numpy(),
+        'Block': world['blocks'][beat_index * BLOCKS_PER_BEAT + block_rank],
+        'IUCR': world['iucr'][description_index],
+        'Primary Type': np.array([name for name, *_ in types], dtype=object)[type_index],
+        'Description': world['descriptions'][description_index],
+        'Location Description': world['locations'][rng.choice(LOCATION_COUNT, rows, p=world['location_weights'])],
+        'Arrest': rng.random(rows) < arrest_rate,
+        'Domestic': rng.random(rows) < domestic_rate,
+        'Beat': world['beats'][beat_index],
+        'District': world['districts'][beat_index],
+        'Ward': world['wards'][beat_index],
+        'Community Area': world['areas'][beat_index],
+        'FBI Code': np.array([code for *_, code in types], dtype=object)[type_index],
+        'X Coordinate': np.round(origin_x + (longitude - origin_lon) * FEET_PER_DEGREE[1]).astype('int64'),
+        'Y Coordinate': np.round(origin_y + (latitude - origin_lat) * FEET_PER_DEGREE[0]).astype('int64'),
+        'Year': year,
+        'Latitude': latitude.round(9),
+        'Longitude': longitude.round(9),
+        'Time': world['times'][hour * 60 + minute],
+        'Month': month,
+        'Day': day,
+        'Hour': hour,
+        'Updated On Time': world['times'][rng.integers(0, 24 * 60, rows)],
+        'Updated On Year': updated_year,
+        'Updated On Month': rng.integers(1, 13, rows),
+        'Updated On Day': rng.integers(1, 29, rows),
+        'Season': pd.Series(month).map(etl.SEASONS).to_numpy(),
+    }, columns=etl.CLEAN_COLUMNS)
+
+
+def parse_size(size):
+    return SIZES[size.lower()] if size.lower() in SIZES else int(size)
+
+
+def read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, etl.MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def generate(out_dir, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    # Writes a partitioned dataset in the layout of analyzer/etl.py, readable by both query backends.
+    # The same rows and seed always give the same data; an existing matching dataset is reused.
+    generator = {'rows': rows, 'seed': seed, 'chunk_rows': chunk_rows}
+    manifest = read_manifest(out_dir)
+    if manifest is not None and manifest.get('generator') == generator \
+            and manifest.get('taxonomy') == taxonomy.signature():
+        return manifest
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    start = time.perf_counter()
+    world = build_world(seed)
+    dictionary = None
+    files = []
+    chunk_seeds = np.random.SeedSequence(seed).spawn(-(-rows // chunk_rows))
+    for part, chunk_start in enumerate(range(0, rows, chunk_rows)):
+        chunk = generate_chunk(world, np.random.default_rng(chunk_seeds[part]), 1 + chunk_start,
+                               min(chunk_rows, rows - chunk_start))
+        written, dictionary = etl.write_chunk(chunk, out_dir, part, dictionary)
+        files.extend(written)
+
+    schema.save_dictionary(dictionary, out_dir)
+    manifest = {
+        'source': f'synthetic:{rows}:{seed}',
+        'generator': generator,
+        'rows_in': rows,
+        'rows_out': rows,
+        'partitioning': etl.PARTITION_COLUMNS,
+        'taxonomy': taxonomy.signature(),
+        'files': sorted(files),
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+    with open(os.path.join(out_dir, etl.MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a seeded Chicago-shaped crime dataset for benchmarking')
+    parser.add_argument('out_dir', help='output directory for the partitioned dataset')
+    parser.add_argument('--rows', default='10k', help=f"row count or one of {', '.join(SIZES)}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    manifest = generate(args.out_dir, parse_size(args.rows), args.seed, args.chunk_rows)
+    print(f"{manifest['rows_out']} rows in {len(manifest['files'])} files, generated in {manifest['seconds']}s")
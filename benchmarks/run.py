@@ -0,0 +1,296 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+import argparse
+import subprocess
+import numpy as np
+import pandas as pd
+from analyzer import charts, export, figures, heatmap, query, recidivism
+from benchmarks import generate
+import views
+
+STAGES = ['import', 'load', 'filter', 'aggregate', 'render', 'export']
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What Final.py imports before any page, and what it runs for the Home page
+APP_MODULES = ['streamlit_option_menu', 'analyzer.instrument', 'views']
+
+# Run in a fresh interpreter: imports the comma-separated modules of argv[1] untimed, then times those of argv[2]
+IMPORT_SCRIPT = '''
+import sys, time, importlib
+for name in filter(None, sys.argv[1].split(',')):
+    importlib.import_module(name)
+start = time.perf_counter()
+for name in filter(None, sys.argv[2].split(',')):
+    importlib.import_module(name)
+print(time.perf_counter() - start)
+'''
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# A stage regresses when it is this much slower than the baseline, and by more than MIN_SECONDS
+THRESHOLD = 0.25
+MIN_SECONDS = 0.1
+
+EXPORT_FORMATS = ['csv', 'parquet']
+
+
+def _recidivism(crime_query, filters):
+    # What the Recidivism Rates tab computes before showing its tables
+    columns = [column for column in recidivism.columns_for('Block') if column in crime_query.columns]
+    return recidivism.analyze(crime_query.frame(columns=columns), 'Block', 365, 'Arrest')
+
+
+# One entry per tab of Final.py, doing the same backend calls as the tab does on a rerun:
+# options fills the widgets, filters are the selection (None picks the most common value),
+# table and export say whether the tab shows a table page and an export panel,
+# charts are the tab's figures in analyzer/figures.py, drawn with the pages' own data and draw functions,
+# tables are other computations the tab shows, and heatmap adds the tab's Folium heatmap of the selected rows.
+PAGES = [
+    {'page': 'Temporal Analysis', 'tab': 'Crime Trends Over Time', 'options': ['Year', 'Month', 'Day'],
+     'filters': {'Year': None}, 'table': True, 'export': True,
+     'charts': ['crime-count-by-year', 'crime-count-by-month', 'crime-count-by-day']},
+    {'page': 'Temporal Analysis', 'tab': 'Peak Crime Hours', 'options': ['Day'],
+     'filters': {'Day': None}, 'table': True, 'export': False, 'charts': ['crime-per-hour']},
+    {'page': 'Geospatial Analysis', 'tab': 'Crime Hotspots', 'options': ['Year', 'Primary Type'],
+     'filters': {'Year': None, 'Primary Type': None}, 'table': False, 'export': False, 'charts': [], 'heatmap': True},
+    {'page': 'Geospatial Analysis', 'tab': 'District Analysis', 'options': ['Primary Type', 'District'],
+     'filters': {'Primary Type': None}, 'table': True, 'export': True, 'charts': ['crime-per-district']},
+    {'page': 'Geospatial Analysis', 'tab': 'Ward Analysis', 'options': ['Primary Type', 'Ward'],
+     'filters': {'Primary Type': None}, 'table': True, 'export': True, 'charts': ['crime-per-ward']},
+    {'page': 'Crime Type Analysis', 'tab': 'Distribution of Crime Types', 'options': ['Primary Type'],
+     'filters': {'Primary Type': None}, 'table': True, 'export': True, 'charts': ['crime-per-description']},
+    {'page': 'Crime Type Analysis', 'tab': 'Severity Analysis', 'options': ['Primary Type', 'Severity'],
+     'filters': {'Severity': ['Severe']}, 'table': True, 'export': True, 'charts': ['severity-distribution']},
+    {'page': 'Arrest and Domestic Incident Analysis', 'tab': 'Arrest Rates', 'options': ['Primary Type'],
+     'filters': {'Primary Type': None}, 'table': True, 'export': True,
+     'charts': ['arrest-rate-by-crime-type', 'arrest-rate-by-district', 'arrest-rate-by-ward', 'arrest-rate-by-year']},
+    {'page': 'Arrest and Domestic Incident Analysis', 'tab': 'Domestic vs. Non-Domestic Crimes',
+     'options': ['Primary Type'], 'filters': {'Primary Type': None}, 'table': True, 'export': True,
+     'charts': ['domestic-by-type'], 'tables': {'arrest-rate-by-domestic': lambda q, f: q.arrest_rate('Domestic', f)}},
+    {'page': 'Location-Specific Analysis', 'tab': 'Location Description Analysis',
+     'options': ['Location Description'], 'filters': {'Location Description': None}, 'table': True, 'export': True,
+     'charts': ['location-description-counts']},
+    {'page': 'Location-Specific Analysis', 'tab': 'Comparison by Beat and Community Area', 'options': ['Beat'],
+     'filters': {'Beat': None}, 'table': True, 'export': True, 'charts': ['crimes-by-beat', 'crimes-by-community-area']},
+    {'page': 'Seasonal and Weather Impact', 'tab': 'Seasonal Analysis', 'options': ['Season'],
+     'filters': {'Season': None}, 'table': True, 'export': True,
+     'charts': ['crimes-by-season', 'crimes-by-type-and-season']},
+    {'page': 'Repeat Offenders and Recidivism', 'tab': 'Repeat Crime Locations', 'options': ['Location Description'],
+     'filters': {'Location Description': None}, 'table': True, 'export': True, 'charts': ['repeat-crime-count']},
+    {'page': 'Repeat Offenders and Recidivism', 'tab': 'Recidivism Rates', 'options': [],
+     'filters': {}, 'table': False, 'export': False, 'charts': [], 'tables': {'recidivism': _recidivism}},
+]
+
+
+def resolve_filters(crime_query, filters):
+    # None stands for the most common value of the column in this dataset
+    resolved = {}
+    for column, values in filters.items():
+        if values is None:
+            value = crime_query.counts(column).idxmax()
+            values = [value.item() if isinstance(value, np.generic) else value]
+        resolved[column] = values
+    return resolved
+
+
+def _timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def _draw(chart_id, values):
+    draw = figures.FIGURES[chart_id]['draw']
+    return lambda ax: draw(ax, values)
+
+
+def _heatmap_html(latitude, longitude):
+    crime_map, _, _ = heatmap.heat_map(latitude, longitude)
+    return crime_map.get_root().render()
+
+
+def run_page(crime_query, spec, filters, formats, work_dir):
+    # Seconds per stage for one rerun of the tab; stages the tab does not have are left out
+    timings = {}
+    _, timings['load'] = _timed(lambda: [crime_query.options(column) for column in spec['options']])
+
+    if spec['table']:
+        _, timings['filter'] = _timed(lambda: (crime_query.count(filters), crime_query.page(filters)))
+    elif filters:
+        _, timings['filter'] = _timed(lambda: crime_query.count(filters))
+
+    def aggregate():
+        for compute in spec.get('tables', {}).values():
+            compute(crime_query, filters)
+        return {chart_id: figures.FIGURES[chart_id]['data'](crime_query, filters) for chart_id in spec['charts']}
+    results, timings['aggregate'] = _timed(aggregate)
+    if spec.get('heatmap'):
+        coordinates, seconds = _timed(lambda: crime_query.arrays(['Latitude', 'Longitude'], filters))
+        timings['aggregate'] += seconds
+
+    _, timings['render'] = _timed(lambda: [charts.render_png(_draw(chart_id, results[chart_id]),
+                                                             figures.FIGURES[chart_id]['figsize'])
+                                           for chart_id in spec['charts'] if len(results[chart_id])])
+    if spec.get('heatmap') and len(coordinates['Latitude']):
+        _, seconds = _timed(lambda: _heatmap_html(coordinates['Latitude'], coordinates['Longitude']))
+        timings['render'] += seconds
+
+    if spec['export']:
+        def write_exports():
+            # Streamed from the backend chunk by chunk, as the export panel does
+            for fmt in formats:
+                os.remove(export.export_chunks(crime_query.chunks(filters), fmt, work_dir).path)
+        _, timings['export'] = _timed(write_exports)
+    return timings
+
+
+def import_seconds(modules, preloaded=(), repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT, ','.join(preloaded), ','.join(modules)],
+                                cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        best = min(best, float(output.split()[-1]))
+    return best
+
+
+def run_imports(repeat=3):
+    # Cold-start cost: everything up to the Home page (streamlit included), then each page module
+    # on top of that, as on its first selection
+    stages = {'(startup)': {'app import': round(import_seconds(['streamlit'] + APP_MODULES + [views.module_name('Home')],
+                                                                 repeat=repeat), 4)}}
+    for title in views.PAGES:
+        seconds = import_seconds([views.module_name(title)], ['streamlit'] + APP_MODULES, repeat)
+        stages[title] = {'import': round(seconds, 4)}
+    return stages
+
+
+def run(mode, source, cache_dir, repeat=3, formats=EXPORT_FORMATS, work_dir=None):
+    # Every repetition opens a fresh backend, so in-process caches never carry over between repetitions;
+    # the fastest repetition of each stage is kept
+    if mode == 'memory' and os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+    crime_query, cold_seconds = _timed(lambda: query.open_backend(mode, source, cache_dir))
+    page_filters = [resolve_filters(crime_query, spec['filters']) for spec in PAGES]
+    del crime_query
+
+    stages = {'(startup)': {'cold load': cold_seconds}}
+    for _ in range(repeat):
+        crime_query, seconds = _timed(lambda: query.open_backend(mode, source, cache_dir))
+        stages['(startup)']['warm load'] = min(seconds, stages['(startup)'].get('warm load', np.inf))
+        for spec, filters in zip(PAGES, page_filters):
+            name = f"{spec['page']} / {spec['tab']}"
+            timings = run_page(crime_query, spec, filters, formats, work_dir)
+            previous = stages.setdefault(name, {})
+            for stage, seconds in timings.items():
+                previous[stage] = min(seconds, previous.get(stage, np.inf))
+        del crime_query
+
+    return {name: {stage: round(seconds, 4) for stage, seconds in timings.items()} for name, timings in stages.items()}
+
+
+def baseline_key(mode, rows):
+    return f'{mode}-{rows}'
+
+
+def load_baselines(path=BASELINE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+
+def save_baseline(result, path=BASELINE_PATH):
+    baselines = load_baselines(path)
+    baselines[baseline_key(result['meta']['backend'], result['meta']['rows'])] = result
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+
+
+def compare(result, baseline, threshold=THRESHOLD, min_seconds=MIN_SECONDS):
+    # One row per stage present in both runs
+    rows = []
+    for name, timings in result['stages'].items():
+        for stage, seconds in timings.items():
+            base = baseline['stages'].get(name, {}).get(stage)
+            if base is None:
+                continue
+            rows.append({'page': name, 'stage': stage, 'baseline': base, 'current': seconds,
+                         'change': seconds / base - 1 if base else np.nan,
+                         'regressed': seconds > base * (1 + threshold) and seconds - base > min_seconds})
+    return pd.DataFrame(rows, columns=['page', 'stage', 'baseline', 'current', 'change', 'regressed'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time every dashboard page on a synthetic dataset and compare '
+                                                 'against the stored baseline')
+    parser.add_argument('--rows', default='10k', help=f"row count or one of {', '.join(generate.SIZES)}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', default='memory', choices=query.BACKENDS)
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions per stage; the fastest is kept')
+    parser.add_argument('--formats', nargs='*', default=EXPORT_FORMATS, choices=list(export.FORMATS))
+    parser.add_argument('--data-dir', help='where the generated dataset is kept between runs (default: temp dir)')
+    parser.add_argument('--out', help=f'result JSON (default: {RESULTS_DIR}/<backend>-<rows>-<time>.json)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--min-seconds', type=float, default=MIN_SECONDS, help='ignore slowdowns smaller than this')
+    parser.add_argument('--update-baseline', action='store_true', help='store this run as the baseline')
+    args = parser.parse_args()
+
+    rows = generate.parse_size(args.rows)
+    data_dir = args.data_dir or os.path.join(tempfile.gettempdir(), 'crime-benchmark', f'{rows}-{args.seed}')
+    manifest = generate.generate(data_dir, rows, args.seed)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        stages = run(args.backend, data_dir, data_dir + '-cache', args.repeat, args.formats, work_dir)
+    for name, timings in run_imports(args.repeat).items():
+        stages.setdefault(name, {}).update(timings)
+
+    result = {
+        'meta': {
+            'rows': rows,
+            'seed': args.seed,
+            'backend': args.backend,
+            'repeat': args.repeat,
+            'formats': args.formats,
+            'data_version': query.data_version(args.backend, data_dir, data_dir + '-cache'),
+            'generated_seconds': manifest['seconds'],
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'stages': stages,
+    }
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{args.backend}-{rows}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    table = pd.DataFrame(stages).T.reindex(columns=['app import', 'cold load', 'warm load'] + STAGES)
+    print(table.dropna(how='all', axis=1).to_string(na_rep=''))
+    print(f'results written to {out}')
+
+    baseline = load_baselines(args.baseline).get(baseline_key(args.backend, rows))
+    if args.update_baseline:
+        save_baseline(result, args.baseline)
+        print(f'baseline {baseline_key(args.backend, rows)} updated in {args.baseline}')
+    elif baseline is None:
+        print(f'no baseline for {baseline_key(args.backend, rows)} in {args.baseline}; run with --update-baseline')
+    else:
+        report = compare(result, baseline, args.threshold, args.min_seconds)
+        regressions = report[report['regressed']]
+        if len(regressions):
+            print(f'{len(regressions)} stages regressed by more than {args.threshold:.0%}:')
+            print(regressions.to_string(index=False, formatters={'change': '{:+.0%}'.format}))
+            sys.exit(1)
+        print(f'no stage regressed by more than {args.threshold:.0%} against the baseline')
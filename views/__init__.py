@@ -0,0 +1,53 @@
+# Dashboard pages of Final.py, one module per menu entry with a render() function.
+# Named 'views' rather than 'pages', which Streamlit would turn into its own multipage navigation.
+import sys
+import time
+import importlib
+import threading
+from analyzer import instrument
+
+# Menu title -> module in this package, in menu order. A module, and the libraries only it needs,
+# is imported the first time its page is selected.
+PAGES = {
+    'Home': 'home',
+    'Temporal Analysis': 'temporal',
+    'Geospatial Analysis': 'geospatial',
+    'Crime Type Analysis': 'crime_type',
+    'Arrest and Domestic Incident Analysis': 'arrest_domestic',
+    'Location-Specific Analysis': 'location',
+    'Seasonal and Weather Impact': 'seasonal',
+    'Repeat Offenders and Recidivism': 'repeat_offenders',
+    'Predictive Modeling and Risk Assessment': 'predictive',
+    'Anomaly Alerts': 'anomalies',
+}
+
+# Per page, for this process: seconds to import its module, and to import and render it the first time
+STARTUP = {}
+_LOCK = threading.Lock()
+
+
+def module_name(title):
+    return f'{__name__}.{PAGES[title]}'
+
+
+def load(title):
+    name = module_name(title)
+    if name in sys.modules:
+        return sys.modules[name]
+    with instrument.span(f'import {name}'):
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        seconds = time.perf_counter() - start
+    with _LOCK:
+        STARTUP.setdefault(title, {}).setdefault('import_seconds', seconds)
+    return module
+
+
+def render(title):
+    start = time.perf_counter()
+    module = load(title)
+    with instrument.span(f'render {title}'):
+        module.render()
+    with _LOCK:
+        # Import plus render of the first rerun that shows the page: its first paint in this process
+        STARTUP.setdefault(title, {}).setdefault('first_paint_seconds', time.perf_counter() - start)
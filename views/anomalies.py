@@ -0,0 +1,62 @@
+import numpy as np
+import streamlit as st
+from analyzer import anomaly
+from views.common import get_backend, show_chart
+
+# Rolling baselines of the current data version: the stored state is brought up to date with only the days it has not seen yet
+@st.cache_resource(show_spinner='Updating anomaly baselines...', max_entries=1)
+def load_anomalies(version):
+    return anomaly.update_state(get_backend())
+
+def hour_chart(crime_query, state, flag):
+    # Incidents of the flagged day by hour against the cell's hour-of-day baseline for that weekday
+    day = flag['Date']
+    cell = anomaly.cell_index(state, flag['Beat'], flag['Primary Type'])
+    beats = {str(option): option for option in crime_query.options('Beat')}
+    filters = {'Beat': [beats.get(flag['Beat'], flag['Beat'])], 'Primary Type': [flag['Primary Type']],
+               'Year': [day.year], 'Month': [day.month], 'Day': [day.day]}
+    observed = crime_query.counts('Hour', filters).reindex(range(24), fill_value=0)
+    expected = anomaly.hour_baseline(state, cell, int(np.datetime64(day, 'D').astype('int64')))
+    def plot_hours(ax):
+        ax.bar(observed.index, observed.to_numpy(), label='Observed')
+        ax.step(range(24), expected, where='mid', color='red', label='Baseline')
+        ax.set_title(f"Beat {flag['Beat']}, {flag['Primary Type']} on {day:%Y-%m-%d} (z = {flag['z']})")
+        ax.set_xlabel('Hour')
+        ax.set_ylabel('Number of Crimes')
+        ax.legend()
+    show_chart('anomaly-hours', filters, plot_hours, figsize=(15, 5))
+
+def render():
+    st.header('Anomaly Alerts')
+    st.write('Days on which a beat saw markedly more incidents of a crime type than its rolling baseline for that weekday.')
+    crime_query = get_backend()
+    state = load_anomalies(crime_query.version)
+    meta = state['meta']
+    if meta['last_day'] is None:
+        st.subheader('No data available to build baselines')
+        return
+    st.caption(f"{len(state['beats'])} beat x crime type cells with baselines up to "
+               f"{np.datetime64(meta['last_day'], 'D')}; the last update folded in {meta['new_days']} new days "
+               f"in {meta['seconds']}s")
+
+    coll1,coll2,coll3 = st.columns(3)
+    with coll1:
+        days = st.slider('Last days', min_value=1, max_value=anomaly.KEEP_DAYS, value=14)
+    with coll2:
+        min_z = st.slider('Minimum z-score', min_value=anomaly.Z_THRESHOLD, max_value=10.0, value=anomaly.Z_THRESHOLD,
+                          step=0.5)
+    with coll3:
+        types = st.multiselect('Select Primary Type', sorted(set(state['types'])), default=[])
+
+    flagged = anomaly.flags(state, min_z, days)
+    if types:
+        flagged = flagged[flagged['Primary Type'].isin(types)].reset_index(drop=True)
+    if flagged.empty:
+        st.info('No flagged cells in this window.')
+        return
+    st.subheader(f'{len(flagged)} flagged cells')
+    st.dataframe(flagged, hide_index=True)
+
+    choice = st.selectbox('Show flag', range(len(flagged)),
+                          format_func=lambda position: ', '.join(str(value) for value in flagged.iloc[position][:3]))
+    hour_chart(crime_query, state, flagged.iloc[choice])
@@ -0,0 +1,78 @@
+import streamlit as st
+import numpy as np
+from views.common import get_backend, table_view, export_panel, show_figure
+
+def render():
+    st.header('Arrest and Domestic Incident Analysis')    
+    crime_query = get_backend()
+    tab1,tab2 = st.tabs(['Arrest Rates','Domestic vs. Non-Domestic Crimes']) 
+
+    with tab1:
+        primary_type_options = ['All'] + crime_query.options('Primary Type')
+
+        # Sidebar filters
+        coll1,coll2,coll3 = st.columns(3)
+        with coll1:
+            primary_type = st.multiselect('Select Crime Type for Arrest', primary_type_options,default=['All'])
+
+        # Filter data based on user input
+        filters = {'Primary Type': primary_type}
+        record_count = crime_query.count(filters)
+
+        # Display filtered data
+        st.subheader(f'Displaying {record_count} records')
+        table_view(crime_query, filters, 'arrest')
+
+        # Provide download link; the file is only written when requested
+        export_panel(crime_query, filters, 'filtered_data_by_arrest')
+
+        if record_count:
+            coll1,coll2,coll3,coll4 = st.columns(4)
+            with coll1:
+                # Plot arrest rate by crime type
+                show_figure(crime_query, 'arrest-rate-by-crime-type', filters)
+
+            with coll2:
+                show_figure(crime_query, 'arrest-rate-by-district', filters)
+
+            with coll3:
+                show_figure(crime_query, 'arrest-rate-by-ward', filters)
+
+            with coll4:
+                show_figure(crime_query, 'arrest-rate-by-year', filters)
+
+        else:
+            st.subheader('No data available for the selected filters')
+
+    with tab2:
+        primary_type_options = ['All'] + crime_query.options('Primary Type')
+
+        # Sidebar filters
+        coll1,coll2,coll3 = st.columns(3)
+        with coll1:
+            primary_type = st.multiselect('Select Crime Type', primary_type_options,default=['All'])
+
+        # Filter data based on user input
+        filters = {'Primary Type': primary_type}
+        record_count = crime_query.count(filters)
+
+        # Display filtered data
+        st.subheader(f'Displaying {record_count} records')
+        table_view(crime_query, filters, 'domestic')
+
+        # Provide download link; the file is only written when requested
+        export_panel(crime_query, filters, 'filtered_data_by_domestic_crime')
+
+        if record_count:
+            # Domestic and non-domestic incidents by primary type
+            show_figure(crime_query, 'domestic-by-type', filters)
+        else:
+            st.subheader('No data available for the selected filters')
+
+        # Calculate the arrest rates for domestic and non-domestic incidents
+        arrest_rate_by_domestic = crime_query.arrest_rate('Domestic', filters)
+        domestic_arrest_rate = arrest_rate_by_domestic.get(True, np.nan)
+        non_domestic_arrest_rate = arrest_rate_by_domestic.get(False, np.nan)
+
+        st.write(f'Domestic Arrest Rate: {domestic_arrest_rate:.2f}%')
+        st.write(f'Non-Domestic Arrest Rate: {non_domestic_arrest_rate:.2f}%')
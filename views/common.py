@@ -0,0 +1,132 @@
+import threading
+import streamlit as st
+from analyzer import export, table, charts, figures, query, instrument, result_cache
+from analyzer.filters import filter_signature
+
+# Query results shared by all sessions; the budget is CRIME_RESULT_CACHE_MB
+@st.cache_resource
+def get_result_cache():
+    return result_cache.ResultCache()
+
+# The backend of the current data version, shared by every session and rerun; an earlier version's backend
+# (frame, cube and indexes) is released as soon as the next one is loaded.
+# CRIME_BACKEND=dataset queries the partitioned Parquet files in place instead of loading them.
+@st.cache_resource(show_spinner='Loading crime data...', max_entries=1)
+def load_backend(mode, version):
+    return query.CachedBackend(query.open_backend(mode), get_result_cache())
+
+# The JSON API on this process's backends and result cache, started once per port
+@st.cache_resource
+def start_api(port):
+    from analyzer import api
+    return api.start_background(api.Source(open=lambda version: load_backend(query.BACKEND, version)), port=port)
+
+# Data version each version-keyed loader last served
+_loader_versions = {}
+_loader_lock = threading.Lock()
+
+def drop_old_versions(loader, version):
+    # For cached loaders keyed on the data version plus other settings: their entries are emptied
+    # when the version changes, so results of earlier versions are not held next to the current ones
+    name = f'{loader.__module__}.{loader.__name__}'
+    with _loader_lock:
+        if _loader_versions.get(name) != version:
+            loader.clear()
+            _loader_versions[name] = version
+
+def get_backend():
+    # data_version() only stats the source, and rebuilds the columnar cache when it changed
+    with instrument.span('backend'):
+        return load_backend(query.BACKEND, query.data_version())
+
+def show_map(crime_map, width, height):
+    # Imported here so pages without maps never load streamlit_folium
+    from streamlit_folium import folium_static
+
+    # Folium serializes the whole map to HTML here
+    with instrument.span('map display'):
+        folium_static(crime_map, width=width, height=height)
+
+def pick_on_map(crime_map, key, width, height, center=None, zoom=None):
+    # A map that reports back where it was clicked and what it shows: last_clicked, bounds, center and zoom.
+    # center and zoom move the existing map instead of drawing it again.
+    from streamlit_folium import st_folium
+
+    with instrument.span('map display'):
+        return st_folium(crime_map, key=key, width=width, height=height, center=center, zoom=zoom,
+                         returned_objects=['last_clicked', 'bounds', 'center', 'zoom']) or {}
+
+def table_view(crime_query, filters, key):
+    # Only one page of rows is sent to the browser; sorting and paging run in the backend
+    total = crime_query.count(filters)
+    coll1,coll2,coll3,coll4,coll5 = st.columns([3, 2, 1, 1, 1])
+    with coll1:
+        columns = st.multiselect('Columns', crime_query.columns, default=crime_query.columns, key=f'table-columns-{key}')
+    with coll2:
+        sort_column = st.selectbox('Sort by', ['(none)'] + crime_query.columns, key=f'table-sort-{key}')
+    with coll3:
+        ascending = st.radio('Order', ['Ascending', 'Descending'], key=f'table-order-{key}') == 'Ascending'
+    with coll4:
+        page_size = st.selectbox('Rows per page', table.PAGE_SIZES, key=f'table-page-size-{key}')
+    with coll5:
+        pages = max(1, -(-total // page_size))
+        # A narrower filter can leave the remembered page past the end
+        if st.session_state.get(f'table-page-{key}', 1) > pages:
+            st.session_state[f'table-page-{key}'] = pages
+        page = st.number_input(f'Page (of {pages})', min_value=1, max_value=pages, key=f'table-page-{key}')
+
+    frame, total = crime_query.page(filters, columns or None, None if sort_column == '(none)' else sort_column,
+                                    ascending, int(page), page_size)
+    with instrument.span('table display', rows_in=len(frame)):
+        st.dataframe(frame)
+    first = (int(page) - 1) * page_size
+    st.caption(f'Rows {min(first + 1, total)}-{first + len(frame)} of {total}')
+
+# Rendered charts shared by all sessions
+@st.cache_resource
+def get_chart_cache():
+    return charts.ChartCache()
+
+def show_chart(chart_id, filters, draw, figsize):
+    # draw(ax) only runs when this chart has not been rendered for these filters and this data version
+    with instrument.span(f'chart {chart_id}'):
+        key = (chart_id, filter_signature(filters), query.data_version())
+        st.image(get_chart_cache().get_or_render(key, draw, figsize))
+
+def show_figure(crime_query, chart_id, filters):
+    # A chart defined in analyzer/figures.py, which the batch reports render too
+    show_chart(chart_id, filters, figures.drawer(chart_id, crime_query, filters), figures.FIGURES[chart_id]['figsize'])
+
+# Finished exports shared by all sessions, keyed by data version, page and filters
+@st.cache_resource
+def get_export_cache():
+    return export.ExportCache()
+
+EXPORT_LABELS = {'xlsx': 'Excel', 'csv': 'CSV', 'parquet': 'Parquet'}
+
+def export_panel(crime_query, filters, file_name):
+    exports = get_export_cache()
+    coll1,coll2 = st.columns([1, 3])
+    with coll1:
+        fmt = st.selectbox('Export format', list(export.FORMATS), key=f'export-format-{file_name}')
+
+    key = (crime_query.version, file_name, filter_signature(filters), fmt)
+    # The selected rows are only read from the backend when a file is requested, and streamed to the writer chunk by chunk
+    def make_chunks():
+        return crime_query.chunks(filters)
+    result = exports.get(key)
+    if result is None and st.button('Prepare download', key=f'export-prepare-{file_name}'):
+        with st.spinner('Writing export...'):
+            result = exports.get_or_create(key, make_chunks, fmt)
+
+    if result is not None:
+        sheets = f' across {result.sheets} sheets' if result.sheets > 1 else ''
+        st.caption(f'{result.rows} rows, {export.format_size(result.size)} written in {result.seconds:.2f}s{sheets}')
+        st.download_button(
+            label=f"Download data as {EXPORT_LABELS[fmt]}",
+            # Read from disk only when the button is clicked
+            data=lambda: exports.read(key, make_chunks, fmt),
+            file_name=f'{file_name}.{fmt}',
+            mime=result.mime,
+            key=f'export-download-{file_name}'
+        )
@@ -0,0 +1,62 @@
+import streamlit as st
+from views.common import get_backend, table_view, export_panel, show_figure
+
+def render():
+    st.header('Crime Type Analysis')    
+    crime_query = get_backend()
+    tab1,tab2 = st.tabs(['Distribution of Crime Types','Severity Analysis']) 
+
+    with tab1:
+        primary_type_options = ['All'] + crime_query.options('Primary Type')
+
+        # Sidebar filters
+        coll1,coll2,coll3 = st.columns(3)
+        with coll1:
+            primary_type = st.multiselect('Select Primary Type', primary_type_options,default='All')
+
+        # Filter data based on user input
+        filters = {'Primary Type': primary_type}
+        record_count = crime_query.count(filters)
+
+        # Display filtered data
+        st.subheader(f'Displaying {record_count} records')
+        table_view(crime_query, filters, 'crime-type')
+
+        # Provide download link; the file is only written when requested
+        export_panel(crime_query, filters, 'filtered_data')
+
+        st.header('No of Crime across Description')
+        if record_count:
+            show_figure(crime_query, 'crime-per-description', filters)
+
+        else:
+            st.subheader('No data available for the selected filters')
+
+    with tab2:
+        st.header('Severity Analysis')
+
+        # Severity tiers are assigned at ingest from analyzer/taxonomy.py
+        # Streamlit multiselect
+        primary_type_options = ['All'] + crime_query.options('Primary Type')
+        coll1,coll2,coll3 = st.columns(3)
+        with coll1:
+            selected_crime_types = st.multiselect('Select Crime Types', primary_type_options, default='All')
+        with coll2:
+            selected_severity = st.multiselect('Select Severity', ['All'] + crime_query.options('Severity'), default='All')
+
+        # Filtered data
+        filters = {'Primary Type': selected_crime_types, 'Severity': selected_severity}
+        record_count = crime_query.count(filters)
+
+        # Display the filtered data
+        st.subheader(f'Displaying {record_count} records')
+        table_view(crime_query, filters, 'severity')
+
+        # Provide download link; the file is only written when requested
+        export_panel(crime_query, filters, 'filtered_data_crime_type')
+    
+        if record_count:
+            # Detailed distribution of each crime type
+            show_figure(crime_query, 'severity-distribution', filters)
+        else:
+            st.subheader('No data available for the selected filters')
@@ -0,0 +1,211 @@
+import time
+import streamlit as st
+import folium
+from folium.plugins import HeatMap
+from analyzer import heatmap, spatial
+from views.common import get_backend, table_view, export_panel, show_figure, show_map, pick_on_map
+
+# Where the drill-down map starts (the Loop) until a point is clicked or the map is moved
+CITY_CENTER = (41.8781, -87.6298)
+
+def parse_points(text):
+    # One 'latitude, longitude' pair per line
+    points = []
+    for line in text.splitlines():
+        if line.strip():
+            latitude, longitude = (float(value) for value in line.split(','))
+            points.append((latitude, longitude))
+    return points
+
+def drill_down(crime_query):
+    year_options = ['All'] + crime_query.options('Year')
+    primary_type_options = ['All'] + crime_query.options('Primary Type')
+    center = st.session_state.get('drill-center', CITY_CENTER)
+
+    coll1,coll2,coll3 = st.columns(3)
+    with coll1:
+        year = st.multiselect('Select Year for drill-down', year_options,default=['All'])
+    with coll2:
+        primary_type = st.multiselect('Select Crime type for drill-down', primary_type_options,default=['All'])
+    with coll3:
+        shape = st.radio('Area', ['Radius', 'Map viewport', 'Polygon'], horizontal=True, key='drill-shape')
+
+    coll1,coll2,coll3 = st.columns(3)
+    if shape == 'Radius':
+        # Clicking the map moves the centre
+        with coll1:
+            latitude = st.number_input('Latitude', value=float(center[0]), format='%.5f')
+        with coll2:
+            longitude = st.number_input('Longitude', value=float(center[1]), format='%.5f')
+        with coll3:
+            meters = st.number_input('Radius (m)', min_value=50, max_value=20000, value=500, step=50)
+        area = spatial.radius_area(latitude, longitude, meters)
+    elif shape == 'Map viewport':
+        south, west, north, east = st.session_state.get('drill-bounds') or \
+            (center[0] - 0.01, center[1] - 0.015, center[0] + 0.01, center[1] + 0.015)
+        area = spatial.bbox_area(south, west, north, east)
+        st.caption(f'Showing incidents between {south:.5f}, {west:.5f} and {north:.5f}, {east:.5f}; pan or zoom the map to change it')
+    else:
+        text = st.text_area('Polygon points, one "latitude, longitude" per line',
+                            value='\n'.join(f'{center[0] + dlat:.5f}, {center[1] + dlon:.5f}'
+                                            for dlat, dlon in [(-0.005, -0.007), (0.005, -0.007), (0.005, 0.007), (-0.005, 0.007)]))
+        try:
+            area = spatial.polygon_area(parse_points(text))
+            spatial.parse_area(area)
+        except ValueError as error:
+            st.error(f'Invalid polygon: {error}')
+            return
+
+    # The area selects rows through the spatial index like any other filter, so the table, chart and export follow it
+    filters = {'Year': year, 'Primary Type': primary_type, spatial.AREA: area}
+    start = time.perf_counter()
+    record_count = crime_query.count(filters)
+    st.subheader(f'Displaying {record_count} records')
+    st.caption(f'Area query {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    crime_map = folium.Map(location=list(center), zoom_start=15)
+    south, west, north, east = spatial.area_bounds(area)
+    if shape == 'Radius':
+        folium.Circle(location=[area[1], area[2]], radius=area[3], fill=False).add_to(crime_map)
+    elif shape == 'Polygon':
+        folium.Polygon(locations=list(zip(area[1::2], area[2::2])), fill=False).add_to(crime_map)
+    if record_count:
+        coordinates = crime_query.arrays(['Latitude', 'Longitude'], filters)
+        heat_data, _ = heatmap.build_heat_payload(coordinates['Latitude'], coordinates['Longitude'], resolution=0.0002)
+        HeatMap(heat_data).add_to(crime_map)
+    if shape != 'Map viewport':
+        crime_map.fit_bounds([[south, west], [north, east]])
+
+    # Only the viewport mode keeps the map where it was panned to; the other shapes fit the map to the area
+    view = st.session_state.get('drill-view', {}) if shape == 'Map viewport' else {}
+    result = pick_on_map(crime_map, 'drill-map', width=1300, height=500, center=view.get('center'), zoom=view.get('zoom'))
+    changed = False
+    clicked = result.get('last_clicked')
+    if clicked and shape == 'Radius':
+        point = (round(clicked['lat'], 5), round(clicked['lng'], 5))
+        if point != st.session_state.get('drill-clicked'):
+            st.session_state['drill-clicked'] = point
+            st.session_state['drill-center'] = point
+            changed = True
+    bounds = result.get('bounds')
+    if shape == 'Map viewport' and bounds and bounds.get('_southWest', {}).get('lat') is not None:
+        # Rounded so the map settling by a fraction of a pixel does not trigger another rerun
+        box = tuple(round(value, 5) for value in (bounds['_southWest']['lat'], bounds['_southWest']['lng'],
+                                                  bounds['_northEast']['lat'], bounds['_northEast']['lng']))
+        if box != st.session_state.get('drill-bounds'):
+            st.session_state['drill-bounds'] = box
+            if result.get('center'):
+                st.session_state['drill-view'] = {'center': (result['center']['lat'], result['center']['lng']),
+                                                  'zoom': result.get('zoom')}
+            changed = True
+    if changed:
+        st.rerun()
+
+    table_view(crime_query, filters, 'area')
+
+    # Provide download link; the file is only written when requested
+    export_panel(crime_query, filters, 'filtered_data_by_area')
+
+    if record_count:
+        show_figure(crime_query, 'area-crime-types', filters)
+
+def render():
+    st.header('Geospatial Analysis')    
+    crime_query = get_backend()
+    tab1,tab2,tab3 = st.tabs(['Crime Hotspots','District/Ward Analysis','Area Drill-down']) 
+
+    with tab1:
+        st.subheader('Crime Locations based on Heatmap')
+        # Add 'All' option to filters
+        year_options = ['All'] + crime_query.options('Year')
+        primary_type_options = ['All'] + crime_query.options('Primary Type')
+
+        coll1,coll2,coll3,coll4 = st.columns(4)
+        with coll1:
+            year = st.multiselect('Select Year for heatmap', year_options,default=['All'])
+        with coll2:
+            primary_type = st.multiselect('Select Crime type for heatmap', primary_type_options,default=['All'])
+        with coll3:
+            resolution = st.select_slider('Grid resolution (degrees)', options=[0.0005, 0.001, 0.002, 0.005, 0.01], value=heatmap.DEFAULT_RESOLUTION)
+        with coll4:
+            max_points = st.number_input('Max heatmap points', min_value=1000, max_value=100000, value=heatmap.DEFAULT_MAX_POINTS, step=1000)
+
+        # Only the coordinate arrays of the selected rows are gathered
+        coordinates = crime_query.arrays(['Latitude', 'Longitude'], {'Year': year, 'Primary Type': primary_type})
+        latitude, longitude = coordinates['Latitude'], coordinates['Longitude']
+
+        if len(latitude):
+            # Folium map centered around the mean latitude and longitude, with heat data as weighted grid cells
+            crime_map, cells, used_resolution = heatmap.heat_map(latitude, longitude, resolution, int(max_points))
+            st.caption(f'{len(latitude)} incidents shown as {cells} grid cells of {used_resolution:g} degrees')
+
+            # Display the map in the Streamlit app
+            show_map(crime_map, width=1300, height=600)
+        else:
+            st.subheader('No data available for the selected filters')
+
+    with tab2:
+        st.subheader('Crime Rate across different District and Ward')
+        tab1,tab2 = st.tabs(['District Analysis','Ward Analysis']) 
+
+        with tab1:
+            # Add 'All' option to filters
+            primary_type_options = ['All'] + crime_query.options('Primary Type')
+            district_options = ['All'] + crime_query.options('District')
+
+            # Sidebar filters
+            coll1,coll2 = st.columns(2)
+            with coll1:
+                primary_type = st.multiselect('Select Crime type', primary_type_options,default='All')
+            with coll2:
+                district = st.multiselect('Select district', district_options,default='All')
+
+            # Filter data based on user input
+            filters = {'Primary Type': primary_type, 'District': district}
+            record_count = crime_query.count(filters)
+
+            # Display filtered data
+            st.subheader(f'Displaying {record_count} records')
+            table_view(crime_query, filters, 'district')
+
+            # Provide download link; the file is only written when requested
+            export_panel(crime_query, filters, 'filtered_data')
+
+            st.header('No of Crime across District')
+            if record_count:
+                show_figure(crime_query, 'crime-per-district', filters)
+            else:
+                st.subheader('No data available for the selected filters')
+
+        with tab2:
+            # Add 'All' option to filters
+            primary_type_options = ['All'] + crime_query.options('Primary Type')
+            ward_options = ['All'] + crime_query.options('Ward')
+
+            # Sidebar filters
+            coll1,coll2 = st.columns(2)
+            with coll1:
+                primary_type = st.multiselect('Select Crime Type', primary_type_options,default='All')
+            with coll2:
+                ward = st.multiselect('Select Ward', ward_options,default='All')
+
+            # Filter data based on user input
+            filters = {'Primary Type': primary_type, 'Ward': ward}
+            record_count = crime_query.count(filters)
+
+            # Display filtered data
+            st.subheader(f'Displaying {record_count} records')
+            table_view(crime_query, filters, 'ward')
+
+            # Provide download link; the file is only written when requested
+            export_panel(crime_query, filters, 'filtered_data as ward')
+
+            st.header('No of Crime across Ward')
+            if record_count:
+                show_figure(crime_query, 'crime-per-ward', filters)
+            else:
+                st.subheader('No data available for the selected filters')
+
+    with tab3:
+        st.subheader('Incidents in a radius, the map viewport or a polygon')
+        drill_down(crime_query)
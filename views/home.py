@@ -0,0 +1,10 @@
+import streamlit as st
+
+def render():
+    st.title('Chicago Crime Analyzer')
+
+    st.write('''Your primary objective in this role is to leverage historical and recent crime data to identify patterns, trends, and hotspots within Chicago.
+    By conducting a thorough analysis of this data, you will support strategic decision-making, improve resource allocation, and contribute to reducing crime 
+    rates and enhancing public safety.Your task is to provide actionable insights that can shape our crime prevention strategies, ensuring a safer and more
+    secure community.This project will be instrumental in aiding law enforcement operations and enhancing the overall effectiveness of our efforts in combating 
+    crime in Chicago.''')
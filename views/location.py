@@ -0,0 +1,67 @@
+import streamlit as st
+from views.common import get_backend, table_view, export_panel, show_figure
+
+def render():
+    st.header('Location-Specific Analysis')    
+    crime_query = get_backend()
+    tab1,tab2 = st.tabs(['Location Description Analysis','Comparison by Beat and Community Area']) 
+
+    with tab1:
+        st.header('Location Description Analysis')
+
+        Location_Description_options = ['All'] + crime_query.options('Location Description')
+
+        # Sidebar filters
+        coll1,coll2 = st.columns(2)
+        with coll1:
+            Location_Description_type = st.multiselect('Select Location Description', Location_Description_options,default=['All'])
+
+        # Filter data based on user input
+        filters = {'Location Description': Location_Description_type}
+        record_count = crime_query.count(filters)
+
+        # Display filtered data
+        st.subheader(f'Displaying {record_count} records')
+        table_view(crime_query, filters, 'location')
+
+        # Provide download link; the file is only written when requested
+        export_panel(crime_query, filters, 'filtered_data_by_location_description')
+        
+        if record_count:
+            # Analyze the most common locations for crimes
+            show_figure(crime_query, 'location-description-counts', filters)
+        else:
+            st.subheader('No data available for the selected filters')
+
+    with tab2:
+        st.subheader('Comparison by Beat and Community Area')
+        # Analyze crime data by beat
+        Beat_options = ['All'] + crime_query.options('Beat')
+
+        # Sidebar filters
+        coll1,coll2 = st.columns(2)
+        with coll1:
+            Beat_type = st.multiselect('Select Beat', Beat_options,default=['All'])
+
+        # Filter data based on user input
+        filters = {'Beat': Beat_type}
+        record_count = crime_query.count(filters)
+
+        # Display filtered data
+        st.subheader(f'Displaying {record_count} records')
+        table_view(crime_query, filters, 'beat')
+
+        # Provide download link; the file is only written when requested
+        export_panel(crime_query, filters, 'filtered_data')
+
+        if record_count:
+            coll1,coll2 = st.columns(2)
+            with coll1:
+                # Plot crimes by beat
+                show_figure(crime_query, 'crimes-by-beat', filters)
+
+            with coll2:
+                # Analyze crime data by community area
+                show_figure(crime_query, 'crimes-by-community-area', filters)
+        else:
+            st.subheader('No data available for the selected filters')
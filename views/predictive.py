@@ -0,0 +1,123 @@
+import os
+import streamlit as st
+import folium
+from folium.plugins import HeatMap
+from analyzer import models, risk_grid, forecast
+from views.common import get_backend, drop_old_versions, show_map, show_chart
+
+# The risk table is read once per file and kept for every session, until a newer file replaces it
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_risk_table(path, mtime):
+    return models.load_risk_table(path)
+
+# The score array stays memory-mapped; only the slices a window needs are read
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_risk_grid(paths, mtime):
+    return risk_grid.load_grid(paths)
+
+def risk_map(risk_table, column, label, top_n):
+    # Markers for the highest-scoring map cells and time slots
+    high_risk_areas = risk_table.nlargest(top_n, [column, 'incidents'])
+    map_center = [float(risk_table['Latitude'].mean()), float(risk_table['Longitude'].mean())]
+    crime_map = folium.Map(location=map_center, zoom_start=12)
+    for row in high_risk_areas.itertuples(index=False):
+        folium.Marker(
+            location=[float(row.Latitude), float(row.Longitude)],
+            popup=f"{label}: {getattr(row, column):.2f}\nTime: {row.Hour}:00, Day: {row.Day}, Month: {row.Month}",
+            icon=folium.Icon(color='red')
+        ).add_to(crime_map)
+    show_map(crime_map, width=1300, height=500)
+    st.dataframe(high_risk_areas.reset_index(drop=True))
+
+# Forecasts of the current data version per level and frequency, read from disk or fitted once and written there
+@st.cache_resource(show_spinner='Fitting forecasts...')
+def load_forecast(version, level, frequency):
+    return forecast.ensure_forecast(get_backend(), level, frequency)
+
+LEVEL_LABELS = {'district-type': 'District x Primary Type', 'beat': 'Beat'}
+FREQUENCY_LABELS = {'W': 'Weekly', 'D': 'Daily'}
+
+def forecast_tab(crime_query, top_n):
+    coll1,coll2 = st.columns(2)
+    with coll1:
+        level = st.selectbox('Series', list(LEVEL_LABELS), format_func=LEVEL_LABELS.get)
+    with coll2:
+        frequency = st.selectbox('Period', list(FREQUENCY_LABELS), format_func=FREQUENCY_LABELS.get)
+
+    drop_old_versions(load_forecast, crime_query.version)
+    series, arrays, meta = load_forecast(crime_query.version, level, frequency)
+    if not len(series):
+        st.subheader('No data available to forecast')
+        return
+    st.caption(f"{meta['series']} series of {meta['periods']} periods up to {meta['last_period']}, "
+               f"{'seasonal' if meta['season'] else 'non-seasonal'} Holt-Winters fitted in {meta['seconds']}s")
+
+    # Next period's projection per series, highest first
+    keys = forecast.LEVELS[level]
+    labels = series[keys].astype(str).agg(' / '.join, axis=1)
+    next_period = series[keys].assign(forecast=arrays['forecast'][:, 0].round(1), lower=arrays['lower'][:, 0].round(1),
+                                      upper=arrays['upper'][:, 0].round(1), last=arrays['history'][:, -1])
+    order = next_period['forecast'].to_numpy().argsort()[::-1]
+    st.subheader(f"Projected incidents for the {FREQUENCY_LABELS[frequency].lower()} period from {arrays['forecast_starts'][0]}")
+    st.dataframe(next_period.iloc[order].reset_index(drop=True), hide_index=True)
+
+    choice = st.selectbox('Show series', order[:max(top_n, 1) * 4], format_func=lambda position: labels.iloc[position])
+    def plot_forecast(ax):
+        ax.plot(arrays['history_starts'], arrays['history'][choice], label='Observed')
+        ax.plot(arrays['forecast_starts'], arrays['forecast'][choice], marker='o', label='Forecast')
+        ax.fill_between(arrays['forecast_starts'], arrays['lower'][choice], arrays['upper'][choice], alpha=0.3, label='95% interval')
+        ax.set_title(labels.iloc[choice])
+        ax.set_ylabel('Number of Crimes')
+        ax.legend()
+    show_chart(f'forecast-{level}-{frequency}', {'Series': [labels.iloc[choice]]}, plot_forecast, figsize=(15, 5))
+
+def render():
+    st.header('Predictive Modeling and Risk Assessment')    
+    crime_query = get_backend()
+    tab1,tab2,tab3 = st.tabs(['Predictive Analysis','Risk Assessment','Crime Forecast']) 
+
+    # Written offline by 'python -m analyzer.models score'; the app never trains or scores
+    risk_path = models.find_risk_table(crime_query.version)
+    if risk_path is None:
+        st.info('No risk table yet. Train a model with `python -m analyzer.models train`, '
+                'then score the current data with `python -m analyzer.models score`.')
+    else:
+        risk_table, risk_meta = load_risk_table(risk_path, os.path.getmtime(risk_path))
+        st.caption(f"Model {risk_meta['version']}, scored on data version {risk_meta['data_version']}"
+                   + ('' if risk_meta['data_version'] == crime_query.version else ' (older than the loaded data)'))
+        top_n = st.slider('High-risk areas shown', min_value=5, max_value=100, value=25, step=5)
+
+    with tab1:
+        st.write("Develop models to predict future crime incidents based on historical data, time, location, and other relevant factors")
+        if risk_path is not None:
+            risk_map(risk_table, 'predicted', 'Predicted Risk', top_n)
+
+    with tab2:
+        st.write("Assess the risk of different areas and times for specific types of crimes to help in resource allocation for law enforcement.")
+        if risk_path is not None:
+            risk_map(risk_table, 'risk', 'Risk Score', top_n)
+
+        # Full cell x month x day x hour surface, written offline by 'python -m analyzer.risk_grid'
+        grid_paths = risk_grid.find_grid(crime_query.version)
+        if grid_paths is not None:
+            st.subheader('Risk Surface')
+            scores, cells, grid_meta = load_risk_grid(grid_paths, os.path.getmtime(grid_paths['scores']))
+            scenario = grid_meta['scenario']
+            st.caption(f"{grid_meta['cells']} cells scored for every month, day and hour as "
+                       f"{scenario['Primary Type']} at {scenario['Location Description']} ({scenario['Year']})")
+            coll1,coll2 = st.columns(2)
+            with coll1:
+                months = st.multiselect('Select Month for risk surface', grid_meta['axes']['Month'], default=[])
+            with coll2:
+                hours = st.slider('Hours', min_value=0, max_value=23, value=(0, 23))
+
+            cell_risk = risk_grid.window(scores, months=months or None, hours=list(range(hours[0], hours[1] + 1)))
+            surface = cells.assign(risk=cell_risk)
+            crime_map = folium.Map(location=[float(surface['Latitude'].mean()), float(surface['Longitude'].mean())], zoom_start=12)
+            HeatMap(surface[['Latitude', 'Longitude', 'risk']].astype(float).values.tolist()).add_to(crime_map)
+            show_map(crime_map, width=1300, height=500)
+            st.dataframe(surface.nlargest(top_n, 'risk').reset_index(drop=True))
+
+    with tab3:
+        st.write('Weekly or daily incident counts per district and crime type, or per beat, projected ahead to plan resources.')
+        forecast_tab(crime_query, top_n if risk_path is not None else 25)
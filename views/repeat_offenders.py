@@ -0,0 +1,112 @@
+import streamlit as st
+from analyzer import recidivism, near_repeat
+from views.common import get_backend, drop_old_versions, table_view, export_panel, show_figure
+
+# Repeat-incident results of the current data version per settings, shared by every session
+@st.cache_resource(show_spinner=False)
+def load_recidivism(version, key, window_days, follow_up):
+    crime_query = get_backend()
+    columns = [column for column in recidivism.columns_for(key) if column in crime_query.columns]
+    return recidivism.analyze(crime_query.frame(columns=columns), key, window_days, follow_up)
+
+# Knox test results of the current data version per filters and number of simulations
+@st.cache_resource(show_spinner=False)
+def load_near_repeat(version, filters, simulations):
+    crime_query = get_backend()
+    columns = [column for column in near_repeat.COLUMNS if column in crime_query.columns]
+    return near_repeat.knox_test(crime_query.frame(filters, columns), simulations=simulations)
+
+def render():
+    st.header('Repeat Offenders and Recidivism')    
+    crime_query = get_backend()
+    tab1,tab2 = st.tabs(['Repeat Crime Locations','Recidivism Rates']) 
+
+    with tab1:
+        st.write('Identify locations that are repeatedly associated with criminal activity.')
+
+        Location_Description_options = ['All'] + crime_query.options('Location Description')
+
+        # Sidebar filters
+        coll1,coll2 = st.columns(2)
+        with coll1:
+            Location_Description_type = st.multiselect('Select Location_Description_', Location_Description_options,default=['All'])
+
+        # Filter data based on user input
+        filters = {'Location Description': Location_Description_type}
+        record_count = crime_query.count(filters)
+
+        # Display filtered data
+        st.subheader(f'Displaying {record_count} records')
+        table_view(crime_query, filters, 'repeat-location')
+
+        # Provide download link; the file is only written when requested
+        export_panel(crime_query, filters, 'filtered_data')
+
+        if record_count:
+            # Plot crime count by year
+            st.subheader('Repeat No of Crime')
+            show_figure(crime_query, 'repeat-crime-count', filters)
+        else:
+            st.subheader('No data available for the selected filters')
+
+        st.subheader('Near-Repeat Analysis')
+        st.write('Pairs of incidents close in both space and time, compared with random reshuffles of their dates (Knox test).')
+        year_options = crime_query.options('Year')
+        primary_type_options = ['All'] + crime_query.options('Primary Type')
+        coll1,coll2,coll3 = st.columns(3)
+        with coll1:
+            near_repeat_year = st.multiselect('Select Year for near-repeat', year_options, default=year_options[-1:])
+        with coll2:
+            near_repeat_type = st.multiselect('Select Crime type for near-repeat', primary_type_options, default=['All'])
+        with coll3:
+            simulations = st.selectbox('Simulations', [19, 49, 99, 199, 999], index=2)
+
+        # A year of incidents at most by default: pairs grow with the square of local density
+        near_repeat_filters = {'Location Description': Location_Description_type, 'Year': near_repeat_year or ['All'],
+                               'Primary Type': near_repeat_type}
+        if st.button('Run near-repeat analysis'):
+            with st.spinner('Counting close pairs and running permutations...'):
+                drop_old_versions(load_near_repeat, crime_query.version)
+                result = load_near_repeat(crime_query.version, near_repeat_filters, simulations)
+
+            if not result['incidents']:
+                st.info('No incidents with coordinates for the selected filters.')
+            else:
+                st.caption(f"{result['incidents']} incidents, {result['pairs']} pairs within "
+                           f"{near_repeat.DISTANCE_EDGES[-1]} ft, {result['simulations']} simulations")
+                coll1,coll2 = st.columns(2)
+                with coll1:
+                    st.write('Knox ratio (observed / expected pairs)')
+                    st.dataframe(result['ratio'].round(2))
+                with coll2:
+                    st.write('p-value')
+                    st.dataframe(result['p_value'].round(3))
+
+    with tab2:
+        st.write('Arrests followed by another arrest, or by any incident, with the same key within the chosen window.')
+        coll1,coll2,coll3 = st.columns(3)
+        with coll1:
+            repeat_key = st.selectbox('Repeat key', list(recidivism.KEYS))
+        with coll2:
+            window_days = st.selectbox('Window (days)', recidivism.WINDOWS, index=len(recidivism.WINDOWS) - 1)
+        with coll3:
+            follow_up = st.radio('Follow-up', recidivism.FOLLOW_UPS)
+
+        if st.button('Calculate Recidivism Rates'):
+            with st.spinner('Calculating...'):
+                drop_old_versions(load_recidivism, crime_query.version)
+                result = load_recidivism(crime_query.version, repeat_key, window_days, follow_up)
+
+            if not result['index_incidents']:
+                st.info('No arrests to follow up in the loaded data.')
+            else:
+                st.write(f"Recidivism Rate: {result['rate']:.2f}%")
+                st.caption(f"{result['repeats']} of {result['index_incidents']} arrests had a follow-up within {window_days} days "
+                           f"(median {result['median_days']:.1f} days)")
+                coll1,coll2 = st.columns(2)
+                with coll1:
+                    st.subheader('By District')
+                    st.dataframe(result['by'].get('District'))
+                with coll2:
+                    st.subheader('By Crime Type')
+                    st.dataframe(result['by'].get('Primary Type'))
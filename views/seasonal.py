@@ -0,0 +1,37 @@
+import streamlit as st
+from views.common import get_backend, table_view, export_panel, show_figure
+
+def render():
+    st.header('Seasonal and Weather Impact')
+    st.subheader('Seasonal Trends')    
+    crime_query = get_backend()
+
+    Season_options = ['All'] + crime_query.options('Season')
+
+    # Sidebar filters
+    coll1,coll2 = st.columns(2)
+    with coll1:
+        Season_type = st.multiselect('Select Season', Season_options,default=['All'])
+    
+    # Filter data based on user input
+    filters = {'Season': Season_type}
+    record_count = crime_query.count(filters)
+
+    # Display filtered data
+    st.subheader(f'Displaying {record_count} records')
+    table_view(crime_query, filters, 'season')
+
+    # Provide download link; the file is only written when requested
+    export_panel(crime_query, filters, 'filtered_data')
+
+    if record_count:
+        coll1,coll2 = st.columns(2)
+        with coll1:
+            # Analyze the number of crimes by season
+            show_figure(crime_query, 'crimes-by-season', filters)
+
+        with coll2:
+            # Analyze the number of crimes by primary type and season
+            show_figure(crime_query, 'crimes-by-type-and-season', filters)
+    else:
+        st.subheader('No data available for the selected filters')
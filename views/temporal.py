@@ -0,0 +1,78 @@
+import streamlit as st
+from views.common import get_backend, table_view, export_panel, show_figure
+
+def render():
+    st.header('Temporal Analysis') 
+    # Read the file
+    crime_query = get_backend()
+    tab1,tab2 = st.tabs(['Crime Trends Over Time','Peak Crime Hours'])
+
+    with tab1:
+        # Add 'All' option to filters
+        year_options = ['All'] + crime_query.options('Year')
+        month_options = ['All'] + crime_query.options('Month')
+        day_options = ['All'] + crime_query.options('Day')
+
+        # Sidebar filters
+        coll1,coll2,coll3 = st.columns(3)
+        with coll1:
+            year = st.multiselect('Select Year', year_options,default=['All'])
+        with coll2:    
+            month = st.multiselect('Select Month', month_options,default=['All'])
+        with coll3:
+            day = st.multiselect('Select Day', day_options,['All'])
+
+        # Filter data based on user input
+        filters = {'Year': year, 'Month': month, 'Day': day}
+        record_count = crime_query.count(filters)
+
+        # Display filtered data
+        st.subheader(f'Displaying {record_count} records')
+        table_view(crime_query, filters, 'temporal')
+
+        # Provide download link; the file is only written when requested
+        export_panel(crime_query, filters, 'filtered_data')
+
+        if record_count:
+            coll1,coll2,coll3 = st.columns(3)
+            with coll1:    
+                # Plot crime count by year
+                st.subheader('Crime Count as Year')
+                show_figure(crime_query, 'crime-count-by-year', filters)
+
+            with coll2:
+                # Plot crime count by month
+                st.subheader('Crime Count by Month')
+                show_figure(crime_query, 'crime-count-by-month', filters)
+
+            with coll3:
+                # Plot crime count by day
+                st.subheader('Crime Count by Day')
+                show_figure(crime_query, 'crime-count-by-day', filters)
+        else:
+            st.subheader('No data available for the selected filters')
+
+    with tab2:
+        # Add 'All' option to filters
+        day_options = ['All'] + crime_query.options('Day')
+
+        # Sidebar filters
+        coll1,coll2,coll3 = st.columns(3)
+        with coll1:
+            day = st.multiselect('Select Day for crime per hour', day_options,default=['All'])
+
+        # Filter data based on user input
+        filters = {'Day': day}
+        record_count = crime_query.count(filters)
+
+        # Display filtered data
+        st.subheader(f'Displaying {record_count} records')
+        table_view(crime_query, filters, 'peak-hours')
+
+        # Function to convert dataframe to Excel file
+        st.subheader('Peak Crime Hours')
+
+        if record_count:
+            show_figure(crime_query, 'crime-per-hour', filters)
+        else:
+            st.subheader('No data available for the selected filters')